@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+AIRPORTS_INDEX_FILE = "airports.idx"
+INDEX_MAGIC = b"APIX"
+INDEX_FORMAT_VERSION = 1
+# Rebuild from a fresh airports.json once the index is older than this
+INDEX_MAX_AGE_DAYS = int(os.getenv("AIRPORTS_INDEX_MAX_AGE_DAYS", "30"))
+
+# Header: magic, format version, record count, build time (epoch), sha256 of the source JSON
+HEADER = struct.Struct("<4sHIQ32s")
+# Record: ICAO (null padded), lat, lon, IATA, ISO country
+RECORD = struct.Struct("<8sdd4s2s")
+
+def _encode(value, width):
+    return (value or "").strip().upper().encode("ascii", "ignore")[:width]
+
+def build_index(json_file, index_file=AIRPORTS_INDEX_FILE):
+    """
+    Convert the mwgg airports.json into a compact, sorted binary index.
+
+    Only airports with coordinates and an ASCII ICAO of at most 8 characters
+    are kept. The file is written atomically.
+
+    Returns:
+        int: Number of airports written
+    """
+    with open(json_file, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).digest()
+    airports = json.loads(raw)
+
+    records = []
+    for icao, airport in airports.items():
+        key = _encode(icao, 8)
+        lat, lon = airport.get("lat"), airport.get("lon")
+        if not key or len(icao.strip()) > 8 or lat is None or lon is None:
+            continue
+        records.append((key, float(lat), float(lon),
+                        _encode(airport.get("iata"), 4), _encode(airport.get("country"), 2)))
+    records.sort(key=lambda r: r[0])
+
+    # A unique temp file, so concurrent rebuilds never write into each other's
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(index_file)}.", suffix=".tmp",
+                               dir=os.path.dirname(index_file) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, len(records), int(time.time()), digest))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, index_file)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return len(records)
+
+class AirportIndex:
+    """
+    Read-only, memory-mapped view of an airports.idx file.
+
+    Lookups binary-search the sorted ICAO keys directly in the mapped file,
+    so opening the index costs nothing and nothing is parsed up front.
+    """
+
+    def __init__(self, index_file=AIRPORTS_INDEX_FILE):
+        self.path = index_file
+        self._file = open(index_file, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{index_file} is empty")
+        magic, version, count, built_at, digest = HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{index_file} is not a v{INDEX_FORMAT_VERSION} airport index")
+        if len(self._mm) != HEADER.size + count * RECORD.size:
+            self.close()
+            raise ValueError(f"{index_file} is truncated")
+        self.count = count
+        self.built_at = built_at
+        self.source_sha256 = digest.hex()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, icao_code):
+        return self._find(icao_code) is not None
+
+    def _record(self, i):
+        key, lat, lon, iata, country = RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+        return (key.rstrip(b"\0").decode("ascii"), lat, lon,
+                iata.rstrip(b"\0").decode("ascii"), country.rstrip(b"\0").decode("ascii"))
+
+    def _key_at(self, i):
+        offset = HEADER.size + i * RECORD.size
+        return self._mm[offset:offset + 8]
+
+    def _find(self, icao_code):
+        target = _encode(icao_code, 8).ljust(8, b"\0")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == target:
+            return lo
+        return None
+
+    def get(self, icao_code):
+        """
+        Returns:
+            dict: {'icao', 'lat', 'lon', 'iata', 'country'} or None
+        """
+        i = self._find(icao_code)
+        if i is None:
+            return None
+        icao, lat, lon, iata, country = self._record(i)
+        return {"icao": icao, "lat": lat, "lon": lon, "iata": iata, "country": country}
+
+    def coordinates(self, icao_code):
+        """
+        Returns:
+            tuple: (lat, lon) or None if the ICAO is not in the index
+        """
+        i = self._find(icao_code)
+        if i is None:
+            return None
+        _, lat, lon, _, _ = self._record(i)
+        return (lat, lon)
+
+    def records(self):
+        """Iterate over (icao, lat, lon, iata, country) in ICAO order."""
+        for i in range(self.count):
+            yield self._record(i)
+
+    def age_days(self):
+        return (time.time() - self.built_at) / 86400
+
+    def close(self):
+        try:
+            self._mm.close()
+        finally:
+            self._file.close()
+
+def open_index(index_file=AIRPORTS_INDEX_FILE, max_age_days=INDEX_MAX_AGE_DAYS):
+    """
+    Open the index if it exists, matches the current format and is fresh enough.
+
+    Returns:
+        AirportIndex: The opened index, or None if it must be (re)built
+    """
+    if not os.path.exists(index_file):
+        return None
+    try:
+        index = AirportIndex(index_file)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️ Ignoring unusable airport index {index_file}: {e}")
+        return None
+    if max_age_days is not None and index.age_days() > max_age_days:
+        print(f"♻️ Airport index {index_file} is {index.age_days():.0f} days old, rebuilding")
+        index.close()
+        return None
+    return index
+
+def touch_index(index_file=AIRPORTS_INDEX_FILE):
+    """Reset the build time of an index whose source airports.json is unchanged upstream."""
+    with open(index_file, "r+b") as f:
+        magic, version, count, _, digest = HEADER.unpack(f.read(HEADER.size))
+        f.seek(0)
+        f.write(HEADER.pack(magic, version, count, int(time.time()), digest))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the memory-mapped airport index.")
+    parser.add_argument("--build", metavar="AIRPORTS_JSON", help="Build the index from an airports.json file")
+    parser.add_argument("--index", default=AIRPORTS_INDEX_FILE, help="Index file (default: airports.idx)")
+    parser.add_argument("icao", nargs="*", help="ICAO codes to look up")
+    args = parser.parse_args()
+
+    if args.build:
+        count = build_index(args.build, args.index)
+        print(f"✅ Built {args.index} with {count} airports")
+
+    if args.icao:
+        index = AirportIndex(args.index)
+        for icao in args.icao:
+            print(f"{icao.upper()}: {index.get(icao) or 'not found'}")
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+End-to-end benchmarks for generate_flights.py against local API stand-ins.
+
+Each scenario runs the real ``generate_schedules`` pipeline (generation,
+subfleet assignment and import file writing) in a fresh child process (so peak memory is per run) inside a
+temporary work directory, with airportgap, VAcentral, phpVMS and the
+airports.json download all served by benchmarks/stub_servers.py.
+
+Cache states:
+    cold     empty distance/coordinate caches and no airport index
+    warm     second run in the same work directory
+    partial  cold work directory seeded with a share of the warm caches
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10,100,1000 --latency-ms 20 --rate-429 0.02
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = "10,100,1000"
+DEFAULT_STATES = "cold,warm,partial"
+DEFAULT_MODES = "schedules"
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BENCH_ROUTE_CODE = "BEN"
+BENCH_BASE_ICAO = "BNCH"
+BENCH_TOUR_CODE = "BNCH"
+# High enough that the token buckets never throttle the stubs unless asked to
+BENCH_RATE_PER_MIN = 1_000_000
+RATE_LIMITED_PROVIDERS = ("airportgap", "vacentral", "phpvms", "airportdb_io")
+
+def load_real_airports(generator_dir=GENERATOR_DIR):
+    """
+    Collect the real (ICAO, IATA) airports behind distance_cache.json.
+
+    The cache is keyed by ICAO pairs (older entries by IATA pairs), so the
+    other code of each airport comes from the project's airports.txt /
+    legs.txt files.
+
+    Returns:
+        tuple: (sorted list of (icao, iata), list of cached (iata, iata) routes)
+    """
+    iata_to_icao = {}
+    files = glob.glob(os.path.join(generator_dir, "*_*", "airports.txt"))
+    files += glob.glob(os.path.join(generator_dir, "TOURS", "*", "legs.txt"))
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#")[0].strip()
+                if "," not in line:
+                    continue
+                for part in line.split(",")[:2]:
+                    if "-" in part:
+                        icao, iata = (p.strip().upper() for p in part.split("-", 1))
+                        if icao and iata:
+                            iata_to_icao[iata] = icao
+
+    cached_routes = []
+    cache_file = os.path.join(generator_dir, "distance_cache.json")
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            icao_to_iata = {icao: iata for iata, icao in iata_to_icao.items()}
+            for key in json.load(f):
+                if key.startswith("ICAO:"):
+                    continue
+                a, _, b = key.partition("-")
+                a, b = icao_to_iata.get(a, a), icao_to_iata.get(b, b)
+                if a in iata_to_icao and b in iata_to_icao:
+                    cached_routes.append((a, b))
+
+    airports = set()
+    for a, b in cached_routes:
+        airports.add((iata_to_icao[a], a))
+        airports.add((iata_to_icao[b], b))
+    if len(airports) < 2:
+        airports = {(icao, iata) for iata, icao in iata_to_icao.items()}
+    return sorted(airports), cached_routes
+
+def synthetic_pairs(airports, count, seed=0):
+    """
+    Build ``count`` unique airport pairs from the real airport set.
+
+    Routes are drawn from every unordered pair of real airports; when more are
+    requested than exist, synthetic airports (ICAO ``ZQxx``, IATA ``Qxx``) are
+    added so the input never contains duplicates.
+
+    Returns:
+        list: [((icao1, iata1), (icao2, iata2)), ...]
+    """
+    rng = random.Random(seed)
+    pool = list(airports)
+    taken = {code for airport in pool for code in airport}
+    synthetic = 0
+    while len(pool) * (len(pool) - 1) // 2 < count:
+        letters = chr(65 + synthetic // 26 % 26) + chr(65 + synthetic % 26)
+        synthetic += 1
+        icao, iata = f"ZQ{letters}", f"Q{letters}"
+        if icao not in taken and iata not in taken:
+            pool.append((icao, iata))
+
+    pairs = set()
+    result = []
+    while len(result) < count:
+        a, b = rng.sample(pool, 2)
+        key = (min(a, b), max(a, b))
+        if key in pairs:
+            continue
+        pairs.add(key)
+        result.append((a, b))
+    return result
+
+def write_inputs(workdir, pairs, mode):
+    """Write airports.txt (schedules) or legs.txt + config.csv (tour) into ``workdir``."""
+    if mode == "tour":
+        folder = os.path.join(workdir, "TOURS", BENCH_TOUR_CODE)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "config.csv"), "w", encoding="utf-8") as f:
+            f.write("flight_type,pilot_pay,notes,start_flight_number,start_date,end_date,subfleets\n")
+            f.write("J,850,Benchmark tour,8000,,,\n")
+        path = os.path.join(folder, "legs.txt")
+    else:
+        folder = os.path.join(workdir, f"{BENCH_BASE_ICAO}_{BENCH_ROUTE_CODE}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "airports.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for (icao1, iata1), (icao2, iata2) in pairs:
+            f.write(f"{icao1}-{iata1},{icao2}-{iata2}\n")
+    return path
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_child(spec_path):
+    """Run one scenario in this (child) process and write its metrics as JSON."""
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    for provider in RATE_LIMITED_PROVIDERS:
+        os.environ.setdefault(f"{provider.upper()}_RATE_PER_MIN", str(spec["rate_per_min"]))
+
+    sys.path.insert(0, GENERATOR_DIR)
+    from stub_servers import StubApiServer
+    import generate_flights as gf
+
+    os.chdir(spec["workdir"])
+    stub = StubApiServer(
+        [tuple(a) for a in spec["airports"]],
+        latency_ms=spec["latency_ms"],
+        rate_429=spec["rate_429"],
+        retry_after=spec["retry_after"],
+        seed=spec["seed"],
+    ).start()
+    gf.API_URL = f"{stub.base_url}/api/airports/distance"
+    gf.VACENTRAL_API_URL = f"{stub.base_url}/api/airports"
+    gf.AIRPORTS_JSON_URL = f"{stub.base_url}/airports.json"
+    gf.PHPVMSV7_ENDPOINT = f"{stub.base_url}/phpvms"
+    gf.PHPVMSV7_API_KEY = "benchmark-key"
+    gf.AIRPORTDB_TOKEN = None
+    gf._assume_yes = True
+
+    time_generated = time.strftime("%Y%m%d-%H%M%S")
+    if spec["mode"] == "tour":
+        input_path = f"TOURS/{BENCH_TOUR_CODE}/legs.txt"
+    else:
+        input_path = f"{BENCH_BASE_ICAO}_{BENCH_ROUTE_CODE}/airports.txt"
+    pairs = gf.parse_airport_file(input_path)
+
+    cache = gf.get_distance_cache(gf.CACHE_FILE)
+    cached = sum(1 for (a1_icao, a1_iata), (a2_icao, a2_iata) in pairs
+                 if gf._is_distance_cached(a1_iata, a2_iata, a1_icao, a2_icao, cache))
+
+    started = time.perf_counter()
+    if spec["mode"] == "tour":
+        tour_config = gf.parse_tour_config(f"TOURS/{BENCH_TOUR_CODE}/config.csv")
+        gf.generate_schedules(BENCH_BASE_ICAO, BENCH_TOUR_CODE, time_generated, pairs, 8000, True, tour_config)
+    else:
+        gf.generate_schedules(BENCH_BASE_ICAO, BENCH_ROUTE_CODE, time_generated, pairs, gf.START_FLIGHT_NUMBER)
+    finished = time.perf_counter()
+    cache.flush()
+    stub.stop()
+
+    wall = finished - started
+    http_calls = dict(sorted(stub.calls.items()))
+    result = {
+        "pairs": len(pairs),
+        "wall_seconds": round(wall, 3),
+        "pairs_per_second": round(len(pairs) / wall, 1) if wall > 0 else None,
+        "http_calls": http_calls,
+        "http_calls_total": sum(http_calls.values()),
+        "cache_hit_rate": round(cached / len(pairs), 4) if pairs else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    with open(spec["result_path"], "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def _run_scenario(spec, verbose=False):
+    spec_path = os.path.join(spec["workdir"], ".bench_spec.json")
+    spec["result_path"] = os.path.join(spec["workdir"], ".bench_result.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    output = None if verbose else subprocess.DEVNULL
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", spec_path],
+                               stdout=output, stderr=output if not verbose else None)
+    if completed.returncode != 0 or not os.path.exists(spec["result_path"]):
+        return {"error": f"child exited with code {completed.returncode}"}
+    with open(spec["result_path"], "r", encoding="utf-8") as f:
+        result = json.load(f)
+    os.remove(spec["result_path"])
+    os.remove(spec_path)
+    return result
+
+def _seed_partial_caches(source_dir, target_dir, share, seed):
+    """Copy ``share`` of the warm distance and coordinate cache entries."""
+    rng = random.Random(seed)
+    for name in ("distance_cache.json", "airport_coords_cache.json"):
+        source = os.path.join(source_dir, name)
+        if not os.path.exists(source):
+            continue
+        with open(source, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        kept = {k: v for k, v in entries.items() if rng.random() < share}
+        with open(os.path.join(target_dir, name), "w", encoding="utf-8") as f:
+            json.dump(kept, f)
+    index = os.path.join(source_dir, "airports.idx")
+    if os.path.exists(index):
+        shutil.copyfile(index, os.path.join(target_dir, "airports.idx"))
+
+def run_benchmarks(sizes, states, modes, latency_ms=0, rate_429=0.0, retry_after=1,
+                   partial_share=0.5, rate_per_min=BENCH_RATE_PER_MIN, seed=0, verbose=False):
+    """
+    Returns:
+        list: One result dict per (mode, size, state)
+    """
+    airports, cached_routes = load_real_airports()
+    print(f"🛫 {len(airports)} real airports from {len(cached_routes)} cached routes")
+    results = []
+    for mode in modes:
+        for size in sizes:
+            pairs = synthetic_pairs(airports, size, seed)
+            used = sorted({a for pair in pairs for a in pair})
+            spec_base = {
+                "mode": mode,
+                "airports": used,
+                "latency_ms": latency_ms,
+                "rate_429": rate_429,
+                "retry_after": retry_after,
+                "rate_per_min": rate_per_min,
+                "seed": seed,
+            }
+            with tempfile.TemporaryDirectory(prefix="flights-bench-") as root:
+                warm_dir = os.path.join(root, "warm")
+                os.makedirs(warm_dir)
+                write_inputs(warm_dir, pairs, mode)
+                for state in states:
+                    if state != "cold" and not os.path.exists(os.path.join(warm_dir, "distance_cache.json")):
+                        # warm/partial without a preceding cold run: prime the caches first
+                        _run_scenario(dict(spec_base, workdir=warm_dir), verbose)
+                    if state == "partial":
+                        workdir = os.path.join(root, "partial")
+                        os.makedirs(workdir, exist_ok=True)
+                        write_inputs(workdir, pairs, mode)
+                        _seed_partial_caches(warm_dir, workdir, partial_share, seed)
+                    else:
+                        workdir = warm_dir
+                    result = _run_scenario(dict(spec_base, workdir=workdir), verbose)
+                    result.update({"mode": mode, "size": size, "cache": state})
+                    results.append(result)
+                    _print_result(result)
+    return results
+
+def _print_result(r):
+    if "error" in r:
+        print(f"❌ {r['mode']:<9} {r['size']:>6} {r['cache']:<8} {r['error']}")
+        return
+    print(f"✅ {r['mode']:<9} {r['size']:>6} {r['cache']:<8} "
+          f"{r['wall_seconds']:>8.2f}s {r['pairs_per_second'] or 0:>9.1f} pairs/s "
+          f"{r['http_calls_total']:>6} HTTP  hit {r['cache_hit_rate'] * 100:>5.1f}%  "
+          f"peak {r['peak_rss_mb']} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate_flights.py against local API stand-ins.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated pair counts (e.g. 10,1000,50000)")
+    parser.add_argument("--states", default=DEFAULT_STATES, help="Cache states to run: cold,warm,partial")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help="Input kinds: schedules (airports.txt), tour (legs.txt)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every stub response")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of provider requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--partial-share", type=float, default=0.5, help="Share of warm cache kept for 'partial'")
+    parser.add_argument("--rate-per-min", type=float, default=BENCH_RATE_PER_MIN,
+                        help="Token bucket rate for every provider (default: effectively unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results JSON (default: benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show generator output")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    states = [s.strip() for s in args.states.split(",") if s.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for state in states:
+        if state not in ("cold", "warm", "partial"):
+            parser.error(f"unknown cache state '{state}'")
+
+    results = run_benchmarks(sizes, states, modes, args.latency_ms, args.rate_429, args.retry_after,
+                             args.partial_share, args.rate_per_min, args.seed, args.verbose)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "latency_ms": args.latency_ms,
+                "rate_429": args.rate_429,
+                "retry_after": args.retry_after,
+                "partial_share": args.partial_share,
+                "rate_per_min": args.rate_per_min,
+                "seed": args.seed,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"📄 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Behaviour checks against the local API stand-ins in benchmarks/stub_servers.py.
+
+Each check runs the real client code against a StubApiServer inside a
+temporary work directory and asserts on what the stand-in saw, so no tokens
+or network are needed.
+
+Usage:
+    python benchmarks/stub_checks.py            # every check
+    python benchmarks/stub_checks.py phpvms_slot
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, GENERATOR_DIR)
+
+# Let the concurrency cap, not the token bucket, decide how requests overlap
+os.environ.setdefault("PHPVMS_RATE_PER_MIN", "1000000")
+
+from stub_servers import StubApiServer
+
+STUB_AIRPORTS = [(f"ZZ{i:02d}", f"Z{i:02d}") for i in range(40)]
+# Large enough that airports.json spans several download chunks (about 300 KB)
+DOWNLOAD_AIRPORTS = [(f"Z{i:04d}", "") for i in range(4000)]
+DOWNLOAD_DROP_AFTER = 200 * 1024
+
+def check_phpvms_slot():
+    """The paginated snapshot refresh never exceeds PROVIDER_CONCURRENCY["phpvms"]."""
+    from circuit_breaker import PROVIDER_CONCURRENCY
+    from phpvms_airports import PhpvmsAirportSnapshot
+
+    stub = StubApiServer(STUB_AIRPORTS, latency_ms=50, phpvms_per_page=4).start()
+    try:
+        snapshot = PhpvmsAirportSnapshot("phpvms_airports.json")
+        snapshot.refresh(f"{stub.base_url}/phpvms", "check-key", max_workers=8)
+    finally:
+        stub.stop()
+    assert len(snapshot) == len(STUB_AIRPORTS), f"snapshot has {len(snapshot)} airports"
+    assert stub.calls["phpvms"] == 10, f"{stub.calls['phpvms']} page requests, expected 10"
+    peak, limit = stub.peak_in_flight["phpvms"], PROVIDER_CONCURRENCY["phpvms"]
+    assert peak <= limit, f"{peak} phpVMS requests in flight, limit is {limit}"
+
+def check_phpvms_breaker():
+    """With the phpVMS breaker open, a refresh sends nothing and keeps the old snapshot."""
+    from circuit_breaker import CircuitOpenError, get_breaker
+    from phpvms_airports import fetch_airports_page, get_phpvms_snapshot
+
+    breaker = get_breaker("phpvms")
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    stub = StubApiServer(STUB_AIRPORTS).start()
+    try:
+        endpoint = f"{stub.base_url}/phpvms"
+        try:
+            fetch_airports_page(endpoint, "check-key", 1)
+        except CircuitOpenError:
+            pass
+        else:
+            raise AssertionError("fetch_airports_page ignored the open breaker")
+        snapshot = get_phpvms_snapshot(endpoint, "check-key", path="phpvms_airports.json")
+    finally:
+        stub.stop()
+        breaker.success()
+    assert len(snapshot) == 0, f"refresh with an open breaker loaded {len(snapshot)} airports"
+    assert stub.calls.get("phpvms", 0) == 0, f"{stub.calls['phpvms']} requests sent past the open breaker"
+
+def check_download_resume():
+    """A download cut off mid-body keeps airports.json.part and the next run resumes it with Range."""
+    import requests
+    import resumable_download
+    from resumable_download import download_file, part_path
+
+    resumable_download.DOWNLOAD_BACKOFF_SECONDS = 0
+    stub = StubApiServer(DOWNLOAD_AIRPORTS, airports_drop_after=DOWNLOAD_DROP_AFTER).start()
+    try:
+        url = f"{stub.base_url}/airports.json"
+        try:
+            download_file(url, "airports.json", attempts=1)
+        except requests.exceptions.RequestException:
+            pass
+        else:
+            raise AssertionError("the first, dropped transfer did not fail")
+        kept = os.path.getsize(part_path("airports.json")) if os.path.exists(part_path("airports.json")) else 0
+        assert 0 < kept <= DOWNLOAD_DROP_AFTER, f"truncated .part holds {kept} bytes"
+        result = download_file(url, "airports.json", attempts=1)
+    finally:
+        stub.stop()
+    assert result["resumed"], "second run did not resume the partial file"
+    assert stub.calls["github"] == 2, f"{stub.calls['github']} requests, expected 2 (dropped, resumed)"
+    with open("airports.json", "r", encoding="utf-8") as f:
+        airports = json.load(f)
+    assert sorted(airports) == [icao for icao, _ in DOWNLOAD_AIRPORTS], "resumed file does not match the source"
+    assert not os.path.exists(part_path("airports.json")), ".part left behind after a complete download"
+
+def check_download_checksum():
+    """A download whose sha256 does not match is rejected and never replaces the target."""
+    from resumable_download import DownloadError, download_file, part_path
+
+    with open("airports.json", "w", encoding="utf-8") as f:
+        f.write("{}")
+    stub = StubApiServer(DOWNLOAD_AIRPORTS).start()
+    try:
+        download_file(f"{stub.base_url}/airports.json", "airports.json", expected_sha256="0" * 64)
+    except DownloadError:
+        pass
+    else:
+        raise AssertionError("checksum mismatch was accepted")
+    finally:
+        stub.stop()
+    with open("airports.json", "r", encoding="utf-8") as f:
+        assert f.read() == "{}", "rejected download replaced the existing file"
+    assert not os.path.exists(part_path("airports.json")), "rejected .part was kept for resuming"
+
+def check_sqlite_json_merge():
+    """Routes added to distance_cache.json after the SQLite store was created survive an export."""
+    from distance_cache import SqliteDistanceStore, load_json_cache, save_json_cache
+
+    save_json_cache({"AAA-BBB": 100}, "distance_cache.json")
+    store = SqliteDistanceStore("distance_cache.sqlite", json_path="distance_cache.json")
+    store.close()
+    save_json_cache({"AAA-BBB": 100, "CCC-DDD": 200}, "distance_cache.json")
+    store = SqliteDistanceStore("distance_cache.sqlite", json_path="distance_cache.json")
+    assert store.get("CCC-DDD") == 200, "reopening did not merge the route added to the JSON"
+    # A route another writer adds while this store is open
+    save_json_cache({"AAA-BBB": 100, "CCC-DDD": 200, "GGG-HHH": 400}, "distance_cache.json")
+    store.set("EEE-FFF", 300)
+    store.export_json("distance_cache.json")
+    store.close()
+    exported = sorted(load_json_cache("distance_cache.json"))
+    assert exported == ["AAA-BBB", "CCC-DDD", "EEE-FFF", "GGG-HHH"], f"export lost routes: {exported}"
+
+def check_429_not_retried():
+    """A 429 with Retry-After reaches the caller (and rate_limiter.py) instead of being resent by urllib3."""
+    from http_client import get_session
+
+    stub = StubApiServer(STUB_AIRPORTS, rate_429=1.0, retry_after=30).start()
+    try:
+        response = get_session("vacentral").get(f"{stub.base_url}/api/airports/ZZ01")
+    finally:
+        stub.stop()
+    assert response.status_code == 429, f"got {response.status_code}, expected the 429"
+    assert stub.calls["vacentral"] == 1, f"{stub.calls['vacentral']} requests sent for one 429"
+
+def check_breaker_probe_release():
+    """A half-open probe that leaves provider_slot without sending a request does not block the provider."""
+    from circuit_breaker import HALF_OPEN, get_breaker, provider_slot
+
+    breaker = get_breaker("airportdb_io")
+    breaker.cooldown = 0
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    try:
+        with provider_slot("airportdb_io"):
+            assert breaker.state == HALF_OPEN, f"breaker is {breaker.state}, expected a half-open probe"
+            raise ValueError("caller failed before sending the probe")
+    except ValueError:
+        pass
+    stub = StubApiServer(STUB_AIRPORTS).start()
+    try:
+        from http_client import get_session
+        with provider_slot("airportdb_io"):
+            get_session("airportdb_io").get(f"{stub.base_url}/api/airports/ZZ01")
+    finally:
+        stub.stop()
+    assert not breaker.is_open(), f"breaker is still {breaker.state} after a successful probe"
+
+CHECKS = {
+    "phpvms_slot": check_phpvms_slot,
+    "phpvms_breaker": check_phpvms_breaker,
+    "download_resume": check_download_resume,
+    "download_checksum": check_download_checksum,
+    "sqlite_json_merge": check_sqlite_json_merge,
+    "429_not_retried": check_429_not_retried,
+    "breaker_probe_release": check_breaker_probe_release,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run behaviour checks against the local API stand-ins.")
+    parser.add_argument("checks", nargs="*", help=f"Checks to run (default: all of {', '.join(CHECKS)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+
+    failed = 0
+    for name in args.checks or CHECKS:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="flights-check-") as workdir:
+            os.chdir(workdir)
+            try:
+                CHECKS[name]()
+                print(f"✅ {name}")
+            except Exception:
+                failed += 1
+                print(f"❌ {name}")
+                traceback.print_exc()
+            finally:
+                os.chdir(cwd)
+    print(f"{'✅' if not failed else '❌'} {len(args.checks or CHECKS) - failed} passed, {failed} failed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+def stub_coordinates(icao_code):
+    """Deterministic, plausible coordinates for any ICAO code."""
+    h = int(hashlib.sha256(icao_code.encode()).hexdigest(), 16)
+    return ((h % 16000) / 100 - 80, ((h // 16000) % 36000) / 100 - 180)
+
+def stub_distance(from_code, to_code):
+    a, b = sorted((from_code, to_code))
+    h = int(hashlib.sha256(f"{a}-{b}".encode()).hexdigest(), 16)
+    return 50 + h % 4500
+
+class StubApiServer:
+    """
+    One local HTTP server standing in for airportgap, VAcentral, phpVMS and
+    the mwgg airports.json download.
+
+    Routes:
+        POST /api/airports/distance       airportgap distance
+        GET  /api/airports/<ICAO>         VAcentral airport
+        GET  /phpvms/api/airports/<ICAO>  phpVMS v7 airport
+        GET  /phpvms/api/airports?page=N  phpVMS v7 airports list (paginated)
+        GET  /airports.json               mwgg airports database
+
+    Every request sleeps ``latency_ms`` first; a ``rate_429`` fraction of
+    provider requests is answered with 429 and ``Retry-After``. The phpVMS
+    list holds ``airports`` unless ``phpvms_airports`` gives a different set.
+    ``peak_in_flight`` records the most requests per provider that were
+    inside that latency sleep at the same time.
+
+    ``/airports.json`` honours ``If-None-Match``, ``Range`` / ``If-Range`` and
+    ``Accept-Encoding: gzip`` (when ``gzip_airports``). With
+    ``airports_drop_after`` set, the first ``airports_drops`` full or ranged
+    responses close the connection after that many body bytes.
+    """
+
+    def __init__(self, airports, latency_ms=0, rate_429=0.0, retry_after=1, seed=0,
+                 phpvms_airports=None, phpvms_per_page=50, gzip_airports=False,
+                 airports_drop_after=None, airports_drops=1):
+        self.airports = airports
+        self.phpvms_airports = airports if phpvms_airports is None else phpvms_airports
+        self.phpvms_per_page = phpvms_per_page
+        self._phpvms_icaos = {icao for icao, _ in self.phpvms_airports}
+        self.latency_ms = latency_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.gzip_airports = gzip_airports
+        self.airports_drop_after = airports_drop_after
+        self.airports_drops = airports_drops
+        self.calls = {}
+        self.peak_in_flight = {}
+        self._in_flight = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, provider):
+        with self._lock:
+            self.calls[provider] = self.calls.get(provider, 0) + 1
+            return self.rate_429 and self._random.random() < self.rate_429
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                payload = json.dumps(body if body is not None else {}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_airports(self, body, etag):
+                status, headers, payload = 200, {"ETag": etag, "Accept-Ranges": "bytes"}, body
+                byte_range = self.headers.get("Range", "")
+                if byte_range.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+                    start = int(byte_range[6:].split("-")[0])
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status, payload = 206, body[start:]
+                    headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+                elif stub.gzip_airports and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                with stub._lock:
+                    drop = stub.airports_drop_after is not None and stub.airports_drops > 0
+                    if drop:
+                        stub.airports_drops -= 1
+                if drop:
+                    self.wfile.write(payload[:stub.airports_drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(payload)
+
+            def _throttled(self, provider):
+                if stub.latency_ms:
+                    with stub._lock:
+                        stub._in_flight[provider] = stub._in_flight.get(provider, 0) + 1
+                        stub.peak_in_flight[provider] = max(stub.peak_in_flight.get(provider, 0),
+                                                            stub._in_flight[provider])
+                    time.sleep(stub.latency_ms / 1000)
+                    with stub._lock:
+                        stub._in_flight[provider] -= 1
+                if stub._count(provider):
+                    self._send(429, {"error": "Too Many Requests"}, {"Retry-After": stub.retry_after})
+                    return True
+                return False
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode())
+                if self.path != "/api/airports/distance":
+                    return self._send(404)
+                if self._throttled("airportgap"):
+                    return
+                from_code = form.get("from", [""])[0].upper()
+                to_code = form.get("to", [""])[0].upper()
+                nm = stub_distance(from_code, to_code)
+                self._send(200, {"data": {"attributes": {"nautical_miles": nm}}})
+
+            def do_GET(self):
+                if self.path == "/airports.json":
+                    if stub.latency_ms:
+                        time.sleep(stub.latency_ms / 1000)
+                    stub._count("github")
+                    db = {}
+                    for icao, iata in stub.airports:
+                        lat, lon = stub_coordinates(icao)
+                        db[icao] = {"icao": icao, "iata": iata, "country": "XX", "lat": lat, "lon": lon}
+                    body = json.dumps(db).encode()
+                    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    return self._send_airports(body, etag)
+                url = urlsplit(self.path)
+                if url.path in ("/phpvms/api/airports", "/phpvms/api/airports/"):
+                    if self._throttled("phpvms"):
+                        return
+                    page = int(parse_qs(url.query).get("page", ["1"])[0])
+                    per_page = stub.phpvms_per_page
+                    last_page = max(1, -(-len(stub.phpvms_airports) // per_page))
+                    data = []
+                    for icao, iata in stub.phpvms_airports[(page - 1) * per_page:page * per_page]:
+                        lat, lon = stub_coordinates(icao)
+                        data.append({"icao": icao, "iata": iata, "name": f"{icao} Airport", "lat": lat, "lon": lon})
+                    return self._send(200, {"data": data, "meta": {"current_page": page, "last_page": last_page,
+                                                                   "per_page": per_page,
+                                                                   "total": len(stub.phpvms_airports)}})
+                if self.path.startswith("/phpvms/api/airports/"):
+                    if self._throttled("phpvms"):
+                        return
+                    icao = self.path.rsplit("/", 1)[-1].upper()
+                    if icao not in stub._phpvms_icaos:
+                        return self._send(404, {"error": "Not Found"})
+                    lat, lon = stub_coordinates(icao)
+                    return self._send(200, {"data": {"icao": icao, "lat": lat, "lon": lon}})
+                if self.path.startswith("/api/airports/"):
+                    if self._throttled("vacentral"):
+                        return
+                    icao = self.path.rsplit("/", 1)[-1].upper()
+                    lat, lon = stub_coordinates(icao)
+                    return self._send(200, {"icao": icao, "lat": lat, "lon": lon})
+                self._send(404)
+
+        return Handler
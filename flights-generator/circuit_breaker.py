@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from rate_limiter import get_limiter
+from run_report import get_run_report
+
+# Consecutive failures (timeouts, connection errors, 429, 5xx) that open a
+# provider's breaker, and how long it stays open before one probe is let through.
+# Override with <PROVIDER>_BREAKER_THRESHOLD / <PROVIDER>_BREAKER_COOLDOWN_SECONDS
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN_SECONDS = 300
+
+# Max concurrent in-flight requests per external provider
+PROVIDER_CONCURRENCY = {
+    "airportgap": 2,
+    "vacentral": 4,
+    "phpvms": 2,
+    "airportdb_io": 2,
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a provider whose breaker is open."""
+
+    def __init__(self, provider):
+        super().__init__(f"{provider} circuit breaker is open")
+        self.provider = provider
+
+def is_failure(status):
+    """A response status (None = no response) that counts against the provider."""
+    return status is None or status == 429 or status >= 500
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    Closed: requests go out and consecutive failures are counted. After
+    ``threshold`` failures in a row the breaker opens and ``allow()`` answers
+    False without touching the network, so every remaining lookup skips the
+    provider at once. After ``cooldown`` seconds it is half-open: a single
+    probe is allowed; success closes the breaker, failure opens it again for
+    another cooldown.
+
+    Answers like 404 are successes here: the provider is up, it just does not
+    have the airport.
+    """
+
+    def __init__(self, name, threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN_SECONDS):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_thread = None
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.skipped = 0
+
+    def _set_state(self, state):
+        self.state = state
+        get_run_report().record_breaker(self.name, state, opened=1 if state == OPEN else 0)
+
+    def allow(self):
+        """
+        Returns:
+            bool: True if a request may be sent to the provider now
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set_state(HALF_OPEN)
+                print(f"🔌 {self.name} circuit half-open: probing")
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                self._probe_thread = threading.get_ident() if self._probing else None
+                return True
+            self.skipped += 1
+            get_run_report().record_breaker(self.name, self.state, skipped=1)
+            return False
+
+    def release_probe(self):
+        """
+        Give up this thread's half-open probe if no outcome was reported for it
+        (the request was never sent), so the next request can probe instead.
+        """
+        with self._lock:
+            if self._probing and self._probe_thread == threading.get_ident():
+                self._probing = False
+                self._probe_thread = None
+
+    def is_open(self):
+        with self._lock:
+            return self.state != CLOSED
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+                print(f"🔌 {self.name} circuit closed: provider recovered")
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                self._set_state(OPEN)
+                print(f"🔌 {self.name} circuit open after {self._failures} consecutive failures; "
+                      f"skipping it for {self.cooldown:.0f}s")
+
+    def observe(self, response):
+        """Count a provider response (or None for a connection error / timeout)."""
+        if is_failure(getattr(response, "status_code", None)):
+            self.failure()
+        else:
+            self.success()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider):
+    """Return the shared CircuitBreaker for ``provider``, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            threshold = int(os.getenv(f"{provider.upper()}_BREAKER_THRESHOLD", DEFAULT_FAILURE_THRESHOLD))
+            cooldown = float(os.getenv(f"{provider.upper()}_BREAKER_COOLDOWN_SECONDS", DEFAULT_COOLDOWN_SECONDS))
+            breaker = CircuitBreaker(provider, threshold, cooldown)
+            _breakers[provider] = breaker
+        return breaker
+
+def open_breakers():
+    """
+    Returns:
+        list: Names of providers whose breaker is not closed
+    """
+    with _breakers_lock:
+        return sorted(name for name, breaker in _breakers.items() if breaker.is_open())
+
+_provider_semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in PROVIDER_CONCURRENCY.items()}
+
+@contextmanager
+def provider_slot(provider):
+    """
+    Hold a concurrency slot for ``provider`` and charge its token bucket.
+
+    Only wraps requests that are actually sent, so cached lookups never wait.
+
+    Raises:
+        CircuitOpenError: If the provider's circuit breaker is open
+    """
+    semaphore = _provider_semaphores.get(provider)
+    with semaphore if semaphore is not None else nullcontext():
+        # Checked once the slot is ours, so requests queued behind failing ones skip too
+        breaker = get_breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(provider)
+        try:
+            get_limiter(provider).acquire()
+            yield
+        finally:
+            # A probe whose request was never sent would otherwise block the provider for the run
+            breaker.release_probe()
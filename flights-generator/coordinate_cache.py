@@ -0,0 +1,123 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from distance_cache import (FLUSH_EVERY_N_ENTRIES, FLUSH_INTERVAL_SECONDS, json_cache_lock, load_json_cache,
+                            save_json_cache)
+
+COORDINATE_CACHE_FILE = "airport_coords_cache.json"
+# Resolved airports barely ever move; unresolved ones are retried after a short while
+POSITIVE_TTL_SECONDS = int(os.getenv("AIRPORT_CACHE_TTL_DAYS", "30")) * 24 * 3600
+NEGATIVE_TTL_SECONDS = int(os.getenv("AIRPORT_NEGATIVE_TTL_MINUTES", "60")) * 60
+
+class CoordinateCache:
+    """
+    Per-ICAO airport coordinate cache that persists across runs.
+
+    Each entry records the coordinates, the source that resolved them
+    (vacentral, phpvms, custom_csv, ...) and an expiry time. Airports that
+    could not be used are cached too ("negative" entries) with a much shorter
+    TTL so a repeated failure does not redo every network lookup.
+
+    Entry format:
+        {"status": "found" | "not_in_phpvms" | "not_found",
+         "source": str | None, "lat": float | None, "lon": float | None,
+         "resolved_at": ISO timestamp, "expires_at": epoch seconds}
+    """
+
+    def __init__(self, path=COORDINATE_CACHE_FILE, ttl=POSITIVE_TTL_SECONDS, negative_ttl=NEGATIVE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.RLock()
+        self._entries = load_json_cache(path)
+        # ICAO -> entry (None = invalidated) changed since the last flush
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+
+    def get(self, icao_code):
+        """
+        Returns:
+            dict: Cached entry for the ICAO, or None if missing or expired
+        """
+        icao_upper = icao_code.strip().upper()
+        with self._lock:
+            entry = self._entries.get(icao_upper)
+            if entry is None:
+                return None
+            if entry.get("expires_at", 0) <= time.time():
+                del self._entries[icao_upper]
+                return None
+            return entry
+
+    def set_found(self, icao_code, coords, source):
+        self._store(icao_code, "found", source, coords, self.ttl)
+
+    def set_missing(self, icao_code, status, source=None, coords=None):
+        self._store(icao_code, status, source, coords, self.negative_ttl)
+
+    def invalidate(self, icao_code):
+        with self._lock:
+            icao_upper = icao_code.strip().upper()
+            if self._entries.pop(icao_upper, None) is not None:
+                self._dirty[icao_upper] = None
+
+    def _store(self, icao_code, status, source, coords, ttl):
+        icao_upper = icao_code.strip().upper()
+        entry = {
+            "status": status,
+            "source": source,
+            "lat": float(coords[0]) if coords else None,
+            "lon": float(coords[1]) if coords else None,
+            "resolved_at": datetime.now().isoformat(timespec="seconds"),
+            "expires_at": int(time.time() + ttl),
+        }
+        with self._lock:
+            self._entries[icao_upper] = entry
+            self._dirty[icao_upper] = entry
+            if (len(self._dirty) >= FLUSH_EVERY_N_ENTRIES
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            # Only our own changes go over the file; other processes' newer entries stay
+            with json_cache_lock(self.path):
+                on_disk = load_json_cache(self.path)
+                for icao, entry in self._dirty.items():
+                    if entry is None:
+                        on_disk.pop(icao, None)
+                    else:
+                        on_disk[icao] = entry
+                self._entries = {
+                    icao: entry for icao, entry in on_disk.items()
+                    if entry.get("expires_at", 0) > now
+                }
+                save_json_cache(self._entries, self.path)
+            self._dirty = {}
+            self._last_flush = time.monotonic()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_coordinate_cache(path=COORDINATE_CACHE_FILE):
+    """Return the process-wide CoordinateCache, loading it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CoordinateCache(path)
+        return _cache
+
+def _flush_at_exit():
+    if _cache is not None:
+        try:
+            _cache.flush()
+        except Exception as e:
+            print(f"⚠️ Could not flush coordinate cache {_cache.path}: {e}")
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,527 @@
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writes are still atomic
+    fcntl = None
+
+# Flush policy for the in-memory distance cache
+FLUSH_INTERVAL_SECONDS = 30   # Write back at most this long after the first unsaved entry
+FLUSH_EVERY_N_ENTRIES = 25    # ...or as soon as this many new routes are pending
+
+# Secondary index: IATA route key -> canonical ICAO route key
+ROUTE_ALIASES_FILE = "distance_aliases.json"
+
+# Optional SQLite store shared by concurrent runs (e.g. DISTANCE_CACHE_DB=distance_cache.sqlite)
+DISTANCE_CACHE_DB = os.getenv("DISTANCE_CACHE_DB")
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+def route_key(code1, code2):
+    """Order-independent cache key for a route, e.g. route_key("MUHA", "KJFK") == "KJFK-MUHA"."""
+    a, b = code1.strip().upper(), code2.strip().upper()
+    return f"{min(a, b)}-{max(a, b)}"
+
+def is_iata_key(key):
+    """True for a route key made of two 3-letter IATA codes (the pre-ICAO key format)."""
+    a, _, b = key.partition("-")
+    return len(a) == 3 and len(b) == 3
+
+def load_json_cache(path):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def save_json_cache(cache: dict, path):
+    """
+    Atomically write the cache as sorted, indented JSON.
+
+    The data is written to a uniquely named temporary file next to the
+    target, fsynced and then moved over the original, so a crash mid-write
+    never leaves a truncated distance_cache.json behind and concurrent
+    writers never share a temporary file.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                               dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+@contextmanager
+def json_cache_lock(path):
+    """
+    Hold an exclusive lock on ``<path>.lock`` for a read-merge-write of ``path``.
+
+    Processes flushing the same cache file take turns, so none of them merges
+    against a copy that another one is about to replace.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+class DistanceCache:
+    """
+    Route distance cache loaded once per process and written back in batches.
+
+    Lookups and inserts only touch the in-memory dict. Pending entries are
+    flushed to disk when FLUSH_EVERY_N_ENTRIES new routes accumulate, when
+    FLUSH_INTERVAL_SECONDS have passed since the last write, or at exit.
+    Only the routes this process set since its last flush are merged into
+    the file, so newer values written by another process are kept.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL_SECONDS, flush_every=FLUSH_EVERY_N_ENTRIES):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._entries = load_json_cache(path)
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key)
+        return int(value) if value is not None else default
+
+    def set(self, key, nm, source=None):
+        with self._lock:
+            if self._entries.get(key) == nm:
+                return
+            self._entries[key] = nm
+            self._dirty[key] = nm
+            if (len(self._dirty) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # Merge our changes into whatever is on disk so entries written by
+            # another process since we loaded are neither dropped nor reverted.
+            with json_cache_lock(self.path):
+                on_disk = load_json_cache(self.path)
+                on_disk.update(self._dirty)
+                self._entries = on_disk
+                save_json_cache(self._entries, self.path)
+            self._dirty = {}
+            self._last_flush = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._entries)
+
+class SqliteDistanceStore:
+    """
+    Route distance store backed by SQLite in WAL mode.
+
+    Lookups go through the primary-key index on ``route_key`` and inserts are
+    single-row upserts, so neither depends on the size of the cache. WAL mode
+    plus a busy timeout lets concurrent generator runs read and write the same
+    database without overwriting each other.
+
+    When ``json_path`` is given, routes in it that the database does not have
+    yet are merged in on every open and again before each export, so routes
+    that reached distance_cache.json some other way (git pull, another run, a
+    key migration) are kept. It is exported back on flush, so the committed
+    JSON stays a readable, diffable mirror of the database.
+    """
+
+    def __init__(self, db_path, json_path=None):
+        self.db_path = db_path
+        self.path = json_path
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS distances (
+                route_key      TEXT PRIMARY KEY,
+                nautical_miles INTEGER NOT NULL,
+                source         TEXT,
+                updated_at     TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        if json_path and os.path.exists(json_path):
+            added = self.merge_json(json_path)
+            if added:
+                print(f"✅ Added {added} routes from {json_path} to {db_path}")
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM distances").fetchone()[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT nautical_miles FROM distances WHERE route_key = ?", (key,)
+            ).fetchone()
+        return int(row[0]) if row else default
+
+    def set(self, key, nm, source=None):
+        with self._lock:
+            self._upsert([(key, int(nm), source)])
+            self._pending += 1
+
+    def _upsert(self, rows):
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO distances (route_key, nautical_miles, source, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(route_key) DO UPDATE SET
+                    nautical_miles = excluded.nautical_miles,
+                    source = COALESCE(excluded.source, distances.source),
+                    updated_at = excluded.updated_at
+                """,
+                [(key, nm, source, now) for key, nm, source in rows],
+            )
+
+    def flush(self):
+        with self._lock:
+            if self._pending == 0 or not self.path:
+                return
+            self.export_json(self.path)
+            self._pending = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: nm
+                for key, nm in self._conn.execute("SELECT route_key, nautical_miles FROM distances")
+            }
+
+    def import_json(self, json_path, source=None):
+        """
+        Upsert every route from a distance_cache.json file.
+
+        Returns:
+            int: Number of routes imported
+        """
+        data = load_json_cache(json_path)
+        with self._lock:
+            self._upsert([(key, int(nm), source) for key, nm in data.items()])
+        return len(data)
+
+    def merge_json(self, json_path):
+        """
+        Insert the routes of a distance_cache.json file the store does not
+        have yet; routes already in the store keep their value.
+
+        Returns:
+            int: Number of routes added
+        """
+        data = load_json_cache(json_path)
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO distances (route_key, nautical_miles, source, updated_at) VALUES (?, ?, NULL, ?)",
+                [(key, int(nm), now) for key, nm in data.items()],
+            )
+            return self._conn.total_changes - before
+
+    def export_json(self, json_path):
+        """
+        Write the whole store in the distance_cache.json format, after merging
+        in whatever the file has that the store does not.
+
+        Returns:
+            int: Number of routes exported
+        """
+        # Merge and snapshot under the lock so no writer's routes are dropped
+        with json_cache_lock(json_path):
+            self.merge_json(json_path)
+            data = self.snapshot()
+            save_json_cache(data, json_path)
+        return len(data)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RouteAliasIndex:
+    """
+    IATA route key -> canonical ICAO route key.
+
+    Distances are cached under the ICAO pair. Whenever a route is seen with
+    both codes the IATA pair is recorded here, so a lookup that only has
+    IATA codes still finds the canonical entry, and an airport whose IATA
+    code changes keeps hitting the cache through its ICAO code.
+
+    File format (distance_aliases.json): {"ABQ-PHX": "KABQ-KPHX", ...}
+    """
+
+    def __init__(self, path=ROUTE_ALIASES_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._aliases = load_json_cache(path)
+        self._dirty = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._aliases)
+
+    def get(self, iata_key):
+        with self._lock:
+            return self._aliases.get(iata_key)
+
+    def add(self, iata_key, icao_key):
+        with self._lock:
+            if self._aliases.get(iata_key) != icao_key:
+                self._aliases[iata_key] = icao_key
+                self._dirty[iata_key] = icao_key
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            with json_cache_lock(self.path):
+                on_disk = load_json_cache(self.path)
+                on_disk.update(self._dirty)
+                self._aliases = on_disk
+                save_json_cache(self._aliases, self.path)
+            self._dirty = {}
+
+def migrate_route_keys(entries, iata_to_icao, aliases=None):
+    """
+    Rewrite IATA-keyed distances to canonical ICAO keys.
+
+    An IATA key is moved when both of its codes map to exactly one ICAO
+    code. If the ICAO route already has a distance the two are duplicates
+    when they agree and a conflict when they do not; on a conflict the IATA
+    value is kept, because that is the one the generator has been serving
+    (it looked the IATA key up first). Keys that cannot be mapped stay as
+    they are.
+
+    Args:
+        entries: {route key: nautical miles} as stored in distance_cache.json
+        iata_to_icao: {IATA: ICAO} for the airports the project uses
+        aliases: Existing {IATA route key: ICAO route key} index to extend
+
+    Returns:
+        tuple: (migrated entries, alias index, report dict)
+    """
+    migrated = {key: nm for key, nm in entries.items() if not is_iata_key(key)}
+    aliases = dict(aliases or {})
+    report = {"entries_before": len(entries), "moved": 0, "duplicates": [], "conflicts": [], "unmapped": []}
+    for key, nm in sorted(entries.items()):
+        if not is_iata_key(key):
+            continue
+        a, _, b = key.partition("-")
+        if a not in iata_to_icao or b not in iata_to_icao:
+            migrated[key] = nm
+            report["unmapped"].append(key)
+            continue
+        icao_key = route_key(iata_to_icao[a], iata_to_icao[b])
+        aliases[key] = icao_key
+        existing = migrated.get(icao_key)
+        if existing is None:
+            report["moved"] += 1
+        elif int(existing) == int(nm):
+            report["duplicates"].append({"key": icao_key, "alias": key, "nm": int(nm)})
+        else:
+            report["conflicts"].append({"key": icao_key, "alias": key, "kept": int(nm), "dropped": int(existing)})
+        migrated[icao_key] = nm
+    report["entries_after"] = len(migrated)
+    return migrated, aliases, report
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+# False in processes (ALL-mode workers) whose SQLite store must not write the JSON mirror
+_json_mirror = True
+
+def disable_json_mirror():
+    """
+    Open SQLite stores in this process without their JSON mirror: they neither
+    merge nor export distance_cache.json, and leave that to the parent run.
+    """
+    global _json_mirror
+    _json_mirror = False
+
+def get_distance_cache(path, db_path=None):
+    """
+    Return the process-wide distance cache for ``path``, loading it on first use.
+
+    If ``db_path`` (or the DISTANCE_CACHE_DB environment variable) is set, a
+    SqliteDistanceStore mirrored to ``path`` is used instead of the JSON cache
+    (not mirrored after disable_json_mirror()).
+    Every cache handed out here is flushed automatically at interpreter exit.
+    """
+    db_path = db_path or DISTANCE_CACHE_DB
+    key = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            if db_path:
+                cache = SqliteDistanceStore(db_path, json_path=path if _json_mirror else None)
+            else:
+                cache = DistanceCache(path)
+            _caches[key] = cache
+        return cache
+
+_aliases = {}
+
+def get_route_aliases(path=ROUTE_ALIASES_FILE):
+    """Return the process-wide RouteAliasIndex for ``path``, loading it on first use."""
+    key = os.path.abspath(path)
+    with _caches_lock:
+        aliases = _aliases.get(key)
+        if aliases is None:
+            aliases = _aliases[key] = RouteAliasIndex(path)
+        return aliases
+
+def flush_all():
+    with _caches_lock:
+        caches = list(_caches.values()) + list(_aliases.values())
+    for cache in caches:
+        try:
+            cache.flush()
+        except Exception as e:
+            print(f"⚠️ Could not flush distance cache {cache.path}: {e}")
+
+atexit.register(flush_all)
+
+def project_iata_to_icao(index_file=None):
+    """
+    Map IATA codes to ICAO codes from every base / tour route file, falling
+    back to the airport index for codes no route file uses.
+
+    Returns:
+        tuple: ({IATA: ICAO}, sorted list of IATA codes with more than one ICAO)
+    """
+    from generate_flights import _target_paths, discover_targets, parse_airport_file
+
+    seen = {}
+    for target in discover_targets():
+        for pair in parse_airport_file(_target_paths(*target)[1]):
+            for icao, iata in pair:
+                if icao.strip() and iata.strip():
+                    seen.setdefault(iata.strip().upper(), set()).add(icao.strip().upper())
+    if index_file:
+        from airport_index import open_index
+        index = open_index(index_file, max_age_days=None)
+        if index is not None:
+            by_iata = {}
+            for icao, _, _, iata, _ in index.records():
+                if iata:
+                    by_iata.setdefault(iata.upper(), set()).add(icao.upper())
+            for iata, icaos in by_iata.items():
+                seen.setdefault(iata, icaos)
+    mapping = {iata: next(iter(icaos)) for iata, icaos in seen.items() if len(icaos) == 1}
+    return mapping, sorted(iata for iata, icaos in seen.items() if len(icaos) > 1)
+
+def migrate_json_cache(json_path, aliases_path=ROUTE_ALIASES_FILE, index_file=None, dry_run=False):
+    """
+    One-shot rewrite of distance_cache.json to canonical ICAO keys, printing
+    what was moved, merged, in conflict or left unmapped.
+
+    Returns:
+        dict: The migration report
+    """
+    iata_to_icao, ambiguous = project_iata_to_icao(index_file)
+    entries = load_json_cache(json_path)
+    migrated, aliases, report = migrate_route_keys(entries, iata_to_icao, load_json_cache(aliases_path))
+    report["ambiguous_iata"] = ambiguous
+
+    print(f"📦 {json_path}: {report['entries_before']} entries -> {report['entries_after']}")
+    print(f"   {report['moved']} IATA keys moved to ICAO keys")
+    print(f"   {len(report['duplicates'])} duplicates merged (same distance under both keys)")
+    print(f"   {len(report['conflicts'])} conflicts (kept the IATA distance the generator was using)")
+    for c in report["conflicts"]:
+        print(f"      ⚠️ {c['key']} ({c['alias']}): kept {c['kept']} nm, dropped {c['dropped']} nm")
+    print(f"   {len(report['unmapped'])} IATA keys left as they are (no unique ICAO code)")
+    for key in report["unmapped"]:
+        print(f"      - {key}")
+    if ambiguous:
+        print(f"   IATA codes used with more than one ICAO code: {', '.join(ambiguous)}")
+    if dry_run:
+        print("🔍 Dry run: nothing written")
+    else:
+        save_json_cache(migrated, json_path)
+        save_json_cache(aliases, aliases_path)
+        print(f"✅ Wrote {json_path} and {aliases_path} ({len(aliases)} aliases)")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Import/export the SQLite distance store, or migrate distance_cache.json to ICAO keys.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("import", "Load a distance_cache.json into the SQLite store"),
+                               ("export", "Write the SQLite store as distance_cache.json")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("db", help="SQLite database (e.g., distance_cache.sqlite)")
+        sub.add_argument("json", nargs="?", default="distance_cache.json", help="JSON cache file")
+    sub = subparsers.add_parser("migrate", help="Rewrite IATA route keys in distance_cache.json to ICAO keys")
+    sub.add_argument("json", nargs="?", default="distance_cache.json", help="JSON cache file")
+    sub.add_argument("--aliases", default=ROUTE_ALIASES_FILE, help=f"IATA alias index to write (default: {ROUTE_ALIASES_FILE})")
+    sub.add_argument("--index", help="Also map IATA codes through this airport index (e.g., airports.idx)")
+    sub.add_argument("--report", help="Also write the migration report to this JSON file")
+    sub.add_argument("--dry-run", action="store_true", help="Only print what would change")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        report = migrate_json_cache(args.json, args.aliases, args.index, args.dry_run)
+        if args.report:
+            save_json_cache(report, args.report)
+        return
+
+    store = SqliteDistanceStore(args.db)
+    try:
+        if args.command == "import":
+            count = store.import_json(args.json)
+            print(f"✅ Imported {count} routes from {args.json} into {args.db}")
+        else:
+            count = store.export_json(args.json)
+            print(f"✅ Exported {count} routes from {args.db} to {args.json}")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
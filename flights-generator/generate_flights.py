@@ -1,33 +1,68 @@
 import csv
 import os
-import shutil
 import json
 import random
 import time
 import argparse
+import glob
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, redirect_stdout
+from bisect import bisect_right
+from collections import Counter
 from datetime import datetime, timedelta
-import requests
 import sys
-from geopy.distance import geodesic
+# requests (http_client, http_cache, phpvms_airports) and numpy/geopy
+# (geo_distance) are imported by the functions that call a provider or compute
+# a distance, so importing this module, --help, validation and fully cached
+# runs do not pay for them.
+from distance_cache import disable_json_mirror, get_distance_cache, get_route_aliases, route_key
+from coordinate_cache import get_coordinate_cache
+from rate_limiter import DEFAULT_RATES_PER_MIN, get_limiter
+from circuit_breaker import PROVIDER_CONCURRENCY, CircuitOpenError, get_breaker, open_breakers, provider_slot
+from airport_index import AIRPORTS_INDEX_FILE, INDEX_MAX_AGE_DAYS, AirportIndex, build_index, open_index, touch_index
+from missing_airports import get_missing_airports_journal
+from run_report import RUN_REPORT_DIR, get_run_report, run_report_path, write_run_report_at_exit
+from schedule_manifest import MANIFEST_FILE, ScheduleManifest, pair_key, sha256_of_json
 
 # Constants
-GLOB_FILTER_SUBFLEETS=[]
 CACHE_FILE = "distance_cache.json"
 AIRPORTS_JSON_FILE = "airports.json"  # Local backup database (28,000+ airports)
 CUSTOM_AIRPORTS_CSV = "custom_airports.csv"  # Custom managed airports
-MISSING_AIRPORTS_FILE = "missing_airports.json"
 AIRCRAFT_CONFIG_FILE = "aircraft_config.json"  # Aircraft configuration (range and airlines)
 START_FLIGHT_NUMBER = 1000
 API_URL = "https://airportgap.com/api/airports/distance"
 AIRPORTDB_IO_API_URL = "https://airportdb.io/api/v1/airport"
 VACENTRAL_API_URL = "https://api.vacentral.net/api/airports"
+AIRPORTS_JSON_URL = os.getenv("AIRPORTS_JSON_URL", "https://raw.githubusercontent.com/mwgg/Airports/master/airports.json")
+AIRPORTS_JSON_SHA256 = os.getenv("AIRPORTS_JSON_SHA256")  # Optional pin for the download
 PHPVMSV7_ENDPOINT = os.getenv("PHPVMSV7_ENDPOINT")
 PHPVMSV7_API_KEY = os.getenv("PHPVMSV7_API_KEY")
 TOKEN = os.getenv("AIRPORT_GAP_TOKEN")
 AIRPORTDB_TOKEN = os.getenv("AIRPORT_DB_TOKEN")
 HEADERS = {"Authorization": f"Bearer token={TOKEN}"}
 TIME_FMT = '%H:%M'
-MAX_REQUESTS_PER_MIN = 100
+MAX_REQUESTS_PER_MIN = DEFAULT_RATES_PER_MIN["airportgap"]  # airportgap budget, enforced by rate_limiter.py
+PREFETCH_WORKERS = 8  # Thread pool size for the prefetch stage
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))  # Process pool size for ALL mode
+BATCH_DISTANCE_DB = "distance_cache.sqlite"  # Shared distance store for ALL mode when DISTANCE_CACHE_DB is unset
+# How new route distances are obtained (--distance-mode):
+#   api    - airportgap IATA distance first, geodesic from coordinates as fallback
+#   local  - geodesic from airport coordinates only, never calls airportgap
+#   verify - like local, then asks airportgap for a sample to report drift
+# Every mode writes the same cache entries (geodesic under the ICAO route key).
+DISTANCE_MODES = ("api", "local", "verify")
+DISTANCE_MODE = os.getenv("DISTANCE_MODE", "api")
+VERIFY_SAMPLE_SIZE = int(os.getenv("DISTANCE_VERIFY_SAMPLE", "5"))  # Routes checked against airportgap in verify mode
+DRIFT_TOLERANCE_PCT = float(os.getenv("DISTANCE_DRIFT_TOLERANCE_PCT", "2"))  # Larger differences are flagged
+# --plan: assumed per-request latency for providers no earlier run report has measured
+PLAN_DEFAULT_LATENCY_SECONDS = 0.5
+PLAN_VERSION = 1
+# Providers that decide whether an airport is "missing"; while either one's
+# circuit breaker is open no missing-airport verdict is cached or logged
+VERDICT_PROVIDERS = ("vacentral", "phpvms")
 
 def load_aircraft_config(config_file=AIRCRAFT_CONFIG_FILE):
     """
@@ -95,10 +130,86 @@ def build_aircrafts_range_by_icao(aircraft_config):
     """
     return {icao: data['range'] for icao, data in aircraft_config.items()}
 
-# Load aircraft configuration from JSON
-_aircraft_config = load_aircraft_config()
-airline_subfleet_by_flight_type = build_airline_subfleet_by_flight_type(_aircraft_config)
-aircrafts_range_by_icao = build_aircrafts_range_by_icao(_aircraft_config)
+class FleetRangeIndex:
+    """
+    Subfleet lookup compiled once from aircraft_config.json.
+
+    For each (airline, flight type) the distinct aircraft ranges are kept
+    sorted, and the subfleet string for every range bracket is built once and
+    interned. A lookup is a single bisect plus an index, and returns exactly
+    what the old per-row scan produced: aircraft in config order whose range
+    is greater than the flight distance, joined with ';'.
+    """
+
+    def __init__(self, subfleet_by_flight_type, range_by_icao):
+        self._subfleet_by_flight_type = subfleet_by_flight_type
+        self._range_by_icao = {icao: float(r) for icao, r in range_by_icao.items()}
+        self._compiled = {}
+
+    def _compile(self, airline, flight_type, filter_subfleets):
+        aircraft = self._subfleet_by_flight_type[airline][flight_type]
+        if filter_subfleets:
+            aircraft = [icao for icao in aircraft if icao in filter_subfleets]
+        ranges = sorted({self._range_by_icao[icao] for icao in aircraft})
+        brackets = [
+            sys.intern(';'.join(icao for icao in aircraft if self._range_by_icao[icao] >= low))
+            for low in ranges
+        ]
+        brackets.append("")
+        return ranges, brackets
+
+    def subfleets(self, airline, flight_type, distance, filter_subfleets=None):
+        """
+        Args:
+            airline: Airline code (e.g. 'CRN')
+            flight_type: 'J' or 'F'
+            distance: Flight distance in nautical miles
+            filter_subfleets: Optional list of allowed aircraft ICAO codes
+
+        Returns:
+            str: ';'-joined aircraft ICAO codes able to fly the distance
+        """
+        key = (airline, flight_type, frozenset(filter_subfleets) if filter_subfleets else None)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(airline, flight_type, key[2])
+        ranges, brackets = compiled
+        return brackets[bisect_right(ranges, distance)]
+
+_aircraft_config = None
+_fleet_range_index = None
+_fleet_lock = threading.Lock()
+
+def get_aircraft_config():
+    """Return aircraft_config.json, loading it on first use."""
+    global _aircraft_config
+    with _fleet_lock:
+        if _aircraft_config is None:
+            _aircraft_config = load_aircraft_config()
+        return _aircraft_config
+
+def get_fleet_range_index():
+    """Return the FleetRangeIndex for aircraft_config.json, built on first use."""
+    global _fleet_range_index
+    config = get_aircraft_config()
+    with _fleet_lock:
+        if _fleet_range_index is None:
+            _fleet_range_index = FleetRangeIndex(build_airline_subfleet_by_flight_type(config),
+                                                 build_aircrafts_range_by_icao(config))
+        return _fleet_range_index
+
+# Module attributes that used to be built at import time
+_LAZY_FLEET_ATTRIBUTES = {
+    "airline_subfleet_by_flight_type": lambda: build_airline_subfleet_by_flight_type(get_aircraft_config()),
+    "aircrafts_range_by_icao": lambda: build_aircrafts_range_by_icao(get_aircraft_config()),
+    "aircraft_config_sha256": lambda: sha256_of_json(get_aircraft_config()),
+    "fleet_range_index": get_fleet_range_index,
+}
+
+def __getattr__(name):
+    if name in _LAZY_FLEET_ATTRIBUTES:
+        return _LAZY_FLEET_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 special_code_to_airline = {
     "CRC" : "CRN"
@@ -120,63 +231,27 @@ def calculate_flight_times(distance_nm, avg_speed_knots=250):
     arr_time = dpt_time + timedelta(minutes=flight_time_min)
     return (dpt_time.strftime(TIME_FMT), arr_time.strftime(TIME_FMT), str(int(flight_time_min)))
 
-def _load_cache(path=CACHE_FILE):
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-def _save_cache(cache: dict, path=CACHE_FILE):
-    tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
-    os.replace(tmp, path)
-
 def _key_for_route(from_code: str, to_code: str) -> str:
-    a, b = from_code.strip().upper(), to_code.strip().upper()
-    return f"{min(a,b)}-{max(a,b)}"
+    return route_key(from_code, to_code)
 
-def load_missing_airports(path=MISSING_AIRPORTS_FILE):
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+def _has_codes(code1, code2):
+    return bool(code1 and code2 and code1.strip() and code2.strip())
 
-def save_missing_airports(missing_airports: dict, path=MISSING_AIRPORTS_FILE):
-    tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(missing_airports, f, ensure_ascii=False, indent=2, sort_keys=True)
-    os.replace(tmp, path)
+# IATA route keys airportgap could not answer this run (skip re-asking in the generation loop)
+_airportgap_failed_routes = set()
 
 def log_missing_airport(icao_code, found_in=None, coordinates=None):
-    missing_airports = load_missing_airports()
+    """Buffer a missing-airport finding; written out by flush_missing_airports()."""
+    if not get_missing_airports_journal().log(icao_code, found_in, coordinates):
+        return
     icao_upper = icao_code.strip().upper()
-    
-    if icao_upper not in missing_airports:
-        entry = {
-            "icao": icao_upper,
-            "first_seen": datetime.now().isoformat(),
-            "found_in": found_in,
-            "status": "found" if found_in else "not_found"
-        }
-        
-        if coordinates:
-            entry["latitude"] = coordinates[0]
-            entry["longitude"] = coordinates[1]
-        
-        missing_airports[icao_upper] = entry
-        save_missing_airports(missing_airports)
-        
-        if found_in:
-            print(f"📝 Logged {icao_upper} as missing from VAcentral (found in {found_in})")
-        else:
-            print(f"📝 Logged {icao_upper} as missing from VAcentral (NOT FOUND ANYWHERE)")
+    if found_in:
+        print(f"📝 Logged {icao_upper} as missing from VAcentral (found in {found_in})")
+    else:
+        print(f"📝 Logged {icao_upper} as missing from VAcentral (NOT FOUND ANYWHERE)")
+
+def flush_missing_airports():
+    get_missing_airports_journal().flush()
 
 def load_custom_airports_csv(path=CUSTOM_AIRPORTS_CSV):
     if not os.path.exists(path):
@@ -233,12 +308,16 @@ def get_airport_from_custom_csv(icao_code, custom_airports=None):
 
 def verify_airport_in_phpvms(icao_code, verbose=True):
     """
-    Verify if an airport exists in phpVMS v7 system via API.
-    
+    Verify if an airport exists in phpVMS v7 system.
+
+    Answered from the local airport snapshot (see phpvms_airports.py) when it
+    has the ICAO; otherwise one ``GET /api/airports/{icao}`` request is sent and
+    a hit is added to the snapshot.
+
     Args:
         icao_code: Airport ICAO code
         verbose: Print debug information
-    
+
     Returns:
         Airport data if found, None otherwise
     """
@@ -248,76 +327,64 @@ def verify_airport_in_phpvms(icao_code, verbose=True):
             print(f"   PHPVMSV7_ENDPOINT: {PHPVMSV7_ENDPOINT or 'NOT SET'}")
             print(f"   PHPVMSV7_API_KEY: {'SET (' + PHPVMSV7_API_KEY[:10] + '...)' if PHPVMSV7_API_KEY else 'NOT SET'}")
         return None
-    
+
+    import requests
+    from http_client import get_session
+    from phpvms_airports import get_phpvms_snapshot
+
     icao_upper = icao_code.strip().upper()
+    snapshot = get_phpvms_snapshot(PHPVMSV7_ENDPOINT, PHPVMSV7_API_KEY)
+    airport = snapshot.get(icao_upper) if snapshot is not None else None
+    if snapshot is not None:
+        get_run_report().cache_lookup("phpvms_snapshot", airport is not None)
+    if airport is not None:
+        print(f"✅ Verified {icao_code} exists in phpVMS v7 (snapshot {snapshot.refreshed_at})")
+        return airport
+
     base_url = PHPVMSV7_ENDPOINT.rstrip('/')
     url = f"{base_url}/api/airports/{icao_upper}"
     headers = {"X-API-Key": PHPVMSV7_API_KEY}
-    
     if verbose:
-        print(f"\n{'='*60}")
-        print(f"phpVMS v7 API Check for {icao_upper}")
-        print(f"{'='*60}")
-        print(f"URL: {url}")
-        print(f"Headers: X-API-Key: {PHPVMSV7_API_KEY[:10]}...{PHPVMSV7_API_KEY[-4:]}")
-        print(f"{'='*60}")
-    
+        print(f"🔍 {icao_upper} not in phpVMS v7 snapshot, checking {url}")
+
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if verbose:
-            print(f"Status Code: {response.status_code}")
-            print(f"Response Headers: {dict(response.headers)}")
-        
+        with provider_slot("phpvms"):
+            response = get_session("phpvms").get(url, headers=headers)
+        get_limiter("phpvms").observe(response)
+
         if response.status_code == 200:
             try:
                 data = response.json()
-                if verbose:
-                    print(f"Response Body:")
-                    print(json.dumps(data, indent=2))
-                
-                if 'data' in data:
-                    print(f"✅ Verified {icao_code} exists in phpVMS v7")
-                    if verbose:
-                        print(f"{'='*60}\n")
-                    return data['data']
-                else:
-                    print(f"⚠️ Response missing 'data' field")
-                    if verbose:
-                        print(f"Available keys: {list(data.keys())}")
-                        print(f"{'='*60}\n")
-                    return None
             except json.JSONDecodeError as e:
                 print(f"❌ Failed to parse JSON response: {e}")
                 print(f"Raw response: {response.text[:500]}")
-                if verbose:
-                    print(f"{'='*60}\n")
                 return None
-                
-        elif response.status_code == 404:
+            if 'data' in data:
+                print(f"✅ Verified {icao_code} exists in phpVMS v7")
+                if snapshot is not None:
+                    snapshot.add(icao_upper, data['data'])
+                return data['data']
+            print(f"⚠️ Response missing 'data' field")
             if verbose:
-                print(f"Response Body: {response.text}")
+                print(f"Available keys: {list(data.keys())}")
+            return None
+        elif response.status_code == 404:
             print(f"❌ Airport {icao_code} NOT found in phpVMS v7")
-            if verbose:
-                print(f"{'='*60}\n")
             return None
         else:
-            if verbose:
-                print(f"Response Body: {response.text[:500]}")
             print(f"⚠️ phpVMS v7 API error ({response.status_code})")
             if verbose:
-                print(f"{'='*60}\n")
+                print(f"Response Body: {response.text[:200]}")
             return None
-            
+
+    except CircuitOpenError:
+        print(f"🔌 phpVMS v7 circuit open - skipped check for {icao_upper}")
+        return None
     except requests.exceptions.Timeout:
         print(f"⏱️ Timeout connecting to phpVMS v7 ({url})")
-        if verbose:
-            print(f"{'='*60}\n")
         return None
     except requests.exceptions.RequestException as e:
         print(f"❌ Error connecting to phpVMS v7: {e}")
-        if verbose:
-            print(f"{'='*60}\n")
         return None
 
 def generate_csv_line_for_missing_airport(icao_code, coords=None, source=None):
@@ -327,59 +394,118 @@ def generate_csv_line_for_missing_airport(icao_code, coords=None, source=None):
     
     return f"{icao_code.upper()},,,,,,{lat},{lon},,,,,{notes}"
 
-def load_local_airports_db(json_file=AIRPORTS_JSON_FILE):
+def load_local_airports_db(json_file=AIRPORTS_JSON_FILE, index_file=AIRPORTS_INDEX_FILE):
+    """
+    Open the memory-mapped airport index, building it from airports.json if needed.
+
+    The index (see airport_index.py) is kept between runs and only rebuilt
+    when missing, from an older format, or older than INDEX_MAX_AGE_DAYS
+    (airport_index.py, set with the AIRPORTS_INDEX_MAX_AGE_DAYS env var);
+    only then is airports.json downloaded (see resumable_download.py) and
+    parsed. A stale index whose source is unchanged upstream (same ETag) is
+    kept without downloading, and is still used if the download fails.
+
+    Returns:
+        AirportIndex: The opened index, or None if no local database is available
+    """
+    index = open_index(index_file)
+    if index is not None:
+        print(f"✅ Using airport index {index_file} ({len(index)} airports, built {index.age_days():.0f} days ago)")
+        return index
+
     if not os.path.exists(json_file):
-        print(f"📥 airports.json not found. Attempting to download from GitHub...")
-        download_url = "https://raw.githubusercontent.com/mwgg/Airports/master/airports.json"
-        
+        import requests
+        from resumable_download import DownloadError, download_file, load_download_meta
+
+        # A stale index can be kept if airports.json has not changed upstream since it was built
+        stale = open_index(index_file, max_age_days=None)
+        meta = load_download_meta(json_file)
+        etag = meta.get("etag") if stale is not None and meta.get("sha256") == stale.source_sha256 else None
+
+        print(f"📥 airports.json not found. Attempting to download from {AIRPORTS_JSON_URL}...")
         try:
-            response = requests.get(download_url, timeout=30)
-            response.raise_for_status()
-            
-            with open(json_file, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            
-            print(f"✅ Successfully downloaded airports.json ({len(response.text) / 1024 / 1024:.2f} MB)")
-            
-        except requests.exceptions.RequestException as e:
+            result = download_file(AIRPORTS_JSON_URL, json_file, provider="github",
+                                   if_none_match=etag, expected_sha256=AIRPORTS_JSON_SHA256)
+        except (requests.exceptions.RequestException, DownloadError) as e:
             print(f"⚠️ Could not download airports.json: {e}")
+            if stale is not None:
+                print(f"   Continuing with the existing airport index ({stale.age_days():.0f} days old)...")
+                return stale
             print(f"   Continuing without local airport database...")
             return None
-    
+
+        if result["status"] == "not_modified":
+            stale.close()
+            touch_index(index_file)
+            print(f"✅ airports.json unchanged upstream (ETag {etag}); reusing airport index {index_file}")
+            return AirportIndex(index_file)
+        if stale is not None:
+            stale.close()
+        resumed = " after resuming" if result["resumed"] else ""
+        print(f"✅ Successfully downloaded airports.json{resumed} ({result['size'] / 1024 / 1024:.2f} MB, "
+              f"sha256 {result['sha256'][:12]})")
+
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            airports = json.load(f)
-            print(f"✅ Loaded {len(airports)} airports from local database: {json_file}")
-            return airports
+        count = build_index(json_file, index_file)
+        print(f"✅ Built airport index {index_file} with {count} airports from {json_file}")
+        return AirportIndex(index_file)
     except Exception as e:
-        print(f"⚠️ Error loading local airports database: {e}")
+        print(f"⚠️ Error building local airports index: {e}")
         return None
 
+class LazyAirportsDb:
+    """
+    Stand-in for the airport index that calls load_local_airports_db only on
+    the first lookup, so runs whose airports are all answered by the caches
+    never open, download or build it. Safe to share between prefetch threads.
+    """
+
+    def __init__(self, loader=load_local_airports_db):
+        self._loader = loader
+        self._db = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with self._lock:
+            if not self._loaded:
+                self._db = self._loader()
+                self._loaded = True
+            return self._db
+
+    def __contains__(self, icao_code):
+        db = self._open()
+        return db is not None and icao_code in db
+
+    def coordinates(self, icao_code):
+        db = self._open()
+        return db.coordinates(icao_code) if db is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+            self._loaded = False
+
 def get_airport_from_local_db(icao_code, airports_db):
     if airports_db is None:
         return None
     
-    icao_upper = icao_code.strip().upper()
-    
-    if icao_upper in airports_db:
-        airport = airports_db[icao_upper]
-        lat = airport.get('lat')
-        lon = airport.get('lon')
-        
-        if lat is not None and lon is not None:
-            return (float(lat), float(lon))
-    
-    return None
+    return airports_db.coordinates(icao_code)
 
 def get_airport_from_airportdb_io(icao_code):
     if not AIRPORTDB_TOKEN:
         return None
     
+    import requests
+    from http_cache import cached_get
+
     icao_upper = icao_code.strip().upper()
     url = f"{AIRPORTDB_IO_API_URL}/{icao_upper}?apiToken={AIRPORTDB_TOKEN}"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = cached_get("airportdb_io", url, slot=provider_slot)
         
         if response.status_code == 200:
             data = response.json()
@@ -406,6 +532,8 @@ def get_airport_from_airportdb_io(icao_code):
     except ValueError as e:
         print(f"❌ Error parsing AirportDB.io response for {icao_code}: {e}")
         return None
+    except CircuitOpenError:
+        return None
     except requests.exceptions.Timeout:
         print(f"⏱️ Timeout fetching from AirportDB.io for {icao_code}")
         return None
@@ -414,11 +542,14 @@ def get_airport_from_airportdb_io(icao_code):
         return None
 
 def get_airport_from_vacentral(icao_code):
+    import requests
+    from http_cache import cached_get
+
     icao_upper = icao_code.strip().upper()
     url = f"{VACENTRAL_API_URL}/{icao_upper}"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = cached_get("vacentral", url, slot=provider_slot)
         
         if response.status_code == 200:
             data = response.json()
@@ -442,6 +573,9 @@ def get_airport_from_vacentral(icao_code):
     except ValueError as e:
         print(f"❌ Error parsing VAcentral response for {icao_code}: {e}")
         return None
+    except CircuitOpenError:
+        print(f"🔌 VAcentral circuit open - skipped lookup for {icao_code}")
+        return None
     except requests.exceptions.Timeout:
         print(f"⏱️ Timeout fetching from VAcentral for {icao_code}")
         return None
@@ -449,7 +583,7 @@ def get_airport_from_vacentral(icao_code):
         print(f"❌ Network error with VAcentral for {icao_code}: {e}")
         return None
 
-def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
+def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None, verbose=True):
     """
     Retrieve airport coordinates using ICAO code.
     Priority order:
@@ -463,14 +597,38 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
     - If NOT in VAcentral BUT in phpVMS v7 → Use it (already in our system)
     - If NOT in VAcentral AND NOT in phpVMS v7 → Search externally
     - If found externally → MUST add to phpVMS v7 before continuing
+
+    Results are kept in the persistent coordinate cache (see coordinate_cache.py):
+    resolved airports for AIRPORT_CACHE_TTL_DAYS, unusable ones for
+    AIRPORT_NEGATIVE_TTL_MINUTES so repeated failures skip the network.
+
+    With ``verbose=False`` the per-airport "add this line" instructions are not
+    printed; the preflight collects failures and reports them together.
     """
     icao_upper = icao_code.strip().upper()
+    coord_cache = get_coordinate_cache()
+
+    cached = coord_cache.get(icao_upper)
+    get_run_report().cache_lookup("coordinates", cached is not None and cached["status"] == "found")
+    if cached is not None:
+        if cached["status"] == "found":
+            return (cached["lat"], cached["lon"])
+        if custom_airports and icao_upper in custom_airports:
+            # custom_airports.csv was edited since the failure was cached - look again
+            coord_cache.invalidate(icao_upper)
+        elif cached["status"] == "not_in_phpvms":
+            print(f"⏭️ {icao_upper} recently found only in {cached['source']} (cached) - skipping lookups")
+            raise Exception(f"Airport {icao_upper} must be added to phpVMS v7 before continuing")
+        else:
+            print(f"⏭️ {icao_upper} recently not found in any database (cached) - skipping lookups")
+            raise Exception(f"Airport {icao_upper} not found - add to custom_airports.csv and phpVMS v7")
     
     # TIER 1: Check VAcentral API (PRIMARY SOURCE)
     print(f"🔍 Checking VAcentral API for {icao_upper}...")
     coords = get_airport_from_vacentral(icao_code)
     if coords is not None:
         print(f"✅ {icao_upper} found in VAcentral - using community data")
+        coord_cache.set_found(icao_upper, coords, "vacentral")
         return coords
     
     # NOT in VAcentral - now check OUR phpVMS v7 system IMMEDIATELY
@@ -486,6 +644,7 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
         # Try to get coordinates from custom CSV first
         coords = get_airport_from_custom_csv(icao_code, custom_airports)
         if coords is not None:
+            coord_cache.set_found(icao_upper, coords, "phpvms+custom_csv")
             return coords
         
         # Extract coordinates from phpVMS v7 response
@@ -494,11 +653,18 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
         
         if lat is not None and lon is not None:
             print(f"📍 Using coordinates from phpVMS v7: {lat}, {lon}")
-            return (float(lat), float(lon))
+            coords = (float(lat), float(lon))
+            coord_cache.set_found(icao_upper, coords, "phpvms")
+            return coords
         else:
             print(f"⚠️ {icao_upper} in phpVMS v7 but missing coordinates!")
             # Fall through to external search
     
+    unavailable = [p for p in open_breakers() if p in VERDICT_PROVIDERS]
+    if unavailable:
+        # The airport may well be in VAcentral / phpVMS v7; cache and log no verdict
+        raise Exception(f"Airport {icao_upper} could not be checked: {', '.join(unavailable)} unavailable (circuit open)")
+
     # NOT in VAcentral AND NOT in phpVMS v7 - search external sources
     print(f"⚠️ {icao_upper} not found in phpVMS v7, checking external sources...")
     
@@ -531,6 +697,9 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
     
     if final_coords:
         # Found in external source - MUST add to phpVMS v7
+        coord_cache.set_missing(icao_upper, "not_in_phpvms", found_source, final_coords)
+        if not verbose:
+            raise Exception(f"Airport {icao_upper} must be added to phpVMS v7 before continuing")
         csv_line = generate_csv_line_for_missing_airport(icao_code, final_coords, found_source)
         print(f"\n{'='*80}")
         print(f"❌ CRITICAL: {icao_upper} found in {found_source} but NOT in phpVMS v7!")
@@ -546,6 +715,9 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
     
     # NOT found anywhere
     print(f"❌ Could not find airport {icao_code} in any database")
+    coord_cache.set_missing(icao_upper, "not_found")
+    if not verbose:
+        raise Exception(f"Airport {icao_upper} not found - add to custom_airports.csv and phpVMS v7")
     csv_line = generate_csv_line_for_missing_airport(icao_code, None, None)
     print(f"\n{'='*80}")
     print(f"❌ CRITICAL: {icao_upper} NOT FOUND in any database!")
@@ -565,11 +737,11 @@ def get_airport_coordinates(icao_code, airports_db=None, custom_airports=None):
     raise Exception(f"Airport {icao_upper} not found - add to custom_airports.csv and phpVMS v7")
 
 def calculate_distance_by_icao(icao1, icao2, cache_path: str = CACHE_FILE, airports_db=None, custom_airports=None):
-    cache = _load_cache(cache_path)
+    cache = get_distance_cache(cache_path)
     key = _key_for_route(icao1, icao2)
 
     if key in cache:
-        return int(cache[key])
+        return cache.get(key)
     
     print(f"🌍 Calculating distance using ICAO codes: {icao1} → {icao2}")
     
@@ -580,53 +752,90 @@ def calculate_distance_by_icao(icao1, icao2, cache_path: str = CACHE_FILE, airpo
         print(f"❌ Could not retrieve coordinates for {icao1} or {icao2}")
         return None
     
-    distance = geodesic(coords1, coords2)
-    nm = int(distance.nautical)
+    from geo_distance import distance_nm
+    nm = int(distance_nm(coords1, coords2))
     
-    cache[key] = nm
-    _save_cache(cache, cache_path)
+    cache.set(key, nm, source="geodesic")
     
     print(f"✅ Distance calculated: {nm} nautical miles")
     return nm
 
-def fetch_distance(from_iata, to_iata, from_icao=None, to_icao=None, cache_path: str = CACHE_FILE, airports_db=None, custom_airports=None):
-    cache = _load_cache(cache_path)
-    
-    if from_iata and to_iata and from_iata.strip() and to_iata.strip():
-        key = _key_for_route(from_iata, to_iata)
+def _fetch_airportgap_distance(from_iata, to_iata, cache, cache_key=None):
+    """
+    Ask the airportgap API for the IATA route distance and cache the result
+    under ``cache_key`` (the canonical ICAO route key; the IATA route key if
+    not given). ``cache=None`` only returns it, as verify mode does.
 
-        if key in cache:
-            return int(cache[key])
-        
-        payload = {"from": from_iata, "to": to_iata}
-        print(f"📡 API call for IATA distance: {from_iata} → {to_iata}")
-        backoff = 30
-        max_wait = 5 * 60
-
-        waited = 0
-        while True:
-            response = requests.post(API_URL, data=payload, headers=HEADERS)
-            if response.status_code == 200:
-                data = response.json()
-                nm = int(data["data"]["attributes"]["nautical_miles"])
-                cache[key] = nm
-                _save_cache(cache, cache_path)
-                print(f"✅ IATA distance retrieved: {nm} nautical miles")
-                return nm
+    Returns:
+        int: Distance in nautical miles, or None if the API could not answer
+    """
+    import requests
+    from http_client import get_session
+
+    key = _key_for_route(from_iata, to_iata)
+    payload = {"from": from_iata, "to": to_iata}
+    print(f"📡 API call for IATA distance: {from_iata} → {to_iata}")
+    backoff = 30
+    max_wait = 5 * 60
+
+    limiter = get_limiter("airportgap")
+    waited = 0
+    while True:
+        try:
+            with provider_slot("airportgap"):
+                response = get_session("airportgap").post(API_URL, data=payload, headers=HEADERS)
+        except CircuitOpenError:
+            print(f"🔌 airportgap circuit open - using ICAO fallback for {from_iata} → {to_iata}")
+            break
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Network error with airportgap for {from_iata} → {to_iata}: {e}")
+            break
+        retry_after = limiter.observe(response)
+        if response.status_code == 200:
+            data = response.json()
+            nm = int(data["data"]["attributes"]["nautical_miles"])
+            if cache is not None:
+                cache.set(cache_key or key, nm, source="airportgap")
+            print(f"✅ IATA distance retrieved: {nm} nautical miles")
+            return nm
+
+        if response.status_code == 429:
+            if get_breaker("airportgap").is_open():
+                print("⚠️ airportgap keeps rate limiting, falling back to ICAO calculation")
+                break
+            # Prefer the server's Retry-After; otherwise back off exponentially
+            sleep_s = max(1, retry_after) if retry_after is not None else backoff
+            sleep_s = min(sleep_s, max_wait - waited) if max_wait else sleep_s
+            if sleep_s <= 0:
+                print("⚠️ Rate limit persisted, falling back to ICAO calculation")
+                break
+            print(f"⏳ Rate limit hit. Waiting {sleep_s:.0f} seconds...")
+            limiter.pause(sleep_s)  # the next acquire() waits, and so do other workers
+            waited += sleep_s
+            backoff = min(backoff * 2, 120)
+            continue
 
-            if response.status_code == 429:
-                sleep_s = min(backoff, max_wait - waited) if max_wait else backoff
-                if sleep_s <= 0:
-                    print("⚠️ Rate limit persisted, falling back to ICAO calculation")
-                    break
-                print(f"⏳ Rate limit hit. Waiting {sleep_s} seconds...")
-                time.sleep(sleep_s)
-                waited += sleep_s
-                backoff = min(backoff * 2, 120)
-                continue
+        print(f"⚠️ IATA API failed ({response.status_code}), trying ICAO fallback")
+        break
 
-            print(f"⚠️ IATA API failed ({response.status_code}), trying ICAO fallback")
-            break
+    _airportgap_failed_routes.add(key)
+    return None
+
+def fetch_distance(from_iata, to_iata, from_icao=None, to_icao=None, cache_path: str = CACHE_FILE, airports_db=None, custom_airports=None):
+    cache = get_distance_cache(cache_path)
+    nm = _cached_distance(from_iata, to_iata, from_icao, to_icao, cache)
+    if nm is not None:
+        return nm
+
+    if _has_codes(from_iata, to_iata):
+        key = _key_for_route(from_iata, to_iata)
+        if DISTANCE_MODE == "api" and key not in _airportgap_failed_routes:
+            icao_key = _key_for_route(from_icao, to_icao) if _has_codes(from_icao, to_icao) else None
+            nm = _fetch_airportgap_distance(from_iata, to_iata, cache, icao_key)
+            if nm is not None:
+                if icao_key:
+                    get_route_aliases().add(key, icao_key)
+                return nm
     else:
         print(f"⚠️ Missing IATA codes (from: '{from_iata}', to: '{to_iata}'), using ICAO fallback")
     
@@ -640,6 +849,468 @@ def fetch_distance(from_iata, to_iata, from_icao=None, to_icao=None, cache_path:
     error_msg += f"  Destination: {to_icao} (IATA: {to_iata or 'N/A'})\n"
     raise Exception(error_msg)
 
+def _cached_distance(from_iata, to_iata, from_icao, to_icao, cache, promote=True):
+    """
+    Look a route up under its canonical ICAO key (found through the IATA alias
+    index when the ICAO codes are not given), then under an IATA key written
+    before the cache was keyed by ICAO. Such a legacy hit is copied to the
+    ICAO key so later lookups take the canonical path; ``promote=False``
+    (the --plan dry run) only looks.
+
+    Returns:
+        int: Distance in nautical miles, or None if the route is not cached
+    """
+    aliases = get_route_aliases()
+    iata_key = _key_for_route(from_iata, to_iata) if _has_codes(from_iata, to_iata) else None
+    if _has_codes(from_icao, to_icao):
+        icao_key = _key_for_route(from_icao, to_icao)
+    else:
+        icao_key = aliases.get(iata_key) if iata_key else None
+    if icao_key is not None:
+        nm = cache.get(icao_key)
+        if nm is not None:
+            if iata_key and promote:
+                aliases.add(iata_key, icao_key)
+            return nm
+    if iata_key is None:
+        return None
+    nm = cache.get(iata_key)
+    if nm is not None and icao_key is not None and promote:
+        cache.set(icao_key, nm, source="iata_alias")
+        aliases.add(iata_key, icao_key)
+    return nm
+
+def _is_distance_cached(from_iata, to_iata, from_icao, to_icao, cache):
+    return _cached_distance(from_iata, to_iata, from_icao, to_icao, cache) is not None
+
+def prefetch_distances(pairs, airports_db=None, custom_airports=None, cache_path: str = CACHE_FILE, max_workers=PREFETCH_WORKERS):
+    """
+    Resolve every uncached route distance up front on a bounded thread pool.
+
+    Runs in three stages, mirroring fetch_distance:
+    1. airportgap distance for uncached routes that have IATA codes
+       (``api`` distance mode only)
+    2. coordinates for the unique ICAOs of routes still uncached
+    3. geodesic distance for those routes, computed in one batch call
+
+    In ``verify`` mode a sample of the routes computed in stage 3 is then
+    compared with airportgap (see verify_distance_sample).
+
+    Concurrency per provider is capped by PROVIDER_CONCURRENCY. Failures are
+    not raised here; airports that could not be resolved are returned so the
+    caller can report all of them at once (see preflight_routes).
+
+    Returns:
+        dict: Unresolved ICAO -> coordinate cache entry (None if not cached)
+    """
+    cache = get_distance_cache(cache_path)
+    report = get_run_report()
+    routes = {}
+    for (a1_icao, a1_iata), (a2_icao, a2_iata) in pairs:
+        cached = _is_distance_cached(a1_iata, a2_iata, a1_icao, a2_icao, cache)
+        report.cache_lookup("distance", cached)
+        if not cached:
+            routes.setdefault(_key_for_route(a1_icao, a2_icao), (a1_icao, a1_iata, a2_icao, a2_iata))
+
+    if not routes:
+        print(f"✅ Prefetch: all {len(pairs)} route distances already cached")
+        return {}
+
+    print(f"🚀 Prefetch: resolving {len(routes)} uncached routes with {max_workers} workers")
+    started = time.monotonic()
+
+    def _safe(func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            print(f"⚠️ Prefetch deferred {args[0]}: {e}")
+            return None
+
+    def _resolve(icao):
+        try:
+            return get_airport_coordinates(icao, airports_db, custom_airports, verbose=False)
+        except Exception as e:
+            print(f"⚠️ Prefetch could not resolve {icao}: {e}")
+            return None
+
+    coords_by_icao = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        iata_routes = {}
+        for icao_key, (a1_icao, a1_iata, a2_icao, a2_iata) in routes.items():
+            if _has_codes(a1_iata, a2_iata):
+                iata_routes.setdefault(_key_for_route(a1_iata, a2_iata), (a1_iata, a2_iata, icao_key))
+        if DISTANCE_MODE == "api":
+            with report.stage("distance"):
+                list(pool.map(lambda r: _safe(_fetch_airportgap_distance, r[0], r[1], cache, r[2]), iata_routes.values()))
+
+        remaining = [r for r in routes.values() if not _is_distance_cached(r[1], r[3], r[0], r[2], cache)]
+        icaos = sorted({r[0].strip().upper() for r in remaining} | {r[2].strip().upper() for r in remaining})
+        if icaos:
+            print(f"🚀 Prefetch: resolving coordinates for {len(icaos)} airports")
+            with report.stage("resolve"):
+                coords_by_icao = dict(zip(icaos, pool.map(_resolve, icaos)))
+
+    resolved = []
+    for a1_icao, a1_iata, a2_icao, a2_iata in remaining:
+        coords1 = coords_by_icao.get(a1_icao.strip().upper())
+        coords2 = coords_by_icao.get(a2_icao.strip().upper())
+        if coords1 is not None and coords2 is not None:
+            resolved.append((_key_for_route(a1_icao, a2_icao), (coords1, coords2)))
+    if resolved:
+        from geo_distance import batch_distances_nm
+        with report.stage("distance"):
+            distances = batch_distances_nm([coords for _, coords in resolved])
+            for (key, _), nm in zip(resolved, distances):
+                cache.set(key, int(nm), source="geodesic")
+        print(f"✅ Computed {len(resolved)} geodesic distances in one batch")
+        if DISTANCE_MODE == "verify":
+            computed = {key for key, _ in resolved}
+            verify_distance_sample([r for r in remaining if _key_for_route(r[0], r[2]) in computed], cache)
+
+    coord_cache = get_coordinate_cache()
+    failures = {icao: coord_cache.get(icao) for icao, coords in coords_by_icao.items() if coords is None}
+    cache.flush()
+    flush_missing_airports()
+    print(f"✅ Prefetch completed in {time.monotonic() - started:.1f}s")
+    return failures
+
+def verify_distance_sample(routes, cache, sample_size=VERIFY_SAMPLE_SIZE):
+    """
+    Compare locally computed distances with airportgap for a random sample.
+
+    The API answers are only printed, never cached, so a verify run leaves
+    the same cache entries as a local run.
+
+    Args:
+        routes: (from_icao, from_iata, to_icao, to_iata) tuples computed locally
+
+    Returns:
+        list: (route, local nm, airportgap nm) for every sampled route airportgap answered
+    """
+    routes = [r for r in routes if r[1] and r[3] and r[1].strip() and r[3].strip()]
+    sample = random.Random(0).sample(routes, min(sample_size, len(routes)))
+    if not sample:
+        return []
+    print(f"🔎 Verify: comparing {len(sample)} of {len(routes)} computed distances with airportgap")
+    compared = []
+    drifted = 0
+    for a1_icao, a1_iata, a2_icao, a2_iata in sample:
+        local_nm = cache.get(_key_for_route(a1_icao, a2_icao))
+        api_nm = _fetch_airportgap_distance(a1_iata, a2_iata, None)
+        if api_nm is None:
+            continue
+        compared.append((_key_for_route(a1_icao, a2_icao), local_nm, api_nm))
+        drift = abs(local_nm - api_nm) * 100 / max(api_nm, 1)
+        if drift > DRIFT_TOLERANCE_PCT:
+            drifted += 1
+        flag = "⚠️" if drift > DRIFT_TOLERANCE_PCT else "✅"
+        print(f"   {flag} {a1_icao} → {a2_icao}: local {local_nm} nm, airportgap {api_nm} nm ({drift:.1f}%)")
+    if drifted:
+        print(f"⚠️ Verify: {drifted} of {len(compared)} sampled distances differ by more than {DRIFT_TOLERANCE_PCT:g}%")
+    return compared
+
+def print_preflight_report(failures):
+    """
+    Print every airport the preflight could not resolve, grouped like the
+    missing airports summary, with ready-to-paste custom_airports.csv lines.
+
+    Args:
+        failures: Unresolved ICAO -> coordinate cache entry (None if unknown)
+    """
+    not_in_phpvms = {icao: e for icao, e in failures.items() if e and e.get("status") == "not_in_phpvms"}
+    unavailable = [p for p in open_breakers() if p in VERDICT_PROVIDERS]
+    unchecked = sorted(icao for icao, e in failures.items() if e is None) if unavailable else []
+    not_found = sorted(icao for icao in failures if icao not in not_in_phpvms and icao not in unchecked)
+
+    print("\n" + "="*80)
+    print(f"❌ PREFLIGHT FAILED - {len(failures)} airports could not be resolved")
+    print("="*80)
+    if not_in_phpvms:
+        print(f"\n🟡 Found in other sources but NOT in phpVMS v7 ({len(not_in_phpvms)} airports):")
+        print("-"*80)
+        print("\nAdd these lines to custom_airports.csv:\n")
+        for icao in sorted(not_in_phpvms):
+            entry = not_in_phpvms[icao]
+            print(generate_csv_line_for_missing_airport(icao, (entry["lat"], entry["lon"]), entry.get("source")))
+    if not_found:
+        print(f"\n🔴 NOT FOUND ANYWHERE ({len(not_found)} airports):")
+        print("-"*80)
+        print("\n⚠️ REQUIRES MANUAL COORDINATES - Add these lines to custom_airports.csv:\n")
+        for icao in not_found:
+            print(generate_csv_line_for_missing_airport(icao, None, None))
+    if unchecked:
+        print(f"\n⚪ NOT CHECKED - {', '.join(unavailable)} unavailable ({len(unchecked)} airports):")
+        print("-"*80)
+        print(f"   {', '.join(unchecked)}")
+        print("\n   Nothing was cached for these airports; re-run once the provider is back.")
+    print("\n" + "="*80)
+    print("📝 NEXT STEPS:")
+    print("1. Add the lines above to custom_airports.csv (fill in missing coordinates)")
+    print("2. Import custom_airports.csv into phpVMS v7")
+    print("3. Re-run this script - resolved airports and distances are cached")
+    print("="*80 + "\n")
+
+def preflight_routes(pairs):
+    """
+    Resolve every route distance, and every airport behind a distance that is
+    not cached yet, before any output file is opened.
+
+    All lookups run concurrently in one pass (see prefetch_distances) and every
+    unresolved airport is reported together instead of one per rerun.
+
+    The airport index is only opened if a lookup needs it (see LazyAirportsDb).
+
+    Returns:
+        LazyAirportsDb: The airport index handle, for generate_flights to reuse
+
+    Raises:
+        Exception: If any airport could not be resolved
+    """
+    airports_db = LazyAirportsDb()
+    custom_airports = load_custom_airports_csv()
+    failures = prefetch_distances(pairs, airports_db, custom_airports)
+    if failures:
+        print_preflight_report(failures)
+        raise Exception(f"Preflight failed: {len(failures)} airports could not be resolved "
+                        f"({', '.join(sorted(failures))})")
+    return airports_db
+
+def _measured_latencies(report_dir=RUN_REPORT_DIR):
+    """
+    Returns:
+        dict: Provider -> median request latency (seconds) from the newest run report that made requests
+    """
+    for path in sorted(glob.glob(os.path.join(report_dir, "*.json")), key=os.path.getmtime, reverse=True):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                providers = json.load(f).get("providers")
+        except (OSError, ValueError):
+            continue
+        if providers:
+            return {name: p["latency_ms"]["p50"] / 1000 for name, p in providers.items() if p.get("latency_ms")}
+    return {}
+
+def _plan_airports(icaos, custom_airports, airports_db, snapshot):
+    """
+    Predict how each airport would be resolved by get_airport_coordinates,
+    from local data only.
+
+    Returns:
+        tuple: (counts dict, {provider: [expected calls, max calls]})
+    """
+    from http_cache import is_fresh
+
+    coord_cache = get_coordinate_cache()
+    counts = {"coordinate_cache": 0, "cached_failures": [], "remote": 0}
+    calls = {"vacentral": [0, 0], "phpvms": [0, 0], "airportdb_io": [0, 0]}
+    for icao in sorted(icaos):
+        cached = coord_cache.get(icao)
+        if cached is not None and (cached["status"] == "found" or icao not in custom_airports):
+            if cached["status"] == "found":
+                counts["coordinate_cache"] += 1
+            else:
+                counts["cached_failures"].append(icao)
+            continue
+        counts["remote"] += 1
+        if not is_fresh("vacentral", f"{VACENTRAL_API_URL}/{icao}"):
+            calls["vacentral"][0] += 1
+            calls["vacentral"][1] += 1
+        # Everything below is only asked when VAcentral does not know the airport
+        if PHPVMSV7_ENDPOINT and PHPVMSV7_API_KEY and (snapshot is None or snapshot.get(icao) is None):
+            calls["phpvms"][1] += 1
+        known_locally = icao in custom_airports or (airports_db is not None and icao in airports_db)
+        if (AIRPORTDB_TOKEN and not known_locally
+                and not is_fresh("airportdb_io", f"{AIRPORTDB_IO_API_URL}/{icao}?apiToken={AIRPORTDB_TOKEN}")):
+            calls["airportdb_io"][1] += 1
+    return counts, calls
+
+def _plan_seconds(provider, calls, latency):
+    """Time ``calls`` requests take under the provider's token bucket and concurrency cap."""
+    if not calls:
+        return 0.0
+    if provider not in DEFAULT_RATES_PER_MIN:
+        return calls * latency
+    limiter = get_limiter(provider)
+    throttled = max(0, calls - limiter.capacity) / limiter.rate_per_sec
+    return max(throttled, calls * latency / PROVIDER_CONCURRENCY.get(provider, 1))
+
+def plan_routes(pairs, label=None):
+    """
+    Estimate a run over ``pairs`` from local state only (--plan).
+
+    Counts the routes the distance cache already answers, the airports that
+    still need resolving, the requests each provider would get and how long
+    the rate limits make them take. Nothing is sent and no cache is written:
+    the airport index is only opened if it is already built, the phpVMS
+    snapshot is read as saved and HTTP cache entries are only looked up.
+
+    Per provider, ``expected`` assumes the first source answers (airportgap
+    knows the route, VAcentral knows the airport); ``max`` asks every fallback.
+
+    Returns:
+        dict: The plan, as written to the plan JSON file
+    """
+    cache = get_distance_cache(CACHE_FILE)
+    duplicates = [{"pair": f"{a[0]}-{a[1]},{b[0]}-{b[1]}", "count": n}
+                  for (a, b), n in Counter(pairs).items() if n > 1]
+    routes = {}
+    for (a1_icao, a1_iata), (a2_icao, a2_iata) in pairs:
+        routes.setdefault(_key_for_route(a1_icao, a2_icao), (a1_icao, a1_iata, a2_icao, a2_iata))
+    uncached = [r for r in routes.values() if _cached_distance(r[1], r[3], r[0], r[2], cache, promote=False) is None]
+    iata_routes = {_key_for_route(r[1], r[3]) for r in uncached if _has_codes(r[1], r[3])}
+
+    def airports_of(route_list):
+        return {code.strip().upper() for r in route_list for code in (r[0], r[2])}
+
+    all_icaos = airports_of(uncached)
+    if DISTANCE_MODE == "api":
+        # Airports are only resolved for routes airportgap cannot answer
+        expected_icaos = airports_of([r for r in uncached if not _has_codes(r[1], r[3])])
+        airportgap = [len(iata_routes), len(iata_routes)]
+    else:
+        expected_icaos = all_icaos
+        sampled = min(VERIFY_SAMPLE_SIZE, len(iata_routes)) if DISTANCE_MODE == "verify" else 0
+        airportgap = [sampled, sampled]
+
+    index = open_index(AIRPORTS_INDEX_FILE, max_age_days=None)
+    if index is None:
+        index_status = "missing"
+    else:
+        index_status = "stale" if index.age_days() > INDEX_MAX_AGE_DAYS else "ok"
+    custom_airports = load_custom_airports_csv() if os.path.exists(CUSTOM_AIRPORTS_CSV) else {}
+    snapshot = None
+    if PHPVMSV7_ENDPOINT and PHPVMSV7_API_KEY:
+        from phpvms_airports import PhpvmsAirportSnapshot
+        snapshot = PhpvmsAirportSnapshot.load()
+
+    counts, calls = _plan_airports(all_icaos, custom_airports, index, snapshot)
+    expected_counts, expected_calls = _plan_airports(expected_icaos, custom_airports, index, snapshot)
+    for provider, (expected, _) in expected_calls.items():
+        calls[provider][0] = expected
+    calls["airportgap"] = airportgap
+    # The index is (re)built before any route is looked at; a stale one only revalidates
+    calls["github"] = [0, 0] if index_status == "ok" else [1, 1]
+    if snapshot is not None and counts["remote"] and not snapshot.is_fresh(PHPVMSV7_ENDPOINT):
+        calls["phpvms"][1] += 1  # first page of a snapshot refresh; one more per further page
+    if index is not None:
+        index.close()
+
+    latencies = _measured_latencies()
+    http_calls = {}
+    estimated = {"expected": 0.0, "max": 0.0}
+    for provider, (expected, worst) in sorted(calls.items()):
+        if not worst:
+            continue
+        latency = latencies.get(provider, PLAN_DEFAULT_LATENCY_SECONDS)
+        seconds = {"expected": round(_plan_seconds(provider, expected, latency), 1),
+                   "max": round(_plan_seconds(provider, worst, latency), 1)}
+        http_calls[provider] = {"expected": expected, "max": worst,
+                                "rate_per_min": (round(get_limiter(provider).rate_per_sec * 60)
+                                                 if provider in DEFAULT_RATES_PER_MIN else None),
+                                "latency_ms": round(latency * 1000), "seconds": seconds}
+        estimated["expected"] += seconds["expected"]
+        estimated["max"] += seconds["max"]
+
+    return {
+        "version": PLAN_VERSION,
+        "target": label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "distance_mode": DISTANCE_MODE,
+        "pairs": len(pairs),
+        "duplicates": duplicates,
+        "routes": {"unique": len(routes), "cached": len(routes) - len(uncached), "uncached": len(uncached),
+                   "cache_hit_ratio": round(1 - len(uncached) / len(routes), 3) if routes else None},
+        "airports": {"to_resolve": len(expected_icaos), "to_resolve_max": len(all_icaos),
+                     "coordinate_cache": counts["coordinate_cache"], "cached_failures": counts["cached_failures"],
+                     "remote": expected_counts["remote"], "remote_max": counts["remote"]},
+        "airport_index": index_status,
+        "http_calls": http_calls,
+        "estimated_seconds": {k: round(v, 1) for k, v in estimated.items()},
+    }
+
+def print_plan(plan, targets=None):
+    print("\n" + "="*80)
+    print(f"RUN PLAN {plan['target']} (distance mode {plan['distance_mode']}, no requests sent)")
+    print("="*80)
+    for target in targets or []:
+        if "error" in target:
+            print(f"❌ {target['target']:<20} {target['error']}")
+            continue
+        r = target["routes"]
+        print(f"   {target['target']:<20} {target['pairs']:>6} pairs  {r['cached']:>6}/{r['unique']:<6} cached  "
+              f"~{target['estimated_seconds']['expected']:.0f}s")
+    r = plan["routes"]
+    ratio = f"{r['cache_hit_ratio']:.0%}" if r["cache_hit_ratio"] is not None else "-"
+    print(f"📄 {plan['pairs']} pairs, {r['unique']} unique routes")
+    if plan["duplicates"]:
+        print(f"⚠️ {len(plan['duplicates'])} duplicated pairs (the run would abort):")
+        for d in plan["duplicates"]:
+            print(f"   {d['pair']} x{d['count']}")
+    print(f"💾 Distance cache: {r['cached']} cached, {r['uncached']} to fetch (hit ratio {ratio})")
+    a = plan["airports"]
+    print(f"🌍 Airports to resolve: {a['to_resolve']} (up to {a['to_resolve_max']}); "
+          f"{a['coordinate_cache']} in the coordinate cache, {a['remote']} remote (up to {a['remote_max']})")
+    if a["cached_failures"]:
+        print(f"⏭️ Recently unresolvable (cached, will fail again): {', '.join(a['cached_failures'])}")
+    if plan["airport_index"] != "ok":
+        print(f"📥 Airport index {plan['airport_index']}: airports.json will be fetched")
+    if plan["http_calls"]:
+        print(f"\n{'provider':<13} {'calls':>6} {'max':>6} {'rate/min':>9} {'latency':>8} {'seconds':>8} {'max s':>8}")
+        for name, c in plan["http_calls"].items():
+            rate = c["rate_per_min"] if c["rate_per_min"] is not None else "-"
+            print(f"{name:<13} {c['expected']:>6} {c['max']:>6} {rate:>9} {c['latency_ms']:>6}ms "
+                  f"{c['seconds']['expected']:>8.1f} {c['seconds']['max']:>8.1f}")
+    else:
+        print("\n✅ No HTTP requests needed")
+    est = plan["estimated_seconds"]
+    print(f"\n⏱️ Estimated network time: {est['expected']:.0f}s (worst case {est['max']:.0f}s)")
+    print("="*80)
+
+def run_plan(airport_icao, route_code, plan_path):
+    """
+    --plan: parse the target's route file (every target with ALL), check it
+    for duplicates, estimate the run and write the plan JSON.
+
+    Returns:
+        int: Exit code (1 if a route file is missing or cannot be parsed)
+    """
+    if airport_icao.upper() == "ALL":
+        targets = discover_targets()
+    elif airport_icao.upper() == "TOUR":
+        targets = [("tour", "TOUR", route_code)]
+    else:
+        targets = [("base", airport_icao, route_code)]
+    summaries, all_pairs = [], []
+    for kind, icao, code in targets:
+        output_dir, input_path = _target_paths(kind, icao, code)
+        try:
+            pairs = parse_airport_file(input_path)
+        except (OSError, ValueError, IndexError) as e:
+            summaries.append({"target": output_dir, "error": f"{type(e).__name__}: {e}"})
+            continue
+        all_pairs.extend(pairs)
+        if len(targets) > 1:
+            summaries.append(plan_routes(pairs, output_dir))
+
+    if len(targets) > 1:
+        # Targets share the caches, so the total counts each route once
+        plan = plan_routes(list(dict.fromkeys(all_pairs)), "ALL")
+        plan["targets"] = summaries
+    else:
+        plan = plan_routes(all_pairs, f"{airport_icao.upper()}_{route_code}")
+        plan["errors"] = summaries
+    print_plan(plan, summaries if len(targets) > 1 else None)
+    for error in plan.get("errors", []):
+        print(f"❌ {error['target']}: {error['error']}")
+
+    if os.path.dirname(plan_path):
+        os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+    with open(plan_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+    print(f"📝 Plan written to {plan_path}")
+    failed = any("error" in s for s in summaries)
+    return 1 if failed else 0
+
 def parse_airport_file(file_path):
     with open(file_path, 'r') as file:
         lines = file.read().strip().splitlines()
@@ -667,12 +1338,32 @@ def has_duplicates(pairs):
         return True
     return False
 
-def generate_flights(pairs, route_code, start_flight_number, output_csv,is_tour_mode=False, tour_config={}):
+SCHEDULE_FIELDNAMES = [
+    "airline", "flight_number", "route_code", "callsign", "route_leg", "dpt_airport",
+    "arr_airport", "alt_airport", "days", "dpt_time", "arr_time", "level", "distance",
+    "flight_time", "flight_type", "load_factor", "load_factor_variance", "pilot_pay",
+    "route", "notes", "start_date", "end_date", "active", "subfleets", "fares", "fields",
+    "event_id", "user_id"
+]
+IMPORT_FILE_ROW_LIMIT = 500  # Flights per phpVMS import file
+
+def generate_flights(pairs, route_code, start_flight_number, is_tour_mode=False, tour_config={},
+                     airports_db=None):
+    """
+    Yield one schedule row per flight, in output order.
+
+    Distances are expected to be cached already by preflight_routes (anything
+    missing is fetched one route at a time); rows are produced one at a time
+    so callers can stream them straight to the output files. ``airports_db``
+    is the handle preflight_routes returned; by default a new LazyAirportsDb.
+
+    Yields:
+        dict: Row keyed by SCHEDULE_FIELDNAMES
+    """
     current_number = start_flight_number
-    records = []
-    requests_made = 0
-    
-    airports_db = load_local_airports_db()
+
+    if airports_db is None:
+        airports_db = LazyAirportsDb()
     custom_airports = load_custom_airports_csv()
 
     if is_tour_mode:
@@ -703,16 +1394,9 @@ def generate_flights(pairs, route_code, start_flight_number, output_csv,is_tour_
         if len(filter_subfleets) > 0:
             print("---TOUR SUBFLEET---")
             print(filter_subfleets)
-            global GLOB_FILTER_SUBFLEETS
-            GLOB_FILTER_SUBFLEETS = filter_subfleets
 
         for leg_number, ((a1_icao, a1_iata), (a2_icao, a2_iata)) in enumerate(pairs, start=1):
-            if requests_made >= MAX_REQUESTS_PER_MIN:
-                print("Reached 100 API requests, sleeping for 60 seconds...")
-                time.sleep(60)
-                requests_made = 0
             distance = fetch_distance(a1_iata, a2_iata, a1_icao, a2_icao, airports_db=airports_db, custom_airports=custom_airports)
-            requests_made += 1
 
             dpt, arr, flt = calculate_flight_times(distance, avg_speed)
 
@@ -721,155 +1405,250 @@ def generate_flights(pairs, route_code, start_flight_number, output_csv,is_tour_
             if(flight_type == 'F'):
                 call_sign = "CRF"
 
-            records.append([
+            yield dict(zip(SCHEDULE_FIELDNAMES, [
                 "CRN", current_number, route_code.upper(), call_sign, leg_number, a1_icao, a2_icao, "", "1234567",
                 dpt, arr, "", distance, flt, flight_type, "", "", pilot_pay,
                 "", notes, start_date, end_date, "0", "", "", "", "", ""
-            ])
+            ]))
             current_number += 1
     else:
         print("Generating Scheduled Flights")
         for (a1_icao, a1_iata), (a2_icao, a2_iata) in pairs:
-            if requests_made >= MAX_REQUESTS_PER_MIN:
-                print("Reached 100 API requests, sleeping for 60 seconds...")
-                time.sleep(60)
-                requests_made = 0
             distance = fetch_distance(a1_iata, a2_iata, a1_icao, a2_icao, airports_db=airports_db, custom_airports=custom_airports)
-            requests_made += 1
 
             pax_callsign = ""
+            cargo_callsign = "CRF"
 
-            dpt, arr, flt = calculate_flight_times(distance)
-            records.append([
-                "CRN", current_number, route_code, pax_callsign, "", a1_icao, a2_icao, "", "1234567",
-                dpt, arr, "", distance, flt, "J", "", "", "", "", "", "", "", "1", "", "", "", "", ""
-            ])
-            current_number += 1
+            for callsign, flight_type, dpt_airport, arr_airport in (
+                (pax_callsign, "J", a1_icao, a2_icao),
+                (pax_callsign, "J", a2_icao, a1_icao),
+                (cargo_callsign, "F", a1_icao, a2_icao),
+                (cargo_callsign, "F", a2_icao, a1_icao),
+            ):
+                dpt, arr, flt = calculate_flight_times(distance)
+                yield dict(zip(SCHEDULE_FIELDNAMES, [
+                    "CRN", current_number, route_code, callsign, "", dpt_airport, arr_airport, "", "1234567",
+                    dpt, arr, "", distance, flt, flight_type, "", "", "", "", "", "", "", "1", "", "", "", "", ""
+                ]))
+                current_number += 1
+
+    get_distance_cache(CACHE_FILE).flush()
+    flush_missing_airports()
+
+def drop_short_flight_numbers(rows, removed):
+    """
+    Skip flights whose number has fewer than 3 digits (< 100).
 
-            dpt, arr, flt = calculate_flight_times(distance)
-            records.append([
-                "CRN", current_number, route_code, pax_callsign, "", a2_icao, a1_icao, "", "1234567",
-                dpt, arr, "", distance, flt, "J", "", "", "", "", "", "", "", "1", "", "", "", "", ""
-            ])
-            current_number += 1
+    Args:
+        rows: Iterable of schedule rows
+        removed: List that collects the dropped flight numbers
 
-            cargo_callsign = "CRF"
+    Yields:
+        dict: Rows that meet the flight number requirement
+    """
+    for idx, row in enumerate(rows):
+        flight_number = int(remove_non_numeric(str(row['flight_number'])))
+        if flight_number < 100:
+            removed.append(flight_number)
+            print(f"indx: {idx} | Flight: {flight_number} marked for deletion")
+            continue
+        yield row
 
-            dpt, arr, flt = calculate_flight_times(distance)
-            records.append([
-                "CRN", current_number, route_code, cargo_callsign, "", a1_icao, a2_icao, "", "1234567",
-                dpt, arr, "", distance, flt, "F", "", "", "", "", "", "", "", "1", "", "", "", "", ""
-            ])
-            current_number += 1
+def assign_subfleets(rows, filter_subfleets=[]):
+    """
+    Set each row's subfleets to the CRN aircraft of its flight type that have
+    the range for the flight (optionally limited to ``filter_subfleets``).
 
-            dpt, arr, flt = calculate_flight_times(distance)
-            records.append([
-                "CRN", current_number, route_code, cargo_callsign, "", a2_icao, a1_icao, "", "1234567",
-                dpt, arr, "", distance, flt, "F", "", "", "", "", "", "", "", "1", "", "", "", "", ""
-            ])
-            current_number += 1
+    Yields:
+        dict: The updated row
+    """
+    for row in rows:
+        row['subfleets'] = get_fleet_range_index().subfleets("CRN", row["flight_type"], int(row['distance']), filter_subfleets)
+        yield row
 
-    with open(output_csv, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "airline", "flight_number", "route_code", "callsign", "route_leg", "dpt_airport",
-            "arr_airport", "alt_airport", "days", "dpt_time", "arr_time", "level", "distance",
-            "flight_time", "flight_type", "load_factor", "load_factor_variance", "pilot_pay",
-            "route", "notes", "start_date", "end_date", "active", "subfleets", "fares", "fields",
-            "event_id", "user_id"
-        ])
-        writer.writerows(records)
-
-def split(filehandler, delimiter=',', row_limit=1000,
-          output_name_template='output_%s.csv', output_path='.', keep_headers=True):
-    reader = csv.reader(filehandler, delimiter=delimiter)
-    current_piece = 1
-    current_out_path = os.path.join(
-        output_path,
-        output_name_template % current_piece
-    )
-    current_out_writer = csv.writer(open(current_out_path, 'w',newline=''), delimiter=delimiter)
-    current_limit = row_limit
-    if keep_headers:
-        headers = next(reader)
-        current_out_writer.writerow(headers)
-    for i, row in enumerate(reader):
-        if i + 1 > current_limit:
-            current_piece += 1
-            current_limit = row_limit * current_piece
-            current_out_path = os.path.join(
-                output_path,
-                output_name_template % current_piece
-            )
-            current_out_writer = csv.writer(open(current_out_path, 'w',newline=''), delimiter=delimiter)
-            if keep_headers:
-                current_out_writer.writerow(headers)
-        current_out_writer.writerow(row)
+def write_schedule_files(rows, fieldnames, export_path, copy_path=None, shard_dir=None,
+                         row_limit=IMPORT_FILE_ROW_LIMIT, always_split=False,
+                         shard_name_template='output_%s.csv'):
+    """
+    Write the full export, an optional copy of it and the import shards in a
+    single pass over ``rows``.
+
+    Shards of ``row_limit`` rows are only written when there are more rows than
+    fit in one file (or ``always_split``); until then at most ``row_limit``
+    rows are held in memory. ``copy_path`` is replaced atomically at the end.
+
+    Returns:
+        tuple: (rows written, shard files written)
+    """
+    copy_tmp = f"{copy_path}.tmp" if copy_path else None
+    total = 0
+    shard_count = 0
+    pending = []
+    shard = {"file": None, "writer": None}
+
+    def open_shard():
+        nonlocal shard_count
+        if shard["file"]:
+            shard["file"].close()
+        shard_count += 1
+        os.makedirs(shard_dir, exist_ok=True)
+        shard["file"] = open(os.path.join(shard_dir, shard_name_template % shard_count), 'w', newline='', encoding='utf-8')
+        shard["writer"] = csv.DictWriter(shard["file"], fieldnames=fieldnames)
+        shard["writer"].writeheader()
+
+    with ExitStack() as stack:
+        stack.callback(lambda: shard["file"] and shard["file"].close())
+        writers = []
+        for path in [export_path] + ([copy_tmp] if copy_tmp else []):
+            writer = csv.DictWriter(stack.enter_context(open(path, 'w', newline='', encoding='utf-8')), fieldnames=fieldnames)
+            writer.writeheader()
+            writers.append(writer)
+
+        for row in rows:
+            for writer in writers:
+                writer.writerow(row)
+            total += 1
+            if shard_dir is None:
+                continue
+            if shard["writer"] is None:
+                if not always_split and total <= row_limit:
+                    pending.append(row)
+                    continue
+                open_shard()
+                shard["writer"].writerows(pending)
+                pending = []
+            if shard_count < (total - 1) // row_limit + 1:
+                open_shard()
+            shard["writer"].writerow(row)
+
+        if always_split and shard_dir is not None and shard["writer"] is None:
+            open_shard()
+
+    if copy_tmp:
+        os.replace(copy_tmp, copy_path)
+    return total, shard_count
 
 def remove_non_numeric(text):
     return "".join(filter(str.isdigit, text))
 
-def update_subfleets(airport_icao,route_code,time_generated,CSV_INPUT,is_tour_mode=False,filter_subfleets=[]):
-    with open(CSV_INPUT, 'r', newline='', encoding='utf-8') as csvfile_in:
-        reader = csv.DictReader(csvfile_in)
-        rows = list(reader)
-        fieldnames = reader.fieldnames
+def _load_previous_rows(csv_path):
+    """Rows of a previously generated flights CSV keyed by flight number."""
+    if not os.path.exists(csv_path):
+        return {}
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        return {row['flight_number']: row for row in csv.DictReader(f)}
 
-    indexes_to_remove = []
-    for idx,row in enumerate(rows):
-        flight_number = int(remove_non_numeric(str(row['flight_number'])))
-        if flight_number < 100:
-            indexes_to_remove.append(idx)
-            print(f"indx: {idx} | Flight: {flight_number} marked for deletion")
-            continue
+def incremental_flights(pairs, route_code, start_flight_number, manifest, previous_rows,
+                        is_tour_mode=False, tour_config={}, airports_db=None):
+    """
+    Yield schedule rows like ``generate_flights``, reusing the rows of pairs
+    already recorded in ``manifest`` and generating only new or changed pairs.
 
-        flight_distance = int(row['distance'])
-        flight_type = row["flight_type"] 
-        subfleets = []
-        for aircraft_icao in airline_subfleet_by_flight_type["CRN"][flight_type]:
-            if flight_distance < int(aircrafts_range_by_icao[aircraft_icao]):
-                if len(filter_subfleets) > 0:
-                    if (aircraft_icao in filter_subfleets):
-                        subfleets.append(aircraft_icao)
-                else:
-                    subfleets.append(aircraft_icao)
-                
-        row['subfleets'] = ';'.join(subfleets)
+    Reused rows keep their flight numbers, distances and departure times.
+    New pairs in schedules mode get flight numbers after the highest number in
+    the manifest; tour legs are always numbered by position. Every pair's
+    flight numbers are recorded in the manifest as rows are yielded.
+    """
+    rows_per_pair = 1 if is_tour_mode else 4
+    reusable = {}
+    stale = []
+    for pair in pairs:
+        key = pair_key(pair)
+        numbers = manifest.flight_numbers(key) or []
+        rows = [previous_rows.get(str(n)) for n in numbers]
+        if len(rows) == rows_per_pair and all(rows):
+            reusable[key] = rows
+        else:
+            stale.append(pair)
+
+    if reusable:
+        print(f"♻️ Incremental: reusing {len(reusable)} of {len(pairs)} pairs, generating {len(stale)}")
+    fresh = iter(())
+    if stale:
+        fresh = generate_flights(stale, route_code, manifest.next_flight_number(start_flight_number),
+                                 is_tour_mode, tour_config, airports_db)
+
+    for leg_number, pair in enumerate(pairs, start=1):
+        key = pair_key(pair)
+        rows = reusable.get(key) or [next(fresh) for _ in range(rows_per_pair)]
+        if is_tour_mode:
+            row = rows[0]
+            first_number = int(row['flight_number']) - int(row['route_leg']) + 1
+            row['flight_number'] = first_number + leg_number - 1
+            row['route_leg'] = leg_number
+        manifest.record(key, [row['flight_number'] for row in rows])
+        yield from rows
+
+    # Let the generator finish so the distance cache is flushed
+    for _ in fresh:
+        pass
+
+def generate_schedules(airport_icao, route_code, time_generated, pairs, start_flight_number,
+                       is_tour_mode=False, tour_config={}, incremental=False):
+    """
+    Generate flights, assign subfleets, drop short flight numbers and write the
+    export, the committed copy and the 500-row import files in one streaming pass.
 
-    print("Checking flights that need to be removed")
-    if len(indexes_to_remove) > 0:
-        print(f"Total number of schedules is {len(rows)}")
-        for idx,i in enumerate(indexes_to_remove):
-            del rows[i-idx]
-        print(f"Completed removing {len(indexes_to_remove)} flights that don't meet flight number requirement of 3 or more digits")
-        print(f"The new total number of schedules is {len(rows)}")
-    else:
-        print("No flights found that need to be removed")
+    With ``incremental`` the rows of pairs unchanged since the last run (per the
+    manifest next to airports.txt / legs.txt) are reused from the existing
+    flights CSV instead of being regenerated.
 
-    timestr = time.strftime("%Y%m%d-%H%M%S")
+    Returns:
+        int: Number of flights written
+    """
     if is_tour_mode:
-        os.makedirs(f"TOURS/{route_code}/{time_generated}/", exist_ok=True)
-        CSV_OUTPUT = f"TOURS/{route_code}/{time_generated}/exported_{CSV_INPUT}"
-        with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8') as csvfile_out:
-            writer = csv.DictWriter(csvfile_out, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        shutil.copyfile(CSV_OUTPUT,f"TOURS/{route_code}/DS_Tour_{route_code}_Legs.csv")   
+        output_dir = f"TOURS/{route_code}"
+        export_name = f"DS_Tour_{route_code}_Legs_{time_generated}.csv"
+        copy_path = f"TOURS/{route_code}/DS_Tour_{route_code}_Legs.csv"
+        filter_subfleets = tour_config.get("subfleets", [])
+        settings = {"route_code": route_code, "tour_config_sha256": sha256_of_json(tour_config)}
     else:
-        os.makedirs(f"{airport_icao}_{route_code}/{time_generated}/", exist_ok=True)
-        CSV_OUTPUT = f"{airport_icao}_{route_code}/{time_generated}/exported_{CSV_INPUT}"
-        with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8') as csvfile_out:
-            writer = csv.DictWriter(csvfile_out, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        shutil.copyfile(CSV_OUTPUT,f"{airport_icao}_{route_code}/{airport_icao}_{route_code}_Flights.csv")   
+        output_dir = f"{airport_icao}_{route_code}"
+        export_name = f"{airport_icao}_{route_code}_{time_generated}_generated_phpvms_flights.csv"
+        copy_path = f"{airport_icao}_{route_code}/{airport_icao}_{route_code}_Flights.csv"
+        filter_subfleets = []
+        settings = {"route_code": route_code, "start_flight_number": start_flight_number}
+    airports_db = preflight_routes(pairs)
+    config_sha256 = sha256_of_json(get_aircraft_config())
+    os.makedirs(f"{output_dir}/{time_generated}/", exist_ok=True)
+    CSV_OUTPUT = f"{output_dir}/{time_generated}/exported_{export_name}"
+
+    manifest = ScheduleManifest.load(f"{output_dir}/{MANIFEST_FILE}")
+    previous_rows = {}
+    if incremental:
+        reason = manifest.stale_reason(settings, copy_path)
+        if reason:
+            print(f"♻️ Incremental: full rebuild, {reason}")
+        else:
+            previous_rows = _load_previous_rows(copy_path)
+            if manifest.aircraft_config_sha256 != config_sha256:
+                print("♻️ Incremental: aircraft_config.json changed, subfleets are reassigned for every flight")
+    if not previous_rows:
+        manifest = ScheduleManifest(manifest.path)
+
+    report = get_run_report()
+    removed = []
+    rows = incremental_flights(pairs, route_code, start_flight_number, manifest, previous_rows,
+                               is_tour_mode, tour_config, airports_db)
+    rows = report.timed("generate", drop_short_flight_numbers(rows, removed))
+    rows = report.timed("subfleets", assign_subfleets(rows, filter_subfleets))
+    with report.stage("write"):
+        total, shards = write_schedule_files(rows, SCHEDULE_FIELDNAMES, CSV_OUTPUT, copy_path,
+                                             shard_dir=f"{route_code}/{time_generated}")
+        manifest.save(settings, config_sha256, copy_path)
+    report.add_rows("write", total)
 
-    print(f'Updated CSV saved as {CSV_OUTPUT}')
+    print("Checking flights that need to be removed")
+    if len(removed) > 0:
+        print(f"Completed removing {len(removed)} flights that don't meet flight number requirement of 3 or more digits")
+        print(f"The new total number of schedules is {total}")
+    else:
+        print("No flights found that need to be removed")
 
-    if len(rows) > 500:
-        print("Spliting schedules into multiple files for import")
-        with open(CSV_OUTPUT,'r') as file:
-            split(file,row_limit=500,output_path=f"{route_code}/{time_generated}")
+    print(f'Updated CSV saved as {CSV_OUTPUT}')
+    if shards:
+        print(f"Split {total} schedules into {shards} files for import in {route_code}/{time_generated}/")
+    return total
 
 def validate_file(file_path):
     if os.path.isfile(file_path):
@@ -934,10 +1713,53 @@ def cleanup_airports_db(json_file=AIRPORTS_JSON_FILE):
     if os.path.exists(json_file):
         try:
             os.remove(json_file)
-            print(f"🧹 Cleaned up {json_file} (will download fresh copy next run)")
+            print(f"🧹 Cleaned up {json_file} (the airport index is kept for the next run)")
         except Exception as e:
             print(f"⚠️ Could not remove {json_file}: {e}")
 
+def _update_legacy_row(row):
+    """
+    Normalise the callsign and recalculate arr_time/flight_time of one v7 row.
+    """
+    # Update callsign based on flight type
+    flight_type = row["flight_type"]
+    callsign = row["callsign"]
+    if flight_type == 'F':
+        if callsign != 'CRF':
+            row['callsign'] = 'CRF'
+    elif flight_type == 'J':
+        if callsign != '':
+            row['callsign'] = ''
+
+    # Recalculate flight_time if missing or invalid
+    flight_distance = int(row['distance'])
+    dpt_time = row["dpt_time"]
+    arr_time = row["arr_time"]
+    average_speed_knots = 300
+    avg_flight_time_min = (flight_distance / average_speed_knots) * 60
+
+    # Handle time formats
+    time_fmt = '%H:%M'
+    if arr_time.count(':') == 2:
+        arr_time = arr_time[:-3]  # Remove seconds
+    if dpt_time.count(':') == 2:
+        dpt_time = dpt_time[:-3]  # Remove seconds
+
+    dpt_time_datetime = datetime.strptime(dpt_time, time_fmt)
+
+    # Calculate or estimate arrival time
+    if arr_time == "":
+        arr_time_datetime = dpt_time_datetime + timedelta(minutes=avg_flight_time_min)
+        row['arr_time'] = arr_time_datetime.strftime(time_fmt)
+    else:
+        arr_time_datetime = datetime.strptime(arr_time, time_fmt)
+
+    # Calculate flight time
+    dpt_arr_time_delta_in_minutes = (arr_time_datetime - dpt_time_datetime).total_seconds() / 60
+    flight_time_in_minutes = abs(int(dpt_arr_time_delta_in_minutes))
+    row["flight_time"] = str(flight_time_in_minutes)
+    return row
+
 def process_legacy_routes(route_code, csv_input, time_generated):
     """
     Process existing v7 format routes CSV and update subfleets.
@@ -952,81 +1774,6 @@ def process_legacy_routes(route_code, csv_input, time_generated):
     print(f"Input file: {csv_input}")
     print(f"{'='*80}\n")
 
-    # Read the existing CSV
-    with open(csv_input, 'r', newline='', encoding='utf-8') as csvfile_in:
-        reader = csv.DictReader(csvfile_in)
-        rows = list(reader)
-        fieldnames = reader.fieldnames
-
-    print(f"📊 Read {len(rows)} flights from input file")
-
-    indexes_to_remove = []
-    for idx, row in enumerate(rows):
-        flight_number = int(remove_non_numeric(str(row['flight_number'])))
-
-        # Mark flights with flight_number < 100 for removal
-        if flight_number < 100:
-            indexes_to_remove.append(idx)
-            print(f"  ⚠️  Flight {flight_number} marked for deletion (< 100)")
-            continue
-
-        # Update callsign based on flight type
-        flight_type = row["flight_type"]
-        callsign = row["callsign"]
-        if flight_type == 'F':
-            if callsign != 'CRF':
-                row['callsign'] = 'CRF'
-        elif flight_type == 'J':
-            if callsign != '':
-                row['callsign'] = ''
-
-        # Recalculate flight_time if missing or invalid
-        flight_distance = int(row['distance'])
-        dpt_time = row["dpt_time"]
-        arr_time = row["arr_time"]
-        average_speed_knots = 300
-        avg_flight_time_min = (flight_distance / average_speed_knots) * 60
-
-        # Handle time formats
-        time_fmt = '%H:%M'
-        if arr_time.count(':') == 2:
-            arr_time = arr_time[:-3]  # Remove seconds
-        if dpt_time.count(':') == 2:
-            dpt_time = dpt_time[:-3]  # Remove seconds
-
-        dpt_time_datetime = datetime.strptime(dpt_time, time_fmt)
-
-        # Calculate or estimate arrival time
-        if arr_time == "":
-            arr_time_datetime = dpt_time_datetime + timedelta(minutes=avg_flight_time_min)
-            row['arr_time'] = arr_time_datetime.strftime(time_fmt)
-        else:
-            arr_time_datetime = datetime.strptime(arr_time, time_fmt)
-
-        # Calculate flight time
-        dpt_arr_time_delta_in_minutes = (arr_time_datetime - dpt_time_datetime).total_seconds() / 60
-        flight_time_in_minutes = abs(int(dpt_arr_time_delta_in_minutes))
-        flight_time = str(flight_time_in_minutes)
-        row["flight_time"] = flight_time
-
-        # Recalculate subfleets based on current aircraft_config.json
-        subfleets = []
-        for aircraft_icao in airline_subfleet_by_flight_type["CRN"][flight_type]:
-            if flight_distance < int(aircrafts_range_by_icao[aircraft_icao]):
-                subfleets.append(aircraft_icao)
-        row['subfleets'] = ';'.join(subfleets)
-
-    # Remove flights with flight_number < 100
-    print("\n🔍 Checking flights that need to be removed")
-    if len(indexes_to_remove) > 0:
-        print(f"  Total flights before removal: {len(rows)}")
-        for idx, i in enumerate(indexes_to_remove):
-            del rows[i - idx]
-        print(f"  ✅ Removed {len(indexes_to_remove)} flights with flight_number < 100")
-        print(f"  Total flights after removal: {len(rows)}")
-    else:
-        print("  ✅ No flights found that need to be removed")
-
     # Create output directories
     # Timestamped directory for full CSV (not committed)
     output_dir_timestamped = f"_LEGACY/{route_code}/{time_generated}"
@@ -1036,33 +1783,33 @@ def process_legacy_routes(route_code, csv_input, time_generated):
     output_dir_splitted = f"_LEGACY/{route_code}/ROUTES_IMPORT_FILES_SPLITTED"
     os.makedirs(output_dir_splitted, exist_ok=True)
 
-    # Write updated CSV to timestamped directory (backup)
+    # Stream the existing CSV through the updates into the backup CSV and the
+    # 500-flight import files in one pass
     csv_output = f"{output_dir_timestamped}/exported-{time_generated}-routes.csv"
-    with open(csv_output, 'w', newline='', encoding='utf-8') as csvfile_out:
-        writer = csv.DictWriter(csvfile_out, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"\n✅ Updated CSV saved as {csv_output}")
-
-    # Always split into multiple files and save to ROUTES_IMPORT_FILES_SPLITTED
-    print(f"\n📦 Splitting {len(rows)} schedules into multiple files (500 flights per file)")
-    print(f"  Output directory: {output_dir_splitted}/")
-
-    # Create a temporary full CSV for splitting
-    temp_full_csv = f"{output_dir_splitted}/temp_full.csv"
-    with open(temp_full_csv, 'w', newline='', encoding='utf-8') as csvfile_out:
-        writer = csv.DictWriter(csvfile_out, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    report = get_run_report()
+    removed = []
+    with open(csv_input, 'r', newline='', encoding='utf-8') as csvfile_in:
+        reader = csv.DictReader(csvfile_in)
+        rows = report.timed("parse", reader)
+        rows = report.timed("update", (_update_legacy_row(row) for row in drop_short_flight_numbers(rows, removed)))
+        rows = report.timed("subfleets", assign_subfleets(rows))
+        with report.stage("write"):
+            total, num_files = write_schedule_files(rows, reader.fieldnames, csv_output,
+                                                    shard_dir=output_dir_splitted, always_split=True)
+        report.add_rows("write", total)
 
-    # Split the file
-    with open(temp_full_csv, 'r') as file:
-        split(file, row_limit=500, output_path=output_dir_splitted)
+    print(f"📊 Read {total + len(removed)} flights from input file")
 
-    # Remove temporary file
-    os.remove(temp_full_csv)
+    # Remove flights with flight_number < 100
+    print("\n🔍 Checking flights that need to be removed")
+    if len(removed) > 0:
+        print(f"  ✅ Removed {len(removed)} flights with flight_number < 100")
+        print(f"  Total flights after removal: {total}")
+    else:
+        print("  ✅ No flights found that need to be removed")
 
+    print(f"\n✅ Updated CSV saved as {csv_output}")
+    print(f"\n📦 Split {total} schedules into multiple files (500 flights per file)")
     print(f"  ✅ Split files created in {output_dir_splitted}/")
 
     print(f"\n{'='*80}")
@@ -1070,8 +1817,7 @@ def process_legacy_routes(route_code, csv_input, time_generated):
     print(f"{'='*80}")
     print(f"\n📁 Timestamped backup: {output_dir_timestamped}")
     print(f"📁 Import files directory: {output_dir_splitted}")
-    print(f"📊 Total flights processed: {len(rows)}")
-    num_files = (len(rows) // 500) + (1 if len(rows) % 500 > 0 else 0)
+    print(f"📊 Total flights processed: {total}")
     print(f"📦 Split into {num_files} files (output_1.csv - output_{num_files}.csv)")
     print(f"\n💡 Next steps:")
     print(f"  1. Review the split files in {output_dir_splitted}/")
@@ -1080,8 +1826,297 @@ def process_legacy_routes(route_code, csv_input, time_generated):
     print(f"\n📝 Note: The timestamped directory contains a backup and is ignored by git")
     print(f"{'='*80}\n")
 
+def discover_targets():
+    """
+    Find every base folder (ICAO_IATA/airports.txt) and tour (TOURS/CODE/legs.txt + config.csv).
+
+    Returns:
+        list: [(kind, airport_icao, route_code)] with kind 'base' or 'tour'
+    """
+    targets = []
+    for path in sorted(glob.glob("*_*/airports.txt")):
+        match = re.fullmatch(r"([A-Za-z0-9]{4})_([A-Za-z0-9]{3})", os.path.dirname(path))
+        if match:
+            targets.append(("base", match.group(1), match.group(2)))
+    for path in sorted(glob.glob("TOURS/*/legs.txt")):
+        tour_dir = os.path.dirname(path)
+        if os.path.isfile(os.path.join(tour_dir, "config.csv")):
+            targets.append(("tour", "TOUR", os.path.basename(tour_dir)))
+    return targets
+
+def _target_paths(kind, airport_icao, route_code):
+    if kind == "tour":
+        return f"TOURS/{route_code}", f"TOURS/{route_code}/legs.txt"
+    return f"{airport_icao}_{route_code}", f"{airport_icao}_{route_code}/airports.txt"
+
+def _init_batch_worker():
+    # Workers share the SQLite store; only run_batch exports distance_cache.json
+    disable_json_mirror()
+
+def _build_batch_target(kind, airport_icao, route_code, time_generated, incremental):
+    """
+    Build one base or tour inside a batch worker process.
+
+    Everything job specific (pairs, tour config and its subfleet filter) is
+    local to this call, so nothing carries over to the next job the worker
+    runs. Output goes to <target>/<time_generated>/generate.log.
+
+    Returns:
+        dict: Timing and result summary for the target
+    """
+    output_dir, input_path = _target_paths(kind, airport_icao, route_code)
+    log_path = f"{output_dir}/{time_generated}/generate.log"
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    result = {"target": output_dir, "kind": kind, "pairs": 0, "flights": 0,
+              "seconds": 0.0, "status": "ok", "error": None, "log": log_path}
+    started = time.monotonic()
+    report = get_run_report()
+    with open(log_path, "w", encoding="utf-8") as log, redirect_stdout(log):
+        try:
+            with report.stage("parse"):
+                pairs = parse_airport_file(input_path)
+            result["pairs"] = len(pairs)
+            report.add_rows("parse", len(pairs))
+            if kind == "tour":
+                with report.stage("parse"):
+                    tour_config = parse_tour_config(f"TOURS/{route_code}/config.csv")
+                result["flights"] = generate_schedules(airport_icao, route_code, time_generated, pairs, 8000,
+                                                       True, tour_config, incremental=incremental)
+            else:
+                result["flights"] = generate_schedules(airport_icao, route_code, time_generated, pairs,
+                                                       START_FLIGHT_NUMBER, incremental=incremental)
+            # Distances are already in the shared SQLite store, opened without its
+            # JSON mirror here; the parent exports distance_cache.json once. Aliases and
+            # coordinates only merge this job's changes, under the file lock.
+            get_route_aliases().flush()
+            get_coordinate_cache().flush()
+            flush_missing_airports()
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ {result['error']}")
+    result["seconds"] = round(time.monotonic() - started, 2)
+    # Counters accumulate per worker process; hand over this job's share only
+    result["report"] = report.drain()
+    return result
+
+def run_batch(time_generated, incremental=False, max_workers=BATCH_WORKERS, summary_path=None):
+    """
+    Build every base and tour: warm the shared caches once, then generate the
+    targets in parallel on a process pool.
+
+    The parent prefetches the distances of every pair of every target over
+    one set of pooled connections, opening the airport index only if a
+    lookup misses the caches. Workers then
+    share the warm airport index, coordinate cache and distance store (a WAL
+    SQLite database, DISTANCE_CACHE_DB or distance_cache.sqlite) instead of
+    each starting cold.
+
+    Returns:
+        list: One summary dict per target
+    """
+    stage_started = time.monotonic()
+    targets = discover_targets()
+    if not targets:
+        print("❌ No bases (ICAO_IATA/airports.txt) or tours (TOURS/CODE/legs.txt) found")
+        return []
+
+    runnable = []
+    results = []
+    all_pairs = {}
+    report = get_run_report()
+    for target in targets:
+        kind, airport_icao, route_code = target
+        output_dir, input_path = _target_paths(*target)
+        try:
+            with report.stage("parse"):
+                pairs = parse_airport_file(input_path)
+        except Exception as e:
+            results.append({"target": output_dir, "kind": kind, "pairs": 0, "flights": 0, "seconds": 0.0,
+                            "status": "error", "error": f"Invalid {input_path}: {e}", "log": None})
+            continue
+        with report.stage("validate"):
+            duplicated = has_duplicates(pairs)
+        if duplicated:
+            results.append({"target": output_dir, "kind": kind, "pairs": len(pairs), "flights": 0, "seconds": 0.0,
+                            "status": "error", "error": f"Duplicates found on {input_path}", "log": None})
+            continue
+        runnable.append(target)
+        for pair in pairs:
+            all_pairs.setdefault(pair, None)
+    discover_seconds = time.monotonic() - stage_started
+
+    print(f"📦 Batch mode: {len(runnable)} targets ({sum(1 for t in runnable if t[0] == 'base')} bases, "
+          f"{sum(1 for t in runnable if t[0] == 'tour')} tours), {len(all_pairs)} unique pairs")
+    for kind, airport_icao, route_code in runnable:
+        print(f"   - {_target_paths(kind, airport_icao, route_code)[0]}")
+    if not _auto_yes():
+        try:
+            user_input = input("\nBuild all of them? (Y/N): ").strip().lower()
+        except EOFError:
+            print("❌ No TTY available and not in CI/--yes mode. Aborting.")
+            sys.exit(1)
+        if user_input not in ('y', 'yes'):
+            print("❌ Execution aborted by user.")
+            sys.exit(1)
+
+    db_path = os.getenv("DISTANCE_CACHE_DB") or BATCH_DISTANCE_DB
+    os.environ["DISTANCE_CACHE_DB"] = db_path  # inherited by the spawned workers
+    stage_started = time.monotonic()
+    cache = get_distance_cache(CACHE_FILE, db_path=db_path)
+    airports_db = LazyAirportsDb()
+    custom_airports = load_custom_airports_csv()
+    failures = prefetch_distances(list(all_pairs), airports_db, custom_airports)
+    if failures:
+        print_preflight_report(failures)
+    get_coordinate_cache().flush()
+    warm_seconds = time.monotonic() - stage_started
+
+    stage_started = time.monotonic()
+    workers = max(1, min(max_workers, len(runnable)))
+    print(f"🏭 Building {len(runnable)} targets on {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_batch_worker) as pool:
+        futures = {pool.submit(_build_batch_target, *target, time_generated, incremental): target
+                   for target in runnable}
+        for future in as_completed(futures):
+            kind, airport_icao, route_code = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"target": _target_paths(kind, airport_icao, route_code)[0], "kind": kind, "pairs": 0,
+                          "flights": 0, "seconds": 0.0, "status": "error",
+                          "error": f"{type(e).__name__}: {e}", "log": None}
+            get_run_report().merge(result.pop("report", {}))
+            icon = "✅" if result["status"] == "ok" else "❌"
+            print(f"{icon} {result['target']}: {result['flights']} flights in {result['seconds']:.1f}s")
+            results.append(result)
+    build_seconds = time.monotonic() - stage_started
+
+    # Workers only wrote to the SQLite store; export it once so the JSON mirror has all of them
+    if hasattr(cache, "export_json"):
+        cache.export_json(CACHE_FILE)
+    get_route_aliases().flush()
+    get_coordinate_cache().flush()
+
+    results.sort(key=lambda r: (r["kind"], r["target"]))
+    print("\n" + "="*80)
+    print("BATCH SUMMARY")
+    print("="*80)
+    print(f"{'target':<16} {'kind':<5} {'pairs':>6} {'flights':>8} {'seconds':>8}  status")
+    for r in results:
+        status = r["status"] if r["status"] == "ok" else f"{r['status']}: {r['error']}"
+        print(f"{r['target']:<16} {r['kind']:<5} {r['pairs']:>6} {r['flights']:>8} {r['seconds']:>8.1f}  {status}")
+    print("-"*80)
+    print(f"discover {discover_seconds:.1f}s | warm caches {warm_seconds:.1f}s | "
+          f"build {build_seconds:.1f}s on {workers} workers")
+    print("="*80 + "\n")
+
+    if summary_path:
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "time_generated": time_generated,
+                "workers": workers,
+                "stages": {"discover_seconds": round(discover_seconds, 2),
+                           "warm_caches_seconds": round(warm_seconds, 2),
+                           "build_seconds": round(build_seconds, 2)},
+                "targets": results,
+            }, f, indent=2)
+        print(f"📝 Batch summary written to {summary_path}")
+    return results
+
+def autoroute(base_icao, aircraft_types, countries=None, with_iata=False, output_path=None):
+    """
+    Write a candidate airports.txt with every airport the given aircraft can
+    reach from ``base_icao``.
+
+    Airports come from the local airport index and custom_airports.csv
+    through a spatial index (see spatial_index.py), so the whole list is one
+    range query instead of a distance lookup per pair. The radius is the
+    longest range among ``aircraft_types`` in aircraft_config.json; each line
+    notes the distance and which of the types can fly it. Destinations
+    already in the base's airports.txt are left out.
+
+    Args:
+        base_icao: Base airport ICAO
+        aircraft_types: Aircraft ICAO codes from aircraft_config.json
+        countries: Only keep airports in these countries (ISO codes as in the airport index)
+        with_iata: Only keep airports with an IATA code
+        output_path: Candidate file (default: <BASE>_<IATA>/airports.candidates.txt)
+
+    Returns:
+        int: Number of candidate routes written
+    """
+    from spatial_index import AirportSpatialIndex
+
+    ranges = build_aircrafts_range_by_icao(get_aircraft_config())
+    unknown = [t for t in aircraft_types if t not in ranges]
+    if unknown:
+        raise ValueError(f"Unknown aircraft in aircraft_config.json: {', '.join(unknown)}")
+    ranges = {t: float(ranges[t]) for t in aircraft_types}
+    radius = max(ranges.values())
+
+    airports_db = load_local_airports_db()
+    if airports_db is not None:
+        airports_db.close()
+    started = time.perf_counter()
+    index = AirportSpatialIndex.from_sources(AIRPORTS_INDEX_FILE, CUSTOM_AIRPORTS_CSV)
+    base = index.get(base_icao)
+    if base is None:
+        raise ValueError(f"Base {base_icao.upper()} is not in the airport index or {CUSTOM_AIRPORTS_CSV}")
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    in_range = index.within(base["lat"], base["lon"], radius)
+    queried = time.perf_counter() - started
+    print(f"🗺️ {len(in_range)} of {len(index)} airports within {radius:.0f} nm of {base['icao']} "
+          f"(index built in {built * 1000:.0f} ms, query {queried * 1000:.1f} ms)")
+
+    base_dir = f"{base['icao']}_{base['iata']}"
+    existing = set()
+    if os.path.isfile(f"{base_dir}/airports.txt"):
+        existing = {pair[1][0].strip().upper() for pair in parse_airport_file(f"{base_dir}/airports.txt")}
+    countries = {c.strip().upper() for c in countries} if countries else None
+    lines = []
+    skipped_existing = 0
+    for airport, nm in in_range:
+        if airport["icao"] == base["icao"]:
+            continue
+        if countries is not None and airport["country"].upper() not in countries:
+            continue
+        if with_iata and not airport["iata"]:
+            continue
+        if airport["icao"] in existing:
+            skipped_existing += 1
+            continue
+        # Same rule as the subfleet assignment: an aircraft flies routes shorter than its range
+        fleet = ";".join(t for t in aircraft_types if ranges[t] > nm)
+        if not fleet:
+            continue
+        lines.append(f"{base['icao']}-{base['iata']},{airport['icao']}-{airport['iata']} "
+                     f"# {airport['country'] or '-'}, {nm:.0f} nm, {fleet}")
+
+    output_path = output_path or f"{base_dir}/airports.candidates.txt"
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + ("\n" if lines else ""))
+    if skipped_existing:
+        print(f"⏭️ {skipped_existing} airports in range are already in {base_dir}/airports.txt")
+    print(f"✅ Wrote {len(lines)} candidate routes to {output_path}")
+    print(f"   Review them and copy the ones to fly into {base_dir}/airports.txt")
+    return len(lines)
+
+def print_http_stats():
+    """Print connection reuse and response cache summaries, if any request was made."""
+    if "http_client" in sys.modules:
+        from http_client import print_connection_stats
+        print_connection_stats()
+    if "http_cache" in sys.modules:
+        from http_cache import print_http_cache_stats
+        print_http_cache_stats()
+
 def print_missing_airports_summary():
-    missing_airports = load_missing_airports()
+    missing_airports = get_missing_airports_journal().compact()
 
     if not missing_airports:
         print("\n✅ All airports were found in VAcentral API!")
@@ -1133,18 +2168,67 @@ if __name__ == "__main__":
     print("="*80 + "\n")
 
     parser = argparse.ArgumentParser(description="Generate phpVMS flights.")
-    parser.add_argument("airport_icao", help="Base Airport ICAO (e.g., MUHA) or TOUR for tour mode or LEGACY for legacy import mode")
-    parser.add_argument("route_code", help="Airport IATA (e.g., HAV) or tour code or legacy identifier")
+    parser.add_argument("airport_icao", help="Base Airport ICAO (e.g., MUHA) or TOUR for tour mode or LEGACY for legacy import mode or ALL to build every base and tour or AUTOROUTE to list the airports in range of a base")
+    parser.add_argument("route_code", nargs="?", help="Airport IATA (e.g., HAV) or tour code or legacy identifier or, with AUTOROUTE, the base ICAO (not used with ALL)")
     parser.add_argument("--yes", "-y", action="store_true",help="Proceed without interactive confirmation")
+    parser.add_argument("--incremental", action="store_true",help="Only regenerate pairs added or changed since the last run (uses manifest.json)")
+    parser.add_argument("--jobs", "-j", type=int, default=BATCH_WORKERS, help=f"ALL mode: worker processes (default: {BATCH_WORKERS})")
+    parser.add_argument("--distance-mode", choices=DISTANCE_MODES, default=DISTANCE_MODE,
+                        help=f"How new route distances are obtained: api (airportgap first), local (geodesic from coordinates only) "
+                             f"or verify (local plus an airportgap sample) (default: {DISTANCE_MODE})")
+    parser.add_argument("--summary", help="ALL mode: also write the per-target timing summary to this JSON file")
+    parser.add_argument("--aircraft", help="AUTOROUTE: comma-separated aircraft ICAO codes whose range is searched (e.g. A20N,A321)")
+    parser.add_argument("--country", help="AUTOROUTE: only airports in these comma-separated countries (e.g. US,PR)")
+    parser.add_argument("--with-iata", action="store_true", help="AUTOROUTE: only airports with an IATA code")
+    parser.add_argument("--output", help="AUTOROUTE: candidate file (default: <BASE>_<IATA>/airports.candidates.txt)")
+    parser.add_argument("--plan", nargs="?", const="", metavar="JSON",
+                        help="Dry run: parse, check duplicates and look up the caches only, then print and write "
+                             "the expected cache hits, HTTP calls and network time (default: run_reports/<target>_plan_<time>.json). "
+                             "Sends no requests")
     args = parser.parse_args()
+    is_batch_mode = args.airport_icao.upper() == "ALL"
+    if not is_batch_mode and not args.route_code:
+        parser.error("route_code is required unless airport_icao is ALL")
     _assume_yes = args.yes
+    DISTANCE_MODE = args.distance_mode
+    os.environ["DISTANCE_MODE"] = DISTANCE_MODE  # inherited by ALL mode workers
     AIRPORT_ICAO=args.airport_icao
     route_code=args.route_code
     is_tour_mode = AIRPORT_ICAO.upper() == "TOUR"
     is_legacy_mode = AIRPORT_ICAO.upper() == "LEGACY"
     time_generated = time.strftime("%Y%m%d-%H%M%S")
-
-    if is_legacy_mode:
+    report_label = "ALL" if is_batch_mode else f"{AIRPORT_ICAO.upper()}_{route_code}"
+    if AIRPORT_ICAO.upper() == "AUTOROUTE":
+        if not args.aircraft:
+            parser.error("AUTOROUTE needs --aircraft")
+        try:
+            autoroute(route_code, [t.strip().upper() for t in args.aircraft.split(",") if t.strip()],
+                      countries=args.country.split(",") if args.country else None,
+                      with_iata=args.with_iata, output_path=args.output)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        cleanup_airports_db()
+        sys.exit(0)
+    if args.plan is not None:
+        if is_legacy_mode:
+            parser.error("--plan is not available for LEGACY imports")
+        sys.exit(run_plan(AIRPORT_ICAO, route_code,
+                          args.plan or run_report_path(f"{report_label}_plan", time_generated)))
+    write_run_report_at_exit(os.getenv("RUN_REPORT_FILE") or run_report_path(report_label, time_generated))
+    report = get_run_report()
+
+    if is_batch_mode:
+        print("Batch mode")
+        results = run_batch(time_generated, incremental=args.incremental, max_workers=args.jobs,
+                            summary_path=args.summary)
+        cleanup_airports_db()
+        print_missing_airports_summary()
+        print_http_stats()
+        if any(r["status"] != "ok" for r in results):
+            report.status = "error"
+        sys.exit(1 if any(r["status"] != "ok" for r in results) else 0)
+    elif is_legacy_mode:
         print("Legacy Import mode")
         print(f"Processing legacy routes from _LEGACY/{route_code}")
         os.makedirs(f"_LEGACY/{route_code}", exist_ok=True)
@@ -1159,22 +2243,26 @@ if __name__ == "__main__":
         os.makedirs(f"TOURS/{route_code}", exist_ok=True)
         file_path = f"TOURS/{route_code}/legs.txt"
         config_path = f"TOURS/{route_code}/config.csv"
-        validate_file(file_path)
-        pairs = parse_airport_file(file_path)
-        generate_flights(pairs,route_code,8000,f"DS_Tour_{route_code}_Legs_{time_generated}.csv",True,parse_tour_config(config_path))
-        update_subfleets(AIRPORT_ICAO,route_code,time_generated,f"DS_Tour_{route_code}_Legs_{time_generated}.csv",True,filter_subfleets=GLOB_FILTER_SUBFLEETS)
-        os.remove(f"DS_Tour_{route_code}_Legs_{time_generated}.csv")
+        with report.stage("validate"):
+            validate_file(file_path)
+        with report.stage("parse"):
+            pairs = parse_airport_file(file_path)
+            tour_config = parse_tour_config(config_path)
+        report.add_rows("parse", len(pairs))
+        generate_schedules(AIRPORT_ICAO,route_code,time_generated,pairs,8000,True,tour_config,incremental=args.incremental)
         cleanup_airports_db()
     else:
         print("Schedules mode")
         os.makedirs(f"{AIRPORT_ICAO}_{route_code}", exist_ok=True)
         file_path = f"{AIRPORT_ICAO}_{route_code}/airports.txt"
-        validate_file(file_path)
-        pairs = parse_airport_file(file_path)
-        generate_flights(pairs, route_code, START_FLIGHT_NUMBER, f"{AIRPORT_ICAO}_{route_code}_{time_generated}_generated_phpvms_flights.csv")
-        update_subfleets(AIRPORT_ICAO,route_code,time_generated,f"{AIRPORT_ICAO}_{route_code}_{time_generated}_generated_phpvms_flights.csv")
-        os.remove(f"{AIRPORT_ICAO}_{route_code}_{time_generated}_generated_phpvms_flights.csv")
+        with report.stage("validate"):
+            validate_file(file_path)
+        with report.stage("parse"):
+            pairs = parse_airport_file(file_path)
+        report.add_rows("parse", len(pairs))
+        generate_schedules(AIRPORT_ICAO, route_code, time_generated, pairs, START_FLIGHT_NUMBER, incremental=args.incremental)
         cleanup_airports_db()
 
     if not is_legacy_mode:
-        print_missing_airports_summary()
\ No newline at end of file
+        print_missing_airports_summary()
+    print_http_stats()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from airport_index import AIRPORTS_INDEX_FILE, open_index
+
+# WGS-84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+METERS_PER_NM = 1852.0
+EARTH_MEAN_RADIUS_NM = 6371008.8 / METERS_PER_NM
+
+# Default engine for generator distances (haversine | vincenty | geopy)
+DISTANCE_METHOD = os.getenv("DISTANCE_METHOD", "vincenty")
+VINCENTY_MAX_ITERATIONS = 200
+VINCENTY_TOLERANCE = 1e-12
+
+def _as_arrays(coord_pairs):
+    """
+    Convert [((lat1, lon1), (lat2, lon2)), ...] into four float64 arrays in radians.
+    """
+    data = np.asarray(coord_pairs, dtype=np.float64).reshape(-1, 4)
+    return tuple(np.radians(data[:, i]) for i in range(4))
+
+def haversine_nm(coord_pairs):
+    """
+    Great-circle distance on a sphere of mean Earth radius.
+
+    Fastest option; differs from the ellipsoidal distance by up to ~0.5%.
+
+    Returns:
+        numpy.ndarray: Distances in nautical miles
+    """
+    lat1, lon1, lat2, lon2 = _as_arrays(coord_pairs)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_MEAN_RADIUS_NM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+def vincenty_nm(coord_pairs):
+    """
+    Vectorized Vincenty inverse solution on the WGS-84 ellipsoid.
+
+    Agrees with geopy's geodesic (Karney) to well under a metre. The few
+    nearly antipodal pairs where Vincenty does not converge are recomputed
+    with geopy.
+
+    Returns:
+        numpy.ndarray: Distances in nautical miles
+    """
+    lat1, lon1, lat2, lon2 = _as_arrays(coord_pairs)
+    n = lat1.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    f = WGS84_F
+    L = lon2 - lon1
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    sin_sigma = np.zeros(n)
+    cos_sigma = np.ones(n)
+    sigma = np.zeros(n)
+    cos_sq_alpha = np.ones(n)
+    cos_2sigma_m = np.zeros(n)
+    active = np.ones(n, dtype=bool)
+
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        if not active.any():
+            break
+        idx = np.nonzero(active)[0]
+        sin_lam, cos_lam = np.sin(lam[idx]), np.cos(lam[idx])
+        s_sigma = np.sqrt((cosU2[idx] * sin_lam) ** 2 +
+                          (cosU1[idx] * sinU2[idx] - sinU1[idx] * cosU2[idx] * cos_lam) ** 2)
+        c_sigma = sinU1[idx] * sinU2[idx] + cosU1[idx] * cosU2[idx] * cos_lam
+        sig = np.arctan2(s_sigma, c_sigma)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sin_alpha = np.where(s_sigma == 0, 0.0, cosU1[idx] * cosU2[idx] * sin_lam / s_sigma)
+            c_sq_alpha = 1 - sin_alpha ** 2
+            c_2sigma_m = np.where(c_sq_alpha == 0, 0.0,
+                                  c_sigma - 2 * sinU1[idx] * sinU2[idx] / c_sq_alpha)
+        C = f / 16 * c_sq_alpha * (4 + f * (4 - 3 * c_sq_alpha))
+        lam_prev = lam[idx]
+        lam_new = L[idx] + (1 - C) * f * sin_alpha * (
+            sig + C * s_sigma * (c_2sigma_m + C * c_sigma * (-1 + 2 * c_2sigma_m ** 2)))
+
+        lam[idx] = lam_new
+        sin_sigma[idx], cos_sigma[idx], sigma[idx] = s_sigma, c_sigma, sig
+        cos_sq_alpha[idx], cos_2sigma_m[idx] = c_sq_alpha, c_2sigma_m
+        active[idx] = np.abs(lam_new - lam_prev) > VINCENTY_TOLERANCE
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+        B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    distances = WGS84_B * A * (sigma - delta_sigma) / METERS_PER_NM
+
+    if active.any():
+        failed = np.nonzero(active)[0]
+        fallback = geopy_nm([coord_pairs[i] for i in failed])
+        distances[failed] = fallback
+    return distances
+
+def geopy_nm(coord_pairs):
+    """
+    Reference implementation: one geopy ``geodesic`` (Karney) call per pair.
+
+    Returns:
+        numpy.ndarray: Distances in nautical miles
+    """
+    return np.array([geodesic(a, b).nautical for a, b in coord_pairs], dtype=np.float64)
+
+METHODS = {
+    "haversine": haversine_nm,
+    "vincenty": vincenty_nm,
+    "geopy": geopy_nm,
+}
+
+def batch_distances_nm(coord_pairs, method=None):
+    """
+    Compute distances for many coordinate pairs in one call.
+
+    Args:
+        coord_pairs: Sequence of ((lat1, lon1), (lat2, lon2))
+        method: 'haversine', 'vincenty' or 'geopy' (default: DISTANCE_METHOD)
+
+    Returns:
+        list: Distances in nautical miles (floats), in input order
+    """
+    method = method or DISTANCE_METHOD
+    if method not in METHODS:
+        raise ValueError(f"Unknown distance method '{method}' (choose from {', '.join(METHODS)})")
+    coord_pairs = list(coord_pairs)
+    if not coord_pairs:
+        return []
+    return METHODS[method](coord_pairs).tolist()
+
+def distance_nm(coords1, coords2, method=None):
+    """Distance in nautical miles between two (lat, lon) tuples."""
+    return batch_distances_nm([(coords1, coords2)], method)[0]
+
+def accuracy_report(coord_pairs, labels=None):
+    """
+    Compare every method against geopy for the given pairs.
+
+    Returns:
+        dict: {method: {"max_abs_nm", "max_rel_pct", "worst_route",
+                        "int_mismatches", "seconds"}}
+    """
+    coord_pairs = list(coord_pairs)
+    labels = labels or [str(i) for i in range(len(coord_pairs))]
+    started = time.perf_counter()
+    reference = geopy_nm(coord_pairs)
+    report = {"geopy": {"max_abs_nm": 0.0, "max_rel_pct": 0.0, "worst_route": None,
+                        "int_mismatches": 0, "seconds": round(time.perf_counter() - started, 4)}}
+    for method in ("haversine", "vincenty"):
+        started = time.perf_counter()
+        values = METHODS[method](coord_pairs)
+        elapsed = time.perf_counter() - started
+        diff = np.abs(values - reference)
+        worst = int(np.argmax(diff)) if len(diff) else 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = np.where(reference > 0, diff / reference * 100, 0.0)
+        report[method] = {
+            "max_abs_nm": round(float(diff.max()), 6) if len(diff) else 0.0,
+            "max_rel_pct": round(float(rel.max()), 6) if len(rel) else 0.0,
+            "worst_route": labels[worst] if len(diff) else None,
+            "int_mismatches": int(np.count_nonzero(values.astype(int) != reference.astype(int))),
+            "seconds": round(elapsed, 4),
+        }
+    return report
+
+def _load_known_coordinates(index_file=AIRPORTS_INDEX_FILE, custom_csv="custom_airports.csv",
+                            coords_cache="airport_coords_cache.json"):
+    """Collect coordinates available locally (no network)."""
+    known = {}
+    index = open_index(index_file, max_age_days=None)
+    if index is not None:
+        for icao, lat, lon, _, _ in index.records():
+            known[icao] = (lat, lon)
+        index.close()
+    if os.path.exists(custom_csv):
+        with open(custom_csv, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("lat") and row.get("lon"):
+                    known[row["icao"].strip().upper()] = (float(row["lat"]), float(row["lon"]))
+    if os.path.exists(coords_cache):
+        with open(coords_cache, "r", encoding="utf-8") as f:
+            for icao, entry in json.load(f).items():
+                if entry.get("status") == "found":
+                    known[icao.upper()] = (entry["lat"], entry["lon"])
+    return known
+
+def _project_routes():
+    """Unique ICAO pairs from every airports.txt and tour legs.txt."""
+    routes = set()
+    for path in glob.glob("*_*/airports.txt") + glob.glob("TOURS/*/legs.txt"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#")[0].strip()
+                if not line or "," not in line:
+                    continue
+                a, b = line.split(",")[:2]
+                icao1, icao2 = a.split("-")[0].strip().upper(), b.split("-")[0].strip().upper()
+                routes.add((min(icao1, icao2), max(icao1, icao2)))
+    return sorted(routes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batch distance methods against geopy on the project's routes.")
+    parser.add_argument("--json", dest="json_out", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    known = _load_known_coordinates()
+    routes = [r for r in _project_routes() if r[0] in known and r[1] in known]
+    if not routes:
+        print("❌ No routes with locally known coordinates (need airports.idx, custom_airports.csv or airport_coords_cache.json)")
+        return
+    pairs = [(known[a], known[b]) for a, b in routes]
+    report = accuracy_report(pairs, [f"{a}-{b}" for a, b in routes])
+
+    print(f"📏 Distance method accuracy vs geopy on {len(routes)} project routes")
+    print(f"{'method':<10} {'max Δ nm':>10} {'max Δ %':>9} {'int Δ':>6} {'seconds':>8}  worst route")
+    for method, row in report.items():
+        print(f"{method:<10} {row['max_abs_nm']:>10.4f} {row['max_rel_pct']:>9.4f} "
+              f"{row['int_mismatches']:>6} {row['seconds']:>8.4f}  {row['worst_route'] or '-'}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"routes": len(routes), "methods": report}, f, indent=2)
+        print(f"✅ Report written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from distance_cache import json_cache_lock, load_json_cache, save_json_cache
+from http_client import get_session
+from rate_limiter import get_limiter
+from run_report import get_run_report
+
+HTTP_CACHE_DIR = "http_cache"
+HTTP_CACHE_INDEX = "index.json"
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+# How long a cached body is served without asking the provider again; after
+# that it is revalidated with If-None-Match / If-Modified-Since.
+# Override with <PROVIDER>_CACHE_FRESH_HOURS, e.g. VACENTRAL_CACHE_FRESH_HOURS=48
+DEFAULT_FRESHNESS_HOURS = {
+    "vacentral": 7 * 24,
+    "airportdb_io": 30 * 24,
+}
+# Response headers kept with each body
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+def freshness_seconds(provider):
+    hours = os.getenv(f"{provider.upper()}_CACHE_FRESH_HOURS")
+    if hours is None:
+        hours = DEFAULT_FRESHNESS_HOURS.get(provider, 0)
+    return float(hours) * 3600
+
+def _cache_key(url, params=None):
+    # Hashed so tokens in query strings (AirportDB.io) never reach the disk
+    if params:
+        url = requests.Request("GET", url, params=params).prepare().url
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+class HttpCache:
+    """
+    Disk-backed cache of GET response bodies with their validators.
+
+    Bodies live in ``<dir>/<sha256 of url>.body``; ``index.json`` holds, per
+    key, the provider, ETag / Last-Modified, stored and last-access times and
+    size. A body younger than the provider's freshness is served without a
+    request; an older one is revalidated and served from disk on 304. When
+    the bodies exceed ``max_bytes`` the least recently used are evicted.
+    """
+
+    def __init__(self, path=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(path, HTTP_CACHE_INDEX)
+        self._entries = load_json_cache(self._index_path)
+        self._pending = 0
+        self.stats = {}
+
+    def _count(self, provider, outcome):
+        with self._lock:
+            counts = self.stats.setdefault(provider, {"fresh": 0, "revalidated": 0, "fetched": 0})
+            counts[outcome] += 1
+        get_run_report().cache_lookup(f"http_{provider}", outcome != "fetched")
+
+    def _body_path(self, key):
+        return os.path.join(self.path, f"{key}.body")
+
+    def lookup(self, key):
+        """
+        Returns:
+            tuple: (index entry, body bytes), or (None, None) if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            try:
+                with open(self._body_path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                del self._entries[key]
+                self._pending += 1
+                return None, None
+            entry["accessed_at"] = time.time()
+            self._pending += 1
+            return entry, body
+
+    def entry(self, key):
+        """
+        Returns:
+            dict: Index entry for ``key`` (None if not cached), without marking it as used
+        """
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key, provider, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = response.content
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            # A unique temp file, so processes storing the same URL never share one
+            fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.path)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(body)
+                os.replace(tmp, self._body_path(key))
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            now = time.time()
+            self._entries[key] = {"provider": provider, "headers": headers, "size": len(body),
+                                  "stored_at": now, "accessed_at": now}
+            self._pending += 1
+
+    def touch(self, key):
+        """Mark a revalidated entry as fresh again."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["stored_at"] = entry["accessed_at"] = time.time()
+                self._pending += 1
+
+    def _evict(self):
+        total = sum(e.get("size", 0) for e in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].get("accessed_at", 0)):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            total -= entry.get("size", 0)
+            del self._entries[key]
+
+    def flush(self):
+        with self._lock:
+            if self._pending == 0:
+                return
+            # Keep entries other processes added since we loaded the index
+            os.makedirs(self.path, exist_ok=True)
+            with json_cache_lock(self._index_path):
+                on_disk = load_json_cache(self._index_path)
+                for key, entry in on_disk.items():
+                    mine = self._entries.get(key)
+                    if mine is None or entry.get("accessed_at", 0) > mine.get("accessed_at", 0):
+                        if os.path.exists(self._body_path(key)):
+                            self._entries[key] = entry
+                self._evict()
+                save_json_cache(self._entries, self._index_path)
+            self._pending = 0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_http_cache(path=HTTP_CACHE_DIR):
+    """Return the process-wide HttpCache, loading its index on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(path)
+        return _cache
+
+def _flush_at_exit():
+    if _cache is not None:
+        try:
+            _cache.flush()
+        except Exception as e:
+            print(f"⚠️ Could not flush HTTP cache {_cache.path}: {e}")
+
+atexit.register(_flush_at_exit)
+
+def _response_from_cache(url, entry, body):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body
+    response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    response.encoding = get_encoding_from_headers(response.headers) or "utf-8"
+    response.from_cache = True
+    return response
+
+def is_fresh(provider, url, params=None):
+    """
+    Returns:
+        bool: True if ``cached_get`` would answer ``url`` from disk without a request
+    """
+    freshness = freshness_seconds(provider)
+    if freshness <= 0:
+        return False
+    entry = get_http_cache().entry(_cache_key(url, params))
+    return entry is not None and time.time() - entry["stored_at"] < freshness
+
+def cached_get(provider, url, params=None, headers=None, slot=None):
+    """
+    GET ``url`` through the provider's pooled session and the disk cache.
+
+    Fresh bodies are returned without a request. Otherwise the request is
+    sent inside ``slot(provider)`` (concurrency cap / token bucket) with the
+    cached validators; a 304 returns the cached body, a 200 replaces it.
+    Providers without a configured freshness bypass the cache.
+
+    Returns:
+        requests.Response: ``from_cache`` is True when the body came from disk
+    """
+    freshness = freshness_seconds(provider)
+    cache = get_http_cache() if freshness > 0 else None
+    key = _cache_key(url, params)
+    entry, body = cache.lookup(key) if cache is not None else (None, None)
+    if entry is not None and time.time() - entry["stored_at"] < freshness:
+        cache._count(provider, "fresh")
+        return _response_from_cache(url, entry, body)
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if "ETag" in entry["headers"]:
+            request_headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+    with slot(provider) if slot else nullcontext():
+        response = get_session(provider).get(url, params=params, headers=request_headers)
+    get_limiter(provider).observe(response)
+    response.from_cache = False
+    if cache is None:
+        return response
+    if response.status_code == 304 and entry is not None:
+        cache.touch(key)
+        cache._count(provider, "revalidated")
+        return _response_from_cache(url, entry, body)
+    if response.status_code == 200:
+        cache.store(key, provider, response)
+    cache._count(provider, "fetched")
+    return response
+
+def print_http_cache_stats():
+    if _cache is None or not _cache.stats:
+        return
+    print("🗃️ HTTP response cache:")
+    for provider, s in sorted(_cache.stats.items()):
+        print(f"   {provider:<13} {s['fresh']:>5} fresh, {s['revalidated']:>5} revalidated (304), {s['fetched']:>5} fetched")
@@ -0,0 +1,163 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import get_breaker
+from run_report import get_run_report
+
+# Connection pool and timeout settings per external provider.
+# pool_size should be >= the provider's PROVIDER_CONCURRENCY in circuit_breaker.py
+PROVIDER_SETTINGS = {
+    "airportgap":   {"pool_size": 4,  "connect_timeout": 5, "read_timeout": 20},
+    "vacentral":    {"pool_size": 8,  "connect_timeout": 5, "read_timeout": 10},
+    "airportdb_io": {"pool_size": 4,  "connect_timeout": 5, "read_timeout": 10},
+    "phpvms":       {"pool_size": 8,  "connect_timeout": 5, "read_timeout": 10},
+    "github":       {"pool_size": 2,  "connect_timeout": 10, "read_timeout": 60},
+}
+DEFAULT_SETTINGS = {"pool_size": 4, "connect_timeout": 5, "read_timeout": 15}
+
+# Retry policy for transient failures. Only idempotent methods are retried on
+# read errors/5xx, with our own capped backoff. 429s and Retry-After are left to
+# rate_limiter.py, so no resend skips the token bucket or the circuit breaker.
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_BACKOFF_JITTER = 0.5
+RETRY_STATUS_FORCELIST = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a default (connect, read) timeout and counts how
+    many requests were served over reused keep-alive connections. Every
+    outcome is reported to the provider's circuit breaker.
+    """
+
+    def __init__(self, default_timeout, provider=None, **kwargs):
+        self.default_timeout = default_timeout
+        self.provider = provider
+        self.requests_sent = 0
+        self._pools = {}
+        self._stats_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(*args, **kwargs)
+        with self._stats_lock:
+            self._pools[id(pool)] = pool
+        return pool
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.default_timeout
+        started = time.monotonic()
+        try:
+            response = super().send(request, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            get_run_report().record_call(self.provider, time.monotonic() - started)
+            if self.provider:
+                get_breaker(self.provider).failure()
+            raise
+        get_run_report().record_call(self.provider, time.monotonic() - started, response.status_code)
+        if self.provider:
+            get_breaker(self.provider).observe(response)
+        with self._stats_lock:
+            self.requests_sent += 1
+        return response
+
+    def connections_opened(self):
+        with self._stats_lock:
+            return sum(pool.num_connections for pool in self._pools.values())
+
+class ReportingRetry(Retry):
+    """Retry policy that records every retried response (e.g. a 503) in the run report."""
+
+    provider = None
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.provider = self.provider
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        get_run_report().record_retry(self.provider, response.status if response is not None else None)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+def _build_retry(provider=None):
+    retry = ReportingRetry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        backoff_jitter=RETRY_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    retry.provider = provider
+    return retry
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(provider):
+    """
+    Return the shared, pooled requests.Session for ``provider``.
+
+    Sessions keep TLS connections alive between calls, apply the provider's
+    connect/read timeouts when the caller passes none, and retry idempotent
+    requests with jittered exponential backoff.
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            settings = {**DEFAULT_SETTINGS, **PROVIDER_SETTINGS.get(provider, {})}
+            adapter = PooledAdapter(
+                provider=provider,
+                default_timeout=(settings["connect_timeout"], settings["read_timeout"]),
+                pool_connections=settings["pool_size"],
+                pool_maxsize=settings["pool_size"],
+                max_retries=_build_retry(provider),
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+        return session
+
+def connection_stats():
+    """
+    Returns:
+        dict: {provider: {"requests": int, "connections": int, "reused": int}}
+    """
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    stats = {}
+    for provider, session in sessions.items():
+        adapter = session.get_adapter("https://")
+        requests_sent = adapter.requests_sent
+        opened = adapter.connections_opened()
+        stats[provider] = {
+            "requests": requests_sent,
+            "connections": opened,
+            "reused": max(0, requests_sent - opened),
+        }
+    return stats
+
+def print_connection_stats():
+    stats = {p: s for p, s in connection_stats().items() if s["requests"]}
+    if not stats:
+        return
+    print("🔌 HTTP connection reuse:")
+    for provider, s in sorted(stats.items()):
+        print(f"   {provider:<13} {s['requests']:>5} requests over {s['connections']:>3} connections ({s['reused']} reused)")
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,160 @@
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+
+from distance_cache import json_cache_lock, load_json_cache, save_json_cache
+
+MISSING_AIRPORTS_FILE = "missing_airports.json"
+MISSING_AIRPORTS_JOURNAL = "missing_airports.jsonl"
+
+def load_missing_airports(path=MISSING_AIRPORTS_FILE):
+    return load_json_cache(path)
+
+def save_missing_airports(missing_airports: dict, path=MISSING_AIRPORTS_FILE):
+    save_json_cache(missing_airports, path)
+
+def read_journal(path):
+    """
+    Returns:
+        list: Records in the JSON Lines journal (a torn last line is skipped)
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def merge_records(missing_airports: dict, records):
+    """Add journal records to the compacted dict; the first finding per ICAO wins."""
+    for record in records:
+        icao = record.get("icao")
+        if icao and icao not in missing_airports:
+            missing_airports[icao] = record
+    return missing_airports
+
+class MissingAirportJournal:
+    """
+    Append-only log of airports missing from VAcentral.
+
+    ``log`` only touches memory: new ICAOs are buffered and written to
+    ``missing_airports.jsonl`` by ``flush`` as one appended block, one JSON
+    record per line, so concurrent runs (ALL mode workers, parallel
+    workflow jobs) never overwrite each other. ``compact`` folds the journal
+    into ``missing_airports.json``, which keeps its original shape:
+
+        {"ICAO": {"icao": str, "first_seen": ISO timestamp,
+                  "found_in": str | None, "status": "found" | "not_found",
+                  "latitude": float, "longitude": float}}
+    """
+
+    def __init__(self, path=MISSING_AIRPORTS_FILE, journal_path=MISSING_AIRPORTS_JOURNAL):
+        self.path = path
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._known = None
+
+    def _load_known(self):
+        if self._known is None:
+            known = set(load_missing_airports(self.path))
+            known.update(r.get("icao") for r in read_journal(self.journal_path))
+            self._known = known
+        return self._known
+
+    def log(self, icao_code, found_in=None, coordinates=None):
+        """
+        Record an airport missing from VAcentral unless it is already known.
+
+        Returns:
+            bool: True if this is a new finding
+        """
+        icao_upper = icao_code.strip().upper()
+        with self._lock:
+            known = self._load_known()
+            if icao_upper in known:
+                return False
+            entry = {
+                "icao": icao_upper,
+                "first_seen": datetime.now().isoformat(),
+                "found_in": found_in,
+                "status": "found" if found_in else "not_found"
+            }
+            if coordinates:
+                entry["latitude"] = coordinates[0]
+                entry["longitude"] = coordinates[1]
+            known.add(icao_upper)
+            self._buffer.append(entry)
+            return True
+
+    def flush(self):
+        """Append buffered findings to the journal in a single write."""
+        with self._lock:
+            if not self._buffer:
+                return
+            block = "".join(json.dumps(entry, ensure_ascii=False, sort_keys=True) + "\n"
+                            for entry in self._buffer)
+            # O_APPEND + one write keeps blocks from concurrent processes whole; the
+            # lock keeps compact() from moving the journal aside between open and write
+            with json_cache_lock(self.path):
+                fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, block.encode("utf-8"))
+                finally:
+                    os.close(fd)
+            self._buffer = []
+
+    def compact(self):
+        """
+        Flush, then fold the journal into missing_airports.json and remove it.
+
+        The journal is moved aside before it is read, so findings appended by
+        another process meanwhile land in a fresh journal instead of being lost,
+        and the JSON is merged under json_cache_lock, so two processes
+        compacting at once do not drop each other's findings.
+
+        Returns:
+            dict: The compacted view, keyed by ICAO
+        """
+        self.flush()
+        with self._lock, json_cache_lock(self.path):
+            missing_airports = load_missing_airports(self.path)
+            if not os.path.exists(self.journal_path):
+                return missing_airports
+            aside = f"{self.journal_path}.{os.getpid()}.compacting"
+            os.replace(self.journal_path, aside)
+            merge_records(missing_airports, read_journal(aside))
+            save_missing_airports(missing_airports, self.path)
+            os.remove(aside)
+            if self._known is not None:
+                self._known.update(missing_airports)
+            return missing_airports
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_missing_airports_journal(path=MISSING_AIRPORTS_FILE):
+    """Return the process-wide MissingAirportJournal."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = MissingAirportJournal(path)
+        return _journal
+
+def _flush_at_exit():
+    if _journal is not None:
+        try:
+            _journal.flush()
+        except Exception as e:
+            print(f"⚠️ Could not flush missing airports journal {_journal.journal_path}: {e}")
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,269 @@
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from circuit_breaker import CircuitOpenError, provider_slot
+from distance_cache import load_json_cache, save_json_cache
+from http_client import get_session
+from rate_limiter import get_limiter
+
+PHPVMS_SNAPSHOT_FILE = "phpvms_airports.json"
+PHPVMS_SNAPSHOT_VERSION = 1
+# Rebuild the snapshot once it is older than this (per-ICAO calls cover airports added since)
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("PHPVMS_SNAPSHOT_MAX_AGE_HOURS", "24")) * 3600
+SNAPSHOT_PAGE_WORKERS = 4   # Concurrent page requests while refreshing
+SNAPSHOT_PAGE_ATTEMPTS = 5  # Tries per page when phpVMS answers 429
+# Fields kept per airport; everything the generator reads from a phpVMS airport
+SNAPSHOT_FIELDS = ("id", "icao", "iata", "name", "location", "country", "timezone", "hub", "lat", "lon")
+
+def _airports_url(endpoint):
+    return f"{endpoint.rstrip('/')}/api/airports"
+
+def fetch_airports_page(endpoint, api_key, page):
+    """
+    Fetch one page of ``GET /api/airports``.
+
+    Each request holds a phpVMS concurrency slot, so page workers and the
+    generator's per-ICAO checks share PROVIDER_CONCURRENCY and the breaker.
+
+    Returns:
+        dict: Decoded JSON body ({"data": [...], "meta": {"last_page": ...}, ...})
+
+    Raises:
+        CircuitOpenError: If the phpVMS circuit breaker is open
+    """
+    limiter = get_limiter("phpvms")
+    for attempt in range(1, SNAPSHOT_PAGE_ATTEMPTS + 1):
+        with provider_slot("phpvms"):
+            response = get_session("phpvms").get(_airports_url(endpoint), params={"page": page},
+                                                 headers={"X-API-Key": api_key})
+        retry_after = limiter.observe(response)
+        if response.status_code == 429 and attempt < SNAPSHOT_PAGE_ATTEMPTS:
+            limiter.pause(max(1, retry_after) if retry_after is not None else 2 ** attempt)
+            continue
+        response.raise_for_status()
+        return response.json()
+
+def fetch_all_airports(endpoint, api_key, max_workers=SNAPSHOT_PAGE_WORKERS):
+    """
+    Page through the phpVMS v7 airports list once.
+
+    The first page tells how many pages there are (``meta.last_page``); the
+    rest are fetched concurrently. Servers that do not report a page count
+    are paged sequentially until an empty page.
+
+    Returns:
+        list: Airport dicts as returned by phpVMS
+    """
+    first = fetch_airports_page(endpoint, api_key, 1)
+    airports = list(first.get("data") or [])
+    last_page = (first.get("meta") or {}).get("last_page")
+    if last_page is not None:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for body in pool.map(lambda page: fetch_airports_page(endpoint, api_key, page),
+                                 range(2, int(last_page) + 1)):
+                airports.extend(body.get("data") or [])
+        return airports
+    page, body = 1, first
+    while body.get("data"):
+        page += 1
+        body = fetch_airports_page(endpoint, api_key, page)
+        airports.extend(body.get("data") or [])
+    return airports
+
+def _trim(airport):
+    return {key: airport[key] for key in SNAPSHOT_FIELDS if key in airport}
+
+class PhpvmsAirportSnapshot:
+    """
+    Local copy of every airport in phpVMS v7, keyed by ICAO.
+
+    Answers "is this ICAO in phpVMS" from memory. The snapshot only ever says
+    yes: an ICAO it does not have may have been added since the last refresh,
+    so callers fall back to a per-ICAO request and ``add`` the answer.
+
+    File format (phpvms_airports.json):
+        {"version": 1, "endpoint": str, "refreshed_at": ISO timestamp,
+         "refreshed_epoch": int, "airports": {"ICAO": {"lat": ..., "lon": ..., ...}}}
+    """
+
+    def __init__(self, path=PHPVMS_SNAPSHOT_FILE, data=None):
+        self.path = path
+        data = data or {}
+        self.endpoint = data.get("endpoint")
+        self.refreshed_at = data.get("refreshed_at")
+        self.refreshed_epoch = data.get("refreshed_epoch", 0)
+        self.airports = data.get("airports", {})
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @classmethod
+    def load(cls, path=PHPVMS_SNAPSHOT_FILE):
+        data = load_json_cache(path)
+        if data.get("version") != PHPVMS_SNAPSHOT_VERSION:
+            data = {}
+        return cls(path, data)
+
+    def __len__(self):
+        return len(self.airports)
+
+    def is_fresh(self, endpoint, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+        return (self.endpoint == endpoint.rstrip('/')
+                and time.time() - self.refreshed_epoch < max_age)
+
+    def get(self, icao_code):
+        """
+        Returns:
+            dict: phpVMS airport data, or None if not in the snapshot
+        """
+        return self.airports.get(icao_code.strip().upper())
+
+    def add(self, icao_code, airport):
+        with self._lock:
+            self.airports[icao_code.strip().upper()] = _trim(airport)
+            self._pending += 1
+
+    def refresh(self, endpoint, api_key, max_workers=SNAPSHOT_PAGE_WORKERS):
+        """Replace the snapshot with the full airports list and save it."""
+        started = time.monotonic()
+        airports = fetch_all_airports(endpoint, api_key, max_workers)
+        with self._lock:
+            self.airports = {a["icao"].strip().upper(): _trim(a) for a in airports if a.get("icao")}
+            self.endpoint = endpoint.rstrip('/')
+            self.refreshed_at = datetime.now().isoformat(timespec="seconds")
+            self.refreshed_epoch = int(time.time())
+            self._pending = 1
+        self.save()
+        print(f"✅ phpVMS v7 snapshot: {len(self.airports)} airports in {time.monotonic() - started:.1f}s")
+
+    def save(self):
+        with self._lock:
+            if self._pending == 0:
+                return
+            save_json_cache({
+                "version": PHPVMS_SNAPSHOT_VERSION,
+                "endpoint": self.endpoint,
+                "refreshed_at": self.refreshed_at,
+                "refreshed_epoch": self.refreshed_epoch,
+                "airports": self.airports,
+            }, self.path)
+            self._pending = 0
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_phpvms_snapshot(endpoint, api_key, path=PHPVMS_SNAPSHOT_FILE, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+    """
+    Return the process-wide snapshot, refreshing it first if it is missing,
+    older than ``max_age`` or was taken from another endpoint.
+
+    A failed refresh keeps whatever was loaded from disk; lookups the snapshot
+    cannot answer fall back to per-ICAO requests either way.
+
+    Returns:
+        PhpvmsAirportSnapshot: The snapshot, or None if phpVMS is not configured
+    """
+    global _snapshot
+    if not endpoint or not api_key:
+        return None
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = PhpvmsAirportSnapshot.load(path)
+            if not _snapshot.is_fresh(endpoint, max_age):
+                print(f"🔄 Refreshing phpVMS v7 airport snapshot from {_airports_url(endpoint)}")
+                try:
+                    _snapshot.refresh(endpoint, api_key)
+                except (requests.exceptions.RequestException, ValueError, CircuitOpenError) as e:
+                    print(f"⚠️ Could not refresh phpVMS v7 snapshot ({e}); "
+                          f"using {len(_snapshot)} cached airports and per-ICAO checks")
+        return _snapshot
+
+def _save_at_exit():
+    if _snapshot is not None:
+        try:
+            _snapshot.save()
+        except Exception as e:
+            print(f"⚠️ Could not save phpVMS v7 snapshot {_snapshot.path}: {e}")
+
+atexit.register(_save_at_exit)
+
+def verify_airports(icaos, endpoint, api_key, refresh=False):
+    """
+    Check a list of ICAOs against phpVMS v7: one refresh of the snapshot, then
+    a per-ICAO request only for airports the snapshot does not have.
+
+    Returns:
+        tuple: (found ICAOs, missing ICAOs)
+    """
+    snapshot = get_phpvms_snapshot(endpoint, api_key, max_age=0 if refresh else SNAPSHOT_MAX_AGE_SECONDS)
+    found, missing = [], []
+    for icao in icaos:
+        icao = icao.strip().upper()
+        airport = snapshot.get(icao)
+        if airport is None:
+            try:
+                with provider_slot("phpvms"):
+                    response = get_session("phpvms").get(f"{_airports_url(endpoint)}/{icao}",
+                                                         headers={"X-API-Key": api_key})
+                get_limiter("phpvms").observe(response)
+                if response.status_code == 200 and "data" in response.json():
+                    airport = response.json()["data"]
+                    snapshot.add(icao, airport)
+            except (requests.exceptions.RequestException, ValueError, CircuitOpenError) as e:
+                print(f"❌ {icao}: Error - {e}")
+        if airport is None:
+            print(f"❌ {icao}: NOT found in phpVMS v7")
+            missing.append(icao)
+        else:
+            print(f"✅ {icao}: Found in phpVMS v7")
+            print(f"   Name: {airport.get('name', 'N/A')}")
+            print(f"   Location: {airport.get('location', 'N/A')}, {airport.get('country', 'N/A')}")
+            found.append(icao)
+    snapshot.save()
+    return found, missing
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check airports against a local snapshot of phpVMS v7.")
+    parser.add_argument("icaos", nargs="*", help="ICAO codes to check")
+    parser.add_argument("--file", help="Read ICAO codes from this file (one per line)")
+    parser.add_argument("--refresh", action="store_true", help="Refresh the snapshot even if it is still fresh")
+    args = parser.parse_args()
+
+    endpoint = os.getenv("PHPVMSV7_ENDPOINT")
+    api_key = os.getenv("PHPVMSV7_API_KEY")
+    if not endpoint or not api_key:
+        print("⚠️ phpVMS v7 credentials not configured")
+        print("   Set PHPVMSV7_ENDPOINT and PHPVMSV7_API_KEY")
+        sys.exit(0)
+
+    icaos = list(args.icaos)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            icaos += [line.strip() for line in f if line.strip()]
+    if not icaos:
+        get_phpvms_snapshot(endpoint, api_key, max_age=0 if args.refresh else SNAPSHOT_MAX_AGE_SECONDS)
+        sys.exit(0)
+
+    print(f"🔍 Verifying {len(icaos)} airport(s) in phpVMS v7...")
+    print("="*60)
+    found, missing = verify_airports(icaos, endpoint, api_key, refresh=args.refresh)
+    print("\n" + "="*60)
+    print(f"✅ Verified: {len(found)}")
+    print(f"❌ Failed: {len(missing)}")
+    if missing:
+        print("\n⚠️ The following airports are NOT in phpVMS v7:")
+        for icao in missing:
+            print(f"   - {icao}")
+        print("\n📝 Action Required:")
+        print("   1. Import flights-generator/custom_airports.csv into phpVMS v7")
+        print("   2. Re-run this workflow to verify")
+    else:
+        print("\n🎉 All airports successfully verified!")
+    print("="*60)
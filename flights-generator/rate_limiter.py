@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Requests per minute allowed for each external provider.
+# Override with <PROVIDER>_RATE_PER_MIN, e.g. AIRPORTGAP_RATE_PER_MIN=60
+DEFAULT_RATES_PER_MIN = {
+    "airportgap": 100,
+    "vacentral": 60,
+    "airportdb_io": 60,
+    "phpvms": 120,
+}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for one provider.
+
+    ``acquire()`` is called right before a request is sent, so only requests
+    that actually go out are charged; cache hits never touch the bucket and
+    never sleep. The bucket can also be paused until a point in time when the
+    server tells us to back off (Retry-After / X-RateLimit-Reset).
+    """
+
+    def __init__(self, name, rate_per_min, capacity=None):
+        self.name = name
+        self.rate_per_sec = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_min)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_sec)
+            self._updated = now
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        announced = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._paused_until > now:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    self.waited_seconds += waited
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate_per_sec
+            if not announced and delay >= 1:
+                print(f"⏳ {self.name} rate limit: waiting {delay:.1f} seconds...")
+                announced = True
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Stop handing out tokens for ``seconds`` (shared by every thread)."""
+        if seconds is None or seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+            self._tokens = 0.0
+
+    def observe(self, response):
+        """
+        Update the bucket from a provider response.
+
+        Honours ``Retry-After`` on 429/503 and ``X-RateLimit-Remaining`` /
+        ``X-RateLimit-Reset`` on any response.
+
+        Returns:
+            float: Seconds the server asked us to wait, or None
+        """
+        headers = getattr(response, "headers", None) or {}
+        wait = None
+        if response.status_code in (429, 503):
+            wait = parse_retry_after(headers.get("Retry-After"))
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            try:
+                if int(float(remaining)) <= 0:
+                    reset_wait = parse_rate_limit_reset(headers.get("X-RateLimit-Reset"))
+                    if reset_wait is not None:
+                        wait = max(wait or 0, reset_wait)
+            except ValueError:
+                pass
+        if wait:
+            self.pause(wait)
+        return wait
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delta seconds or HTTP date).
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing/invalid
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def parse_rate_limit_reset(value):
+    """
+    Parse X-RateLimit-Reset, which providers send either as an epoch
+    timestamp or as seconds until the window resets.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing/invalid
+    """
+    if not value:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    if reset > 1_000_000_000:  # epoch seconds
+        return max(0.0, reset - time.time())
+    return max(0.0, reset)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider):
+    """Return the shared TokenBucket for ``provider``, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            default = DEFAULT_RATES_PER_MIN.get(provider, 60)
+            rate = float(os.getenv(f"{provider.upper()}_RATE_PER_MIN", default))
+            limiter = TokenBucket(provider, rate)
+            _limiters[provider] = limiter
+        return limiter
+
+def limiter_stats():
+    """
+    Returns:
+        dict: {provider: {"requests": int, "waited_seconds": float}}
+    """
+    with _limiters_lock:
+        return {
+            name: {"requests": limiter.requests, "waited_seconds": round(limiter.waited_seconds, 3)}
+            for name, limiter in _limiters.items()
+        }
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import os
+import re
+import time
+from datetime import datetime
+
+import requests
+
+from distance_cache import load_json_cache, save_json_cache
+from http_client import get_session
+
+# A dropped connection loses at most the chunk being read
+CHUNK_SIZE = 64 * 1024
+# Requests per download; every attempt after a dropped connection resumes from the partial file
+DOWNLOAD_ATTEMPTS = int(os.getenv("DOWNLOAD_ATTEMPTS", "4"))
+DOWNLOAD_BACKOFF_SECONDS = 1
+# Transfer errors after which the partial file is kept and resumed
+RESUMABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout)
+
+class DownloadError(Exception):
+    """Raised when a downloaded file fails its size or checksum check."""
+
+def meta_path(path):
+    """Sidecar kept next to a finished download: url, ETag, Last-Modified, size, sha256."""
+    return f"{path}.meta"
+
+def part_path(path):
+    return f"{path}.part"
+
+def load_download_meta(path):
+    """
+    Returns:
+        dict: Validators and checksum of the last completed download of ``path`` ({} if none)
+    """
+    return load_json_cache(meta_path(path))
+
+def _content_range(response):
+    """
+    Returns:
+        tuple: (first byte, total size or None) from a Content-Range header, or (None, None)
+    """
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", ""))
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), None if total == "*" else int(total)
+
+def _identity_length(response):
+    # Content-Length counts the compressed bytes when the transfer is encoded
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    length = response.headers.get("Content-Length")
+    return int(length) if length is not None else None
+
+def _resume_state(url, part):
+    """
+    Returns:
+        tuple: (bytes already on disk, validators of the partial transfer) or (0, {}) if it cannot be resumed
+    """
+    state = load_json_cache(meta_path(part))
+    if not os.path.exists(part) or state.get("url") != url:
+        return 0, {}
+    if not (state.get("etag") or state.get("last_modified")):
+        return 0, {}
+    return os.path.getsize(part), state
+
+def _transfer(session, url, part, if_none_match):
+    """
+    Send one request and stream its body into ``part``.
+
+    Returns:
+        tuple: ("not_modified", None, None), ("incomplete", state, None) after a
+        short body, or ("complete", state, sha256 hex digest)
+    """
+    offset, state = _resume_state(url, part)
+    headers = {}
+    if offset:
+        # Only resume the same version of the file, and byte ranges only make sense uncompressed
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = state.get("etag") or state["last_modified"]
+        headers["Accept-Encoding"] = "identity"
+    if if_none_match:
+        headers["If-None-Match"] = if_none_match
+
+    with session.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            return "not_modified", None, None
+        if response.status_code == 416:
+            # Range no longer valid for this file; start over on the next attempt
+            os.remove(part)
+            return "incomplete", state, None
+        response.raise_for_status()
+
+        digest = hashlib.sha256()
+        if response.status_code == 206:
+            start, total = _content_range(response)
+            if start != offset:
+                raise DownloadError(f"server resumed at byte {start}, expected {offset}")
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            mode = "ab"
+            print(f"⏯️ Resuming {os.path.basename(url)} at {offset / 1024 / 1024:.2f} MB")
+        else:
+            offset, total, mode = 0, _identity_length(response), "wb"
+            state = {"url": url, "etag": response.headers.get("ETag"),
+                     "last_modified": response.headers.get("Last-Modified"), "size": total}
+            save_json_cache(state, meta_path(part))
+        state["size"] = total
+
+        written = offset
+        with open(part, mode) as f:
+            # iter_content decodes a gzip/deflate transfer, so the partial file always holds plain bytes
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+    if total is not None and written < total:
+        return "incomplete", state, None
+    if total is not None and written > total:
+        os.remove(part)
+        raise DownloadError(f"received {written} bytes, expected {total}")
+    return "complete", state, digest.hexdigest()
+
+def download_file(url, path, provider="github", if_none_match=None, expected_sha256=None,
+                  attempts=DOWNLOAD_ATTEMPTS):
+    """
+    Stream ``url`` to ``path`` in chunks, resuming an interrupted transfer.
+
+    The body goes to ``<path>.part``; a dropped connection keeps it, and the
+    next attempt (in this run or a later one) asks for the rest with
+    ``Range`` / ``If-Range``, so a changed upstream file restarts from zero.
+    Fresh transfers accept gzip. The finished file is checked against the
+    transferred size and, if given, ``expected_sha256`` before it is moved
+    into place, and its validators and checksum are saved to ``<path>.meta``.
+
+    Args:
+        url: File to download
+        path: Destination file
+        provider: http_client provider whose pooled session is used
+        if_none_match: ETag of a copy the caller already has; a 304 skips the download
+        expected_sha256: Hex digest the file must match (optional)
+        attempts: Requests to make before giving up
+
+    Returns:
+        dict: {"status": "downloaded" | "not_modified", "size", "sha256", "etag", "resumed"}
+
+    Raises:
+        requests.exceptions.RequestException: If every attempt failed
+        DownloadError: If the file fails its size or checksum check
+    """
+    session = get_session(provider)
+    part = part_path(path)
+    resumed = False
+    for attempt in range(1, attempts + 1):
+        resumed = resumed or _resume_state(url, part)[0] > 0
+        try:
+            outcome, state, sha256 = _transfer(session, url, part, if_none_match)
+        except RESUMABLE_ERRORS as e:
+            if attempt == attempts:
+                raise
+            print(f"⚠️ Download of {os.path.basename(url)} interrupted ({e.__class__.__name__}); "
+                  f"retrying ({attempt}/{attempts})")
+            time.sleep(DOWNLOAD_BACKOFF_SECONDS * attempt)
+            continue
+        if outcome == "not_modified":
+            return {"status": "not_modified", "size": None, "sha256": None, "etag": if_none_match,
+                    "resumed": False}
+        if outcome == "complete":
+            break
+        if attempt == attempts:
+            raise requests.exceptions.ConnectionError(f"{url}: transfer incomplete after {attempts} attempts")
+        time.sleep(DOWNLOAD_BACKOFF_SECONDS * attempt)
+
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        os.remove(part)
+        raise DownloadError(f"sha256 {sha256} does not match the expected {expected_sha256}")
+    size = os.path.getsize(part)
+    os.replace(part, path)
+    meta = {"url": url, "etag": state.get("etag"), "last_modified": state.get("last_modified"),
+            "size": size, "sha256": sha256, "downloaded_at": datetime.now().isoformat(timespec="seconds")}
+    save_json_cache(meta, meta_path(path))
+    try:
+        os.remove(meta_path(part))
+    except OSError:
+        pass
+    return {"status": "downloaded", "size": size, "sha256": sha256, "etag": meta["etag"], "resumed": resumed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Download a file with resume and integrity checks.")
+    parser.add_argument("url", help="File to download")
+    parser.add_argument("path", help="Destination file")
+    parser.add_argument("--sha256", help="Expected sha256 of the file")
+    parser.add_argument("--if-changed", action="store_true",
+                        help="Skip the download if the ETag in <path>.meta is unchanged upstream")
+    args = parser.parse_args()
+
+    etag = load_download_meta(args.path).get("etag") if args.if_changed and os.path.exists(args.path) else None
+    result = download_file(args.url, args.path, if_none_match=etag, expected_sha256=args.sha256)
+    if result["status"] == "not_modified":
+        print(f"✅ {args.path} is up to date (ETag {etag})")
+    else:
+        print(f"✅ Downloaded {args.path} ({result['size'] / 1024 / 1024:.2f} MB, sha256 {result['sha256']})")
+
+if __name__ == "__main__":
+    main()
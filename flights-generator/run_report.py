@@ -0,0 +1,282 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "run_reports")
+RUN_REPORT_VERSION = 1
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+# Report order of the pipeline stages; any other stage is listed after these
+STAGE_ORDER = ("parse", "validate", "resolve", "distance", "generate", "update", "subfleets", "write")
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+class RunReport:
+    """
+    Counters and timers for one run, written out as a JSON report.
+
+    Stages are timed exclusively: entering a stage pauses the one it was
+    entered from, so a streaming pipeline (generate -> subfleets -> write)
+    charges each row's time to the stage that actually spent it. Stage
+    timing is tracked on the thread that created the report; provider calls
+    and cache lookups may be recorded from any thread.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._owner = threading.main_thread().ident
+        self._stack = []
+        self._mark = None
+        self.status = "ok"
+        self.stages = {}
+        self.providers = {}
+        self.caches = {}
+        self.breakers = {}
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {"seconds": 0.0, "rows": 0})
+
+    def _charge(self, now):
+        if self._stack:
+            self._stage(self._stack[-1])["seconds"] += now - self._mark
+        self._mark = now
+
+    def _enter(self, name):
+        if threading.get_ident() != self._owner:
+            return False
+        self._charge(time.monotonic())
+        self._stack.append(name)
+        self._stage(name)
+        return True
+
+    def _exit(self):
+        self._charge(time.monotonic())
+        self._stack.pop()
+
+    @contextmanager
+    def stage(self, name):
+        entered = self._enter(name)
+        try:
+            yield
+        finally:
+            if entered:
+                self._exit()
+
+    def timed(self, name, rows):
+        """Yield ``rows``, charging the time spent producing each one to ``name``."""
+        iterator = iter(rows)
+        while True:
+            entered = self._enter(name)
+            try:
+                row = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if entered:
+                    self._exit()
+            self._stage(name)["rows"] += 1
+            yield row
+
+    def add_rows(self, name, count):
+        self._stage(name)["rows"] += count
+
+    def record_call(self, provider, seconds, status=None):
+        """Record one request sent to ``provider`` (status None = connection error)."""
+        with self._lock:
+            entry = self.providers.setdefault(provider, {"latencies": [], "status": {}, "errors": 0})
+            entry["latencies"].append(seconds)
+            if status is None:
+                entry["errors"] += 1
+            else:
+                entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+
+    def record_retry(self, provider, status=None):
+        """Record a response (or connection error) the HTTP layer retried by itself."""
+        with self._lock:
+            entry = self.providers.setdefault(provider, {"latencies": [], "status": {}, "errors": 0})
+            retried = entry.setdefault("retried", {})
+            key = str(status) if status is not None else "error"
+            retried[key] = retried.get(key, 0) + 1
+
+    def record_breaker(self, provider, state, opened=0, skipped=0):
+        """Record a circuit breaker's current state and how often it opened / skipped a call."""
+        with self._lock:
+            entry = self.breakers.setdefault(provider, {"state": state, "opened": 0, "skipped": 0})
+            entry["state"] = state
+            entry["opened"] += opened
+            entry["skipped"] += skipped
+
+    def cache_lookup(self, cache, hit):
+        with self._lock:
+            entry = self.caches.setdefault(cache, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += 1
+
+    def merge(self, data):
+        """Add the raw counters of another report (``raw()``), e.g. from a worker process."""
+        with self._lock:
+            for name, stage in data.get("stages", {}).items():
+                mine = self._stage(name)
+                mine["seconds"] += stage["seconds"]
+                mine["rows"] += stage["rows"]
+            for provider, entry in data.get("providers", {}).items():
+                mine = self.providers.setdefault(provider, {"latencies": [], "status": {}, "errors": 0})
+                mine["latencies"].extend(entry["latencies"])
+                mine["errors"] += entry["errors"]
+                for status, count in entry["status"].items():
+                    mine["status"][status] = mine["status"].get(status, 0) + count
+                retried = mine.setdefault("retried", {})
+                for status, count in entry.get("retried", {}).items():
+                    retried[status] = retried.get(status, 0) + count
+            for cache, entry in data.get("caches", {}).items():
+                mine = self.caches.setdefault(cache, {"hits": 0, "misses": 0})
+                mine["hits"] += entry["hits"]
+                mine["misses"] += entry["misses"]
+            for provider, entry in data.get("breakers", {}).items():
+                mine = self.breakers.setdefault(provider, {"state": entry["state"], "opened": 0, "skipped": 0})
+                # A breaker left open in any worker is reported as open
+                if entry["state"] != "closed":
+                    mine["state"] = entry["state"]
+                mine["opened"] += entry["opened"]
+                mine["skipped"] += entry["skipped"]
+
+    def raw(self):
+        """Picklable counters for ``merge``."""
+        with self._lock:
+            return {"stages": {k: dict(v) for k, v in self.stages.items()},
+                    "providers": {k: {"latencies": list(v["latencies"]), "status": dict(v["status"]),
+                                      "errors": v["errors"], "retried": dict(v.get("retried", {}))}
+                                  for k, v in self.providers.items()},
+                    "caches": {k: dict(v) for k, v in self.caches.items()},
+                    "breakers": {k: dict(v) for k, v in self.breakers.items()}}
+
+    def drain(self):
+        """Return ``raw()`` and clear the counters (a batch worker hands over one job at a time)."""
+        data = self.raw()
+        with self._lock:
+            self.stages.clear()
+            self.providers.clear()
+            self.caches.clear()
+            self.breakers.clear()
+        return data
+
+    def to_dict(self, status="ok"):
+        wall = time.monotonic() - self._started
+        stages = {}
+        order = {name: i for i, name in enumerate(STAGE_ORDER)}
+        for name, stage in sorted(self.stages.items(), key=lambda item: order.get(item[0], len(order))):
+            seconds = stage["seconds"]
+            stages[name] = {"seconds": round(seconds, 3), "rows": stage["rows"],
+                            "rows_per_second": round(stage["rows"] / seconds, 1) if stage["rows"] and seconds > 0 else None}
+        providers = {}
+        for name, entry in sorted(self.providers.items()):
+            latencies = sorted(seconds * 1000 for seconds in entry["latencies"])
+            latency = {f"p{p}": round(percentile(latencies, p), 1) for p in LATENCY_PERCENTILES} if latencies else {}
+            if latencies:
+                latency["max"] = round(latencies[-1], 1)
+                latency["mean"] = round(sum(latencies) / len(latencies), 1)
+            retried = entry.get("retried", {})
+            providers[name] = {"calls": len(latencies), "errors": entry["errors"],
+                               "rate_limited": entry["status"].get("429", 0) + retried.get("429", 0),
+                               "retries": sum(retried.values()),
+                               "status": dict(sorted(entry["status"].items())),
+                               "retried": dict(sorted(retried.items())), "latency_ms": latency}
+        caches = {}
+        for name, entry in sorted(self.caches.items()):
+            total = entry["hits"] + entry["misses"]
+            caches[name] = {**entry, "hit_rate": round(entry["hits"] / total, 3) if total else None}
+        return {
+            "version": RUN_REPORT_VERSION,
+            "command": sys.argv,
+            "started_at": self.started_at,
+            "status": status,
+            "wall_seconds": round(wall, 3),
+            "stages": stages,
+            "providers": providers,
+            "caches": caches,
+            "breakers": dict(sorted(self.breakers.items())),
+        }
+
+    def print_table(self, report):
+        print("\n" + "="*80)
+        print(f"RUN REPORT ({report['wall_seconds']:.1f}s wall)")
+        print("="*80)
+        if report["stages"]:
+            print(f"{'stage':<12} {'seconds':>9} {'rows':>8} {'rows/s':>10}")
+            for name, s in report["stages"].items():
+                rate = f"{s['rows_per_second']:.0f}" if s["rows_per_second"] else "-"
+                print(f"{name:<12} {s['seconds']:>9.2f} {s['rows']:>8} {rate:>10}")
+        if report["providers"]:
+            print(f"\n{'provider':<13} {'calls':>6} {'429':>5} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            for name, p in report["providers"].items():
+                lat = p["latency_ms"]
+                print(f"{name:<13} {p['calls']:>6} {p['rate_limited']:>5} {p['errors']:>6} "
+                      f"{lat.get('p50', 0):>8.0f} {lat.get('p95', 0):>8.0f} {lat.get('max', 0):>8.0f}")
+        if report["caches"]:
+            print(f"\n{'cache':<13} {'hits':>7} {'misses':>7} {'hit rate':>9}")
+            for name, c in report["caches"].items():
+                rate = f"{c['hit_rate']:.0%}" if c["hit_rate"] is not None else "-"
+                print(f"{name:<13} {c['hits']:>7} {c['misses']:>7} {rate:>9}")
+        if report["breakers"]:
+            print(f"\n{'breaker':<13} {'state':>9} {'opened':>7} {'skipped':>8}")
+            for name, b in report["breakers"].items():
+                print(f"{name:<13} {b['state']:>9} {b['opened']:>7} {b['skipped']:>8}")
+        print("="*80)
+
+    def write(self, path, status="ok"):
+        """Write the JSON report (atomically) and print the console table."""
+        report = self.to_dict(status)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, path)
+        self.print_table(report)
+        print(f"📝 Run report written to {path}")
+        return report
+
+_report = None
+_report_lock = threading.Lock()
+
+def get_run_report():
+    """Return the process-wide RunReport, starting its clock on first use."""
+    global _report
+    with _report_lock:
+        if _report is None:
+            _report = RunReport()
+        return _report
+
+def run_report_path(label, time_generated):
+    """Default report path for one run, e.g. run_reports/MUHA_HAV_20250101-120000.json."""
+    return os.path.join(RUN_REPORT_DIR, f"{label}_{time_generated}.json")
+
+def write_run_report_at_exit(path):
+    """Write the report when the process exits; status is "error" on an uncaught exception."""
+    report = get_run_report()
+    previous_hook = sys.excepthook
+    failed = []
+
+    def _hook(*exc_info):
+        failed.append(True)
+        previous_hook(*exc_info)
+
+    def _write():
+        status = "error" if failed else report.status
+        try:
+            report.write(path, status)
+        except OSError as e:
+            print(f"⚠️ Could not write run report {path}: {e}")
+
+    sys.excepthook = _hook
+    atexit.register(_write)
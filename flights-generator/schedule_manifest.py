@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+def sha256_of_file(path):
+    """
+    Returns:
+        str: Hex sha256 of the file, or None if it does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sha256_of_json(value):
+    """Stable sha256 of any JSON-serialisable value (keys sorted)."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+def pair_key(pair):
+    """
+    Normalised airports.txt / legs.txt line for a parsed pair (comments dropped).
+
+    Args:
+        pair: ((icao1, iata1), (icao2, iata2))
+    """
+    (a1_icao, a1_iata), (a2_icao, a2_iata) = pair
+    return f"{a1_icao}-{a1_iata},{a2_icao}-{a2_iata}"
+
+class ScheduleManifest:
+    """
+    Record of what produced a base's or tour's flights CSV.
+
+    Stores the generation settings (route code, first flight number, tour
+    config hash), the aircraft_config.json hash, the sha256 of the written CSV
+    and, for every pair line, the flight numbers of the rows it produced
+    (``{"MUHA-HAV,SABE-AEP": [1000, 1001, 1002, 1003]}``). A later incremental
+    run reuses those rows from the CSV as long as the settings and the CSV
+    itself are unchanged.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        data = data or {}
+        self.settings = data.get("settings", {})
+        self.aircraft_config_sha256 = data.get("aircraft_config_sha256")
+        self.output_sha256 = data.get("output_sha256")
+        self.pairs = data.get("pairs", {})
+        self._recorded = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load the manifest at ``path`` (empty if missing, unreadable or another version)."""
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    return cls(path, data)
+                print(f"⚠️ Ignoring {path}: manifest version {data.get('version')} is not {MANIFEST_VERSION}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+        return cls(path)
+
+    def stale_reason(self, settings, output_path):
+        """
+        Check whether rows recorded in this manifest can be reused.
+
+        Returns:
+            str: Why everything must be regenerated, or None if rows can be reused
+        """
+        if not self.pairs:
+            return "no manifest yet"
+        if self.settings != settings:
+            changed = sorted(k for k in set(self.settings) | set(settings)
+                             if self.settings.get(k) != settings.get(k))
+            return f"settings changed ({', '.join(changed)})"
+        if sha256_of_file(output_path) != self.output_sha256:
+            return f"{output_path} was modified outside the generator"
+        return None
+
+    def flight_numbers(self, key):
+        return self.pairs.get(key)
+
+    def next_flight_number(self, start_flight_number):
+        """First flight number not used by any pair in this manifest."""
+        used = [n for numbers in self.pairs.values() for n in numbers]
+        return max([start_flight_number - 1] + used) + 1
+
+    def record(self, key, flight_numbers):
+        self._recorded[key] = [int(n) for n in flight_numbers]
+
+    def save(self, settings, aircraft_config_sha256, output_path):
+        """Replace the manifest with the pairs recorded during this run (atomic write)."""
+        output_sha256 = sha256_of_file(output_path)
+        header = {
+            "version": MANIFEST_VERSION,
+            "settings": settings,
+            "aircraft_config_sha256": aircraft_config_sha256,
+            "output_sha256": output_sha256,
+        }
+        # One pair per line keeps git diffs of the manifest as small as the CSV's
+        lines = [f"    {json.dumps(key)}: {json.dumps(numbers)}" for key, numbers in self._recorded.items()]
+        body = json.dumps(header, indent=2)[:-2]
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body + ',\n  "pairs": {\n')
+            f.write(",\n".join(lines))
+            f.write("\n  }\n}\n")
+        os.replace(tmp, self.path)
+        self.settings = settings
+        self.aircraft_config_sha256 = aircraft_config_sha256
+        self.output_sha256 = output_sha256
+        self.pairs = self._recorded
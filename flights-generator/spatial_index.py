@@ -0,0 +1,157 @@
+import argparse
+import csv
+import math
+import os
+import time
+
+import numpy as np
+
+from airport_index import AIRPORTS_INDEX_FILE, open_index
+from geo_distance import DISTANCE_METHOD, EARTH_MEAN_RADIUS_NM, METHODS
+
+# Size of the lat/lon grid cells airports are bucketed into
+SPATIAL_CELL_DEGREES = 2.0
+# The grid is searched on a sphere; widen the search so no airport the
+# ellipsoidal distance puts in range is missed (the two differ by < 0.5%)
+SPHERE_MARGIN = 1.006
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+class AirportSpatialIndex:
+    """
+    Airports bucketed into a lat/lon grid for "everything within N nm" queries.
+
+    A query only looks at the grid cells that overlap the spherical cap
+    around the centre, drops the candidates outside the cap with one dot
+    product against their unit vectors, and computes the exact distance
+    (DISTANCE_METHOD, the same engine the generator uses) for what is left.
+    Over the ~28,000 airports of airports.idx this takes milliseconds.
+    """
+
+    def __init__(self, airports, cell_degrees=SPATIAL_CELL_DEGREES):
+        """
+        Args:
+            airports: Iterable of dicts with 'icao', 'lat', 'lon' (plus 'iata', 'country', ...)
+            cell_degrees: Grid cell size in degrees
+        """
+        self.airports = list(airports)
+        self._by_icao = {a["icao"]: a for a in self.airports}
+        self.cell_degrees = cell_degrees
+        self.lat = np.array([a["lat"] for a in self.airports], dtype=np.float64)
+        self.lon = np.array([a["lon"] for a in self.airports], dtype=np.float64)
+        self.xyz = _unit_vectors(self.lat, self.lon)
+        self._lat_cells = int(math.ceil(180 / cell_degrees))
+        self._lon_cells = int(math.ceil(360 / cell_degrees))
+        rows = np.minimum(((self.lat + 90) // cell_degrees).astype(int), self._lat_cells - 1)
+        cols = ((self.lon + 180) // cell_degrees).astype(int) % self._lon_cells
+        self._cells = {}
+        order = np.lexsort((cols, rows))
+        keys = rows[order] * self._lon_cells + cols[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        for chunk in np.split(order, bounds):
+            if len(chunk):
+                self._cells[int(rows[chunk[0]]), int(cols[chunk[0]])] = chunk
+
+    @classmethod
+    def from_sources(cls, index_file=AIRPORTS_INDEX_FILE, custom_csv="custom_airports.csv",
+                     cell_degrees=SPATIAL_CELL_DEGREES):
+        """
+        Build the index from airports.idx and custom_airports.csv (custom rows
+        win for an ICAO in both). Nothing is downloaded; a missing file is skipped.
+        """
+        airports = {}
+        index = open_index(index_file, max_age_days=None)
+        if index is not None:
+            for icao, lat, lon, iata, country in index.records():
+                airports[icao] = {"icao": icao, "lat": lat, "lon": lon, "iata": iata, "country": country,
+                                  "source": "local_db"}
+            index.close()
+        if os.path.exists(custom_csv):
+            with open(custom_csv, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if not row.get("lat") or not row.get("lon"):
+                        continue
+                    icao = row["icao"].strip().upper()
+                    airports[icao] = {"icao": icao, "lat": float(row["lat"]), "lon": float(row["lon"]),
+                                      "iata": (row.get("iata") or "").strip().upper(),
+                                      "country": (row.get("country") or "").strip(), "source": "custom_csv"}
+        return cls(airports.values(), cell_degrees)
+
+    def __len__(self):
+        return len(self.airports)
+
+    def get(self, icao_code):
+        """
+        Returns:
+            dict: The airport, or None if it is in neither source
+        """
+        return self._by_icao.get(icao_code.strip().upper())
+
+    def _candidate_cells(self, lat, lon, radius_deg):
+        d = self.cell_degrees
+        lat_lo, lat_hi = lat - radius_deg, lat + radius_deg
+        rows = range(max(0, int((lat_lo + 90) // d)), min(self._lat_cells - 1, int((lat_hi + 90) // d)) + 1)
+        # Longitude half-width of a spherical cap; the whole circle if it reaches a pole
+        sin_r, cos_lat = math.sin(math.radians(radius_deg)), math.cos(math.radians(lat))
+        if lat_lo <= -90 or lat_hi >= 90 or sin_r >= cos_lat:
+            cols = range(self._lon_cells)
+        else:
+            half = math.degrees(math.asin(sin_r / cos_lat))
+            first, last = int((lon - half + 180) // d), int((lon + half + 180) // d)
+            cols = range(first, last + 1) if last - first + 1 < self._lon_cells else range(self._lon_cells)
+        for row in rows:
+            for col in cols:
+                cell = self._cells.get((row, col % self._lon_cells))
+                if cell is not None:
+                    yield cell
+
+    def within(self, lat, lon, radius_nm, method=None):
+        """
+        Every airport within ``radius_nm`` of (lat, lon).
+
+        Returns:
+            list: (airport dict, distance nm) tuples, nearest first
+        """
+        radius_rad = min(math.pi, radius_nm * SPHERE_MARGIN / EARTH_MEAN_RADIUS_NM)
+        cells = list(self._candidate_cells(lat, lon, math.degrees(radius_rad)))
+        if not cells:
+            return []
+        candidates = np.concatenate(cells)
+        centre = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+        candidates = candidates[self.xyz[candidates] @ centre >= math.cos(radius_rad)]
+        if not len(candidates):
+            return []
+        pairs = np.empty((len(candidates), 2, 2))
+        pairs[:, 0, 0], pairs[:, 0, 1] = lat, lon
+        pairs[:, 1, 0], pairs[:, 1, 1] = self.lat[candidates], self.lon[candidates]
+        distances = METHODS[method or DISTANCE_METHOD](pairs)
+        keep = np.flatnonzero(distances <= radius_nm)
+        keep = keep[np.argsort(distances[keep], kind="stable")]
+        return [(self.airports[candidates[i]], float(distances[i])) for i in keep]
+
+def main():
+    parser = argparse.ArgumentParser(description="List airports within a radius of an airport, from the local databases.")
+    parser.add_argument("icao", help="Centre airport ICAO")
+    parser.add_argument("radius_nm", type=float, help="Radius in nautical miles")
+    parser.add_argument("--index", default=AIRPORTS_INDEX_FILE, help="Airport index (default: airports.idx)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = AirportSpatialIndex.from_sources(args.index)
+    built = time.perf_counter() - started
+    centre = index.get(args.icao)
+    if centre is None:
+        print(f"❌ {args.icao.upper()} is not in {args.index} or custom_airports.csv")
+        return
+    started = time.perf_counter()
+    found = index.within(centre["lat"], centre["lon"], args.radius_nm)
+    queried = time.perf_counter() - started
+    for airport, nm in found:
+        print(f"{airport['icao']:<8} {airport['iata'] or '-':<4} {airport['country'] or '-':<3} {nm:>8.0f} nm")
+    print(f"✅ {len(found)} of {len(index)} airports within {args.radius_nm:.0f} nm of {centre['icao']} "
+          f"(index built in {built * 1000:.0f} ms, query {queried * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
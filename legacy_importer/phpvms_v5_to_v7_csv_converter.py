@@ -1,9 +1,47 @@
-import csv,time,os,json
+import csv,time,os,json,sys
+from bisect import bisect_right
+from contextlib import contextmanager
 from datetime import datetime,timedelta
 from argparse import ArgumentParser
 
 # Constants
 AIRCRAFT_CONFIG_FILE = "aircraft_config.json"
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "run_reports")
+RUN_REPORT_FILE = os.getenv("RUN_REPORT_FILE")  # Fixed report path; default is RUN_REPORT_DIR/<label>_<timestamp>.json
+
+# Seconds spent per stage in this run, written to the run report by main()
+_stage_seconds = {}
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_seconds[name] = _stage_seconds.get(name, 0.0) + time.perf_counter() - started
+
+def write_run_report(status, rows, label="legacy"):
+    """
+    Write the stage timings atomically to RUN_REPORT_FILE or, by default,
+    RUN_REPORT_DIR/<label>_<timestamp>.json, so earlier reports are kept.
+    """
+    report = {
+        "version": 1,
+        "command": sys.argv,
+        "status": status,
+        "stages": {name: {"seconds": round(seconds, 3), "rows": rows.get(name, 0)}
+                   for name, seconds in _stage_seconds.items()},
+    }
+    path = RUN_REPORT_FILE or os.path.join(RUN_REPORT_DIR, f"{label}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+    for name, s in report["stages"].items():
+        print(f"⏱️ {name:<10} {s['seconds']:>8.2f}s {s['rows']:>8} rows")
+    print(f"📝 Run report written to {path}")
 
 def load_aircraft_config(config_file=AIRCRAFT_CONFIG_FILE):
     """
@@ -71,10 +109,76 @@ def build_aircrafts_range_by_icao(aircraft_config):
     """
     return {icao: data['range'] for icao, data in aircraft_config.items()}
 
-# Load aircraft configuration from JSON
-_aircraft_config = load_aircraft_config()
-airline_subfleet_by_flight_type = build_airline_subfleet_by_flight_type(_aircraft_config)
-aircrafts_range_by_icao = build_aircrafts_range_by_icao(_aircraft_config)
+class FleetRangeIndex:
+    """
+    Subfleet lookup compiled once from aircraft_config.json.
+
+    For each (airline, flight type) the distinct aircraft ranges are kept
+    sorted, and the subfleet string for every range bracket is built once and
+    interned. A lookup is a single bisect plus an index, and returns exactly
+    what the old per-row scan produced: aircraft in config order whose range
+    is greater than the flight distance, joined with ';'.
+    """
+
+    def __init__(self, subfleet_by_flight_type, range_by_icao):
+        self._subfleet_by_flight_type = subfleet_by_flight_type
+        self._range_by_icao = {icao: float(r) for icao, r in range_by_icao.items()}
+        self._compiled = {}
+
+    def _compile(self, airline, flight_type, filter_subfleets):
+        aircraft = self._subfleet_by_flight_type[airline][flight_type]
+        if filter_subfleets:
+            aircraft = [icao for icao in aircraft if icao in filter_subfleets]
+        ranges = sorted({self._range_by_icao[icao] for icao in aircraft})
+        brackets = [
+            sys.intern(';'.join(icao for icao in aircraft if self._range_by_icao[icao] >= low))
+            for low in ranges
+        ]
+        brackets.append("")
+        return ranges, brackets
+
+    def subfleets(self, airline, flight_type, distance, filter_subfleets=None):
+        """
+        Args:
+            airline: Airline code (e.g. 'CRN')
+            flight_type: 'J' or 'F'
+            distance: Flight distance in nautical miles
+            filter_subfleets: Optional list of allowed aircraft ICAO codes
+
+        Returns:
+            str: ';'-joined aircraft ICAO codes able to fly the distance
+        """
+        key = (airline, flight_type, frozenset(filter_subfleets) if filter_subfleets else None)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(airline, flight_type, key[2])
+        ranges, brackets = compiled
+        return brackets[bisect_right(ranges, distance)]
+
+_fleet = None
+
+def get_fleet():
+    """
+    Load aircraft_config.json on first use and build the fleet tables once.
+
+    Returns:
+        tuple: (airline_subfleet_by_flight_type, aircrafts_range_by_icao, fleet_range_index)
+    """
+    global _fleet
+    if _fleet is None:
+        aircraft_config = load_aircraft_config()
+        subfleet_by_flight_type = build_airline_subfleet_by_flight_type(aircraft_config)
+        range_by_icao = build_aircrafts_range_by_icao(aircraft_config)
+        _fleet = (subfleet_by_flight_type, range_by_icao,
+                  FleetRangeIndex(subfleet_by_flight_type, range_by_icao))
+    return _fleet
+
+def __getattr__(name):
+    # Module attributes that used to be built at import time
+    names = ("airline_subfleet_by_flight_type", "aircrafts_range_by_icao", "fleet_range_index")
+    if name in names:
+        return get_fleet()[names.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 special_code_to_airline = {
     "CRC" : "CRN"
@@ -86,6 +190,7 @@ v5_flight_type_to_v7 = {
 }
 
 def validate_subfleets(file):
+    airline_subfleet_by_flight_type, aircrafts_range_by_icao, _ = get_fleet()
     with open(file,'r') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
@@ -136,6 +241,7 @@ def import_schedules(file):
     return data
 
 def export_aircrafts(data,file):
+    _, aircrafts_range_by_icao, _ = get_fleet()
     if len(data) > 0:
         timestr = time.strftime("%Y%m%d-%H%M%S")
         export_file = f"exported-{timestr}-{file}"
@@ -204,6 +310,7 @@ def remove_non_numeric(text):
     return "".join(filter(str.isdigit, text))
 
 def export_flights(data,file):
+    fleet_range_index = get_fleet()[2]
     if len(data) > 0:
         timestr = time.strftime("%Y%m%d-%H%M%S")
         export_file = f"exported-{timestr}-{file}"
@@ -299,17 +406,8 @@ def export_flights(data,file):
                 active = "1"
                 # each flight needs a subfleet
                 # based on the range by ICAO and type of flight we would assign the subfleet
-                subfleets_list = []
-                subfleets = ""
-                # construct the subfleets list
-                for aircraft_icao in airline_subfleet_by_flight_type[airline][flight_type]:
-                    # if the subfleet icao has the range
-                    if float(aircrafts_range_by_icao[aircraft_icao]) > float(distance):
-                        # add the icao to the subfleet list for this flight
-                        subfleets_list.append(aircraft_icao)
-                if len(subfleets_list) > 0:
-                    # convert the subfleet list to a string where each subfleet is separated by ';' example: 'A30F;B48F;B74F;B75F;B76F;B77F;MD1F'
-                    subfleets = ';'.join(subfleets_list)
+                # subfleets is a string where each subfleet is separated by ';' example: 'A30F;B48F;B74F;B75F;B76F;B77F;MD1F'
+                subfleets = fleet_range_index.subfleets(airline, flight_type, float(distance))
                 writer.writerow({
                     "airline": airline,
                     "flight_number": flight_number, 
@@ -374,6 +472,7 @@ def split(filehandler, delimiter=',', row_limit=1000,
         current_out_writer.writerow(row)
             
 def update_subfleets(CSV_INPUT):
+    fleet_range_index = get_fleet()[2]
     # Read and update CSV
     with open(CSV_INPUT, 'r', newline='', encoding='utf-8') as csvfile_in:
         reader = csv.DictReader(csvfile_in)
@@ -422,11 +521,7 @@ def update_subfleets(CSV_INPUT):
         flight_time = str(flight_time_in_minutes)
         row["flight_time"] = flight_time
         flight_type = row["flight_type"] 
-        subfleets = []
-        for aircraft_icao in airline_subfleet_by_flight_type["CRN"][flight_type]:
-                if flight_distance < int(aircrafts_range_by_icao[aircraft_icao]):
-                    subfleets.append(aircraft_icao)
-        row['subfleets'] = ';'.join(subfleets)
+        row['subfleets'] = fleet_range_index.subfleets("CRN", flight_type, flight_distance)
 
     
     # remove unwanted flights
@@ -469,6 +564,9 @@ def main():
     parser.add_argument("-t", "--filetype", type="filetype",
                     help="phpvmsv5 type of file to read ('aircrafts'|'schedules'|'add-subfleets-v7'|'validate-subfleet')", metavar="aircrafts")
 
+    status = "error"
+    rows = {}
+    filetype = ""
     try:
         filename = ""
         args = parser.parse_args()
@@ -483,20 +581,29 @@ def main():
             print(f"Defined argument: {filetype}")
             if filetype != "":
                 if filetype == "aircrafts":
-                    imported_aircarft_data = import_aircraft(filename)
-                    export_aircrafts(imported_aircarft_data,filename)
+                    with stage("parse"):
+                        imported_aircarft_data = import_aircraft(filename)
+                    rows["parse"] = rows["write"] = len(imported_aircarft_data)
+                    with stage("write"):
+                        export_aircrafts(imported_aircarft_data,filename)
                 elif filetype == "schedules":
-                    imported_schedules_data = import_schedules(filename)
+                    with stage("parse"):
+                        imported_schedules_data = import_schedules(filename)
+                    rows["parse"] = rows["write"] = len(imported_schedules_data)
                     # print([imported_schedules_data[0]])
                     # print_data([imported_schedules_data[0]])
-                    export_flights(imported_schedules_data,filename)
+                    with stage("write"):
+                        export_flights(imported_schedules_data,filename)
                 elif filetype == "add-subfleets-v7":
-                    update_subfleets(filename)
+                    with stage("update"):
+                        update_subfleets(filename)
                 elif filetype == "validate-subfleet":
-                    validate_subfleets(filename)
+                    with stage("validate"):
+                        validate_subfleets(filename)
                     print(f"Completed subfleet validation: {filename}")
                 else: 
                     print("Unknown filetype")
+                status = "ok"
         else:
             raise Exception("'filetype' not defined")
 
@@ -504,6 +611,9 @@ def main():
         print(f"ERROR: {e}\n")
         parser.print_help()
 
+    if _stage_seconds:
+        write_run_report(status, rows, f"legacy_{filetype}" if filetype else "legacy")
+
 
 
 if __name__ == "__main__":
@@ -2,9 +2,12 @@ import requests
 import json
 import copy
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Constants
 SIMBRIEF_URL = "https://www.simbrief.com/api/inputs.airframes.json"
+SIMBRIEF_TIMEOUT = (10, 60)  # (connect, read) seconds
 PASSENGER_WEIGHT_LBS = 175  # Standard simbrief passenger weight in pounds
 
 # Predefined cabin layouts per aircraft ICAO
@@ -246,10 +249,22 @@ def adjust_layout(layout, pax):
         layout["Y"] -= total_seats - pax
     return layout
 
+def build_session():
+    """
+    Session with keep-alive and jittered retries for transient GET failures.
+    """
+    retry = Retry(total=3, backoff_factor=0.5, backoff_jitter=0.5,
+                  status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset({"GET"}),
+                  respect_retry_after_header=True, raise_on_status=False)
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+    return session
+
 # Main processing function
 def process_aircraft_data():
     # Fetch aircraft data from SimBrief's public endpoint
-    response = requests.get(SIMBRIEF_URL)
+    with build_session() as session:
+        response = session.get(SIMBRIEF_URL, timeout=SIMBRIEF_TIMEOUT)
     if response.status_code != 200:
         raise Exception("Failed to fetch aircraft data from SimBrief public API.")
 